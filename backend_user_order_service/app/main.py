@@ -2,7 +2,7 @@
 后端用户与订单示例服务入口。
 
 这个服务是 integration_gateway_service 的下游示例，职责非常单一：
-- 提供用户查询接口；
+- 提供用户查询接口（单个 / 批量）；
 - 提供订单创建接口；
 - 让你能在本仓库里直接演练“网关 -> 下游业务服务”调用链。
 
@@ -16,11 +16,11 @@
 
 from datetime import datetime
 from itertools import count
-from typing import Dict
+from typing import Dict, List
 
 from fastapi import FastAPI, HTTPException, status
 
-from .schemas import OrderCreateIn, OrderOut, UserOut
+from .schemas import OrderCreateIn, OrderOut, UserOut, UsersBatchIn
 
 
 # 应用入口：当前服务没有再拆 router/service/repository，所有 HTTP 入口都直接定义在本文件。
@@ -54,6 +54,18 @@ def get_user(user_id: int) -> UserOut:
     return user
 
 
+@app.post("/api/users/batch", response_model=List[UserOut])
+def get_users_batch(batch_in: UsersBatchIn) -> List[UserOut]:
+    """
+    按 ID 批量查询用户信息。
+
+    只返回存在的用户（重复 ID 只返回一次），不存在的 ID 直接略过，由调用方自行判断。
+    """
+    # 网关的 POST /gateway/backend/users:batch 在开启 GATEWAY_BACKEND_USERS_BATCH_API 时调用这里。
+    found = {user_id: _user_store[user_id] for user_id in batch_in.ids if user_id in _user_store}
+    return list(found.values())
+
+
 @app.post("/api/orders", response_model=OrderOut, status_code=status.HTTP_201_CREATED)
 def create_order(order_in: OrderCreateIn) -> OrderOut:
     """
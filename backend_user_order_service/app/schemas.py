@@ -10,7 +10,7 @@
 """
 
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -23,6 +23,12 @@ class UserOut(BaseModel):
     full_name: Optional[str] = Field(None, description="用户全名")
 
 
+class UsersBatchIn(BaseModel):
+    """批量查询用户入参模型。"""
+
+    ids: List[int] = Field(..., min_length=1, max_length=100, description="要查询的用户 ID 列表")
+
+
 class OrderCreateIn(BaseModel):
     """创建订单入参模型。"""
 
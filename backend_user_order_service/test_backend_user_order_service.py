@@ -27,6 +27,13 @@ def test_get_missing_user() -> None:
     assert resp.status_code == 404
 
 
+def test_get_users_batch_skips_missing() -> None:
+    """批量查询只返回存在的用户，重复 ID 只返回一次。"""
+    resp = client.post("/api/users/batch", json={"ids": [2, 9999, 1, 2]})
+    assert resp.status_code == 200
+    assert [user["id"] for user in resp.json()] == [2, 1]
+
+
 def test_create_order() -> None:
     """创建订单应返回 201 且包含订单 ID。"""
     payload = {"user_id": 1, "product_id": 42, "quantity": 3}
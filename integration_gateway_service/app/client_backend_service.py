@@ -5,21 +5,28 @@
 下游服务可以是 Python、Java 或其他语言实现的微服务，这里只关心 HTTP 协议本身。
 """
 
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 import httpx
 from pydantic import ValidationError
 
 from .config import settings
+from .http_clients import BACKEND_TIMEOUT
+from .resilience import DownstreamPolicy
 from .schemas import OrderCreateIn, OrderOut
 
 
 class BackendServiceError(Exception):
     """表示调用下游后端服务过程中发生的异常。"""
 
+    def __init__(self, message: str, status_code: int | None = None) -> None:
+        super().__init__(message)
+        # 下游返回的 HTTP 状态码；网络错误、数据结构异常等情况为 None。
+        self.status_code = status_code
 
-class BackendServiceClient:
-    """通用后端服务客户端封装。"""
+
+class _BackendServiceClientBase:
+    """同步 / 异步后端客户端共用的地址与响应处理逻辑。"""
 
     def __init__(self, base_url: str | None = None) -> None:
         # base_url 默认指向 backend_user_order_service，便于本仓库本地直连联调。
@@ -37,19 +44,43 @@ class BackendServiceClient:
             resp.raise_for_status()
         except httpx.HTTPStatusError as exc:
             raise BackendServiceError(
-                f"调用后端服务失败，状态码：{exc.response.status_code}"
+                f"调用后端服务失败，状态码：{exc.response.status_code}",
+                status_code=exc.response.status_code,
             ) from exc
         try:
             return resp.json()
         except ValueError as exc:
             raise BackendServiceError("后端服务返回了非 JSON 格式的数据") from exc
 
+    def _to_order_out(self, data: Dict[str, Any]) -> OrderOut:
+        """把下游返回的订单数据校验成 OrderOut。"""
+        try:
+            return OrderOut(**data)
+        except ValidationError as exc:
+            raise BackendServiceError("后端服务返回数据结构不符合预期") from exc
+
+
+class BackendServiceClient(_BackendServiceClientBase):
+    """通用后端服务客户端封装（同步版本，适合脚本或同步代码中直接调用）。"""
+
+    def __init__(
+        self, base_url: str | None = None, http_client: httpx.Client | None = None
+    ) -> None:
+        super().__init__(base_url)
+        # 可选的共享同步客户端，未传入时每次调用临时建连。
+        self.http_client = http_client
+
+    def _request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """发送请求：优先复用传入的客户端。"""
+        if self.http_client is not None:
+            return self.http_client.request(method, url, timeout=BACKEND_TIMEOUT, **kwargs)
+        with httpx.Client(trust_env=False) as client:
+            return client.request(method, url, timeout=BACKEND_TIMEOUT, **kwargs)
+
     def get_user(self, user_id: int) -> Dict[str, Any]:
         """调用后端服务查询用户信息。"""
         url = f"{self.base_url}/api/users/{user_id}"
-        with httpx.Client(trust_env=False) as client:
-            data = self._handle_response(client.get(url, timeout=5.0))
-        return data
+        return self._handle_response(self._request("GET", url))
 
     def create_order(self, order_in: OrderCreateIn) -> OrderOut:
         """
@@ -61,9 +92,68 @@ class BackendServiceClient:
         """
         url = f"{self.base_url}/api/orders"
         payload = order_in.dict()
-        with httpx.Client(trust_env=False) as client:
-            data = self._handle_response(client.post(url, json=payload, timeout=5.0))
+        data = self._handle_response(self._request("POST", url, json=payload))
+        return self._to_order_out(data)
+
+
+class AsyncBackendServiceClient(_BackendServiceClientBase):
+    """
+    通用后端服务客户端封装（异步版本，网关路由使用）。
+
+    等待下游响应时不占用线程，网关能同时处理的代理请求数只受连接池大小限制，
+    而不是受线程池大小（默认 40）限制。
+    """
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        http_client: httpx.AsyncClient | None = None,
+        policy: DownstreamPolicy | None = None,
+    ) -> None:
+        super().__init__(base_url)
+        # 共享连接池客户端（由 dependencies 从 http_clients 注入），未注入时每次调用临时建连。
+        self.http_client = http_client
+        # 熔断 / 重试策略（由 dependencies 从 downstream_policies 注入），未注入时直接发送。
+        self.policy = policy
+
+    async def _send(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """发送一次请求：优先复用共享连接池。"""
+        if self.http_client is not None:
+            return await self.http_client.request(
+                method, url, timeout=BACKEND_TIMEOUT, **kwargs
+            )
+        async with httpx.AsyncClient(trust_env=False) as client:
+            return await client.request(method, url, timeout=BACKEND_TIMEOUT, **kwargs)
+
+    async def _request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """经过熔断 / 重试策略发送请求，只有 GET 视为幂等、允许重试与对冲。"""
         try:
-            return OrderOut(**data)
-        except ValidationError as exc:
-            raise BackendServiceError("后端服务返回数据结构不符合预期") from exc
+            if self.policy is None:
+                return await self._send(method, url, **kwargs)
+            return await self.policy.call(
+                lambda: self._send(method, url, **kwargs), idempotent=method == "GET"
+            )
+        except httpx.TimeoutException as exc:
+            raise BackendServiceError("调用后端服务超时") from exc
+        except httpx.TransportError as exc:
+            raise BackendServiceError(f"调用后端服务失败：{exc}") from exc
+
+    async def get_user(self, user_id: int) -> Dict[str, Any]:
+        """调用后端服务查询用户信息。"""
+        url = f"{self.base_url}/api/users/{user_id}"
+        return self._handle_response(await self._request("GET", url))
+
+    async def get_users_batch(self, user_ids: List[int]) -> List[Dict[str, Any]]:
+        """调用后端服务的批量查询接口，只返回存在的用户。"""
+        url = f"{self.base_url}/api/users/batch"
+        data = self._handle_response(await self._request("POST", url, json={"ids": user_ids}))
+        if not isinstance(data, list):
+            raise BackendServiceError("后端服务返回数据结构不符合预期")
+        return data
+
+    async def create_order(self, order_in: OrderCreateIn) -> OrderOut:
+        """调用后端服务创建订单并返回标准化结构（排查思路同同步版本）。"""
+        url = f"{self.base_url}/api/orders"
+        payload = order_in.dict()
+        data = self._handle_response(await self._request("POST", url, json=payload))
+        return self._to_order_out(data)
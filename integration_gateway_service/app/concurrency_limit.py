@@ -0,0 +1,208 @@
+"""
+下游在途请求数的自适应上限（AIMD）。
+
+调用关系：
+resilience.DownstreamPolicy._send_timed
+    -> AdaptiveConcurrencyLimiter.run(send)
+        - 在途请求数 < 当前上限：直接发送；
+        - 已到上限：进入有界等待队列，最多等 GATEWAY_CONCURRENCY_MAX_WAIT_MS 毫秒；
+        - 队列已满或等待超时：立即抛 DownstreamOverloadedError，由 main.py 转成 503。
+
+设计要点：
+- 限流（rate_limit.py）管的是“每个用户多快”，这里管的是“同时压在某个下游上的请求有多少”：
+  下游变慢时，继续放更多请求进去只会让排队越来越长、每个请求都更慢；
+- 上限按 AIMD 自动调整：
+  - 响应耗时不超过近期最小耗时（视为无排队时的耗时）的 GATEWAY_CONCURRENCY_LATENCY_TOLERANCE 倍，
+    且在途请求数至少达到上限的一半（上限确实被用到了）时，上限加 1；
+  - 响应变慢、传输错误或 5xx 时，上限乘以 GATEWAY_CONCURRENCY_BACKOFF_RATIO；
+  - 上限始终在 [GATEWAY_CONCURRENCY_MIN_LIMIT, GATEWAY_CONCURRENCY_MAX_LIMIT] 之间；
+- 控制的是每次真正发往下游的请求：重试与对冲请求各占一个名额；
+- 被取消的请求（例如对冲中输掉的一方）只归还名额，不参与调整；
+- 被拒绝的请求没有发往下游，不计入熔断器的失败率。
+
+上限、在途数与拒绝计数：GET /gateway/stats/concurrency。
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict
+
+import httpx
+
+from .config import settings
+
+
+Send = Callable[[], Awaitable[httpx.Response]]
+
+# 计算“无排队耗时”所用的最近成功请求样本数。
+_RTT_WINDOW = 200
+
+
+class DownstreamOverloadedError(Exception):
+    """下游在途请求已达上限且等待队列已满（或等待超时），由 main.py 统一转换为 503。"""
+
+    def __init__(self, downstream: str, retry_after: float = 1.0) -> None:
+        super().__init__(f"下游服务 {downstream} 繁忙，请稍后重试")
+        self.downstream = downstream
+        self.retry_after = retry_after
+
+
+class AdaptiveConcurrencyLimiter:
+    """单个下游的在途请求上限：AIMD 调整上限 + 有界等待队列 + 超出即拒绝。"""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        queue_size: int,
+        max_wait_ms: int,
+        latency_tolerance: float,
+        backoff_ratio: float,
+        clock: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.queue_size = queue_size
+        self.max_wait = max_wait_ms / 1000
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self._clock = clock
+
+        self._limit = float(min(self.max_limit, max(self.min_limit, initial_limit)))
+        self.inflight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._rtts: Deque[float] = deque(maxlen=_RTT_WINDOW)
+
+        self.queued_total = 0
+        self.shed_queue_full = 0
+        self.shed_wait_timeout = 0
+        self.limit_increases = 0
+        self.limit_decreases = 0
+
+    @property
+    def limit(self) -> int:
+        """当前允许的在途请求数。"""
+        return int(self._limit)
+
+    @property
+    def queued(self) -> int:
+        """正在等待名额的请求数。"""
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    async def run(self, send: Send) -> httpx.Response:
+        """取得名额后发送请求，并根据耗时与结果调整上限。"""
+        await self._acquire()
+        inflight_at_start = self.inflight
+        started = self._clock()
+        try:
+            resp = await send()
+        except asyncio.CancelledError:
+            self._release()
+            raise
+        except Exception:
+            self._release()
+            self._decrease()
+            raise
+        self._release()
+        self._on_response(self._clock() - started, resp.status_code < 500, inflight_at_start)
+        return resp
+
+    async def _acquire(self) -> None:
+        if self.inflight < self.limit and not self._waiters:
+            self.inflight += 1
+            return
+        if self.queued >= self.queue_size:
+            self.shed_queue_full += 1
+            raise DownstreamOverloadedError(self.name)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued_total += 1
+        try:
+            # 名额由 _wake 直接交给等待方（inflight 已经替它加过 1）。
+            await asyncio.wait_for(waiter, self.max_wait)
+        except BaseException as exc:
+            if waiter.done() and not waiter.cancelled():
+                # 名额刚交过来，但这边已经超时或被取消，还回去给下一个等待方。
+                self._release()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(exc, asyncio.TimeoutError):
+                self.shed_wait_timeout += 1
+                raise DownstreamOverloadedError(self.name) from None
+            raise
+
+    def _release(self) -> None:
+        self.inflight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        """把空出来的名额按先来后到交给等待方。"""
+        while self._waiters and self.inflight < self.limit:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.inflight += 1
+            waiter.set_result(None)
+
+    def _on_response(self, seconds: float, ok: bool, inflight_at_start: int) -> None:
+        if not ok:
+            self._decrease()
+            return
+        self._rtts.append(seconds)
+        if seconds > min(self._rtts) * self.latency_tolerance:
+            self._decrease()
+        elif inflight_at_start * 2 >= self.limit:
+            self._increase()
+
+    def _increase(self) -> None:
+        if self._limit < self.max_limit:
+            self._limit = min(float(self.max_limit), self._limit + 1)
+            self.limit_increases += 1
+            self._wake()
+
+    def _decrease(self) -> None:
+        if self._limit > self.min_limit:
+            self._limit = max(float(self.min_limit), math.floor(self._limit * self.backoff_ratio))
+            self.limit_decreases += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """返回当前上限、在途数、排队数与拒绝计数。"""
+        return {
+            "limit": self.limit,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "inflight": self.inflight,
+            "queued": self.queued,
+            "queue_size": self.queue_size,
+            "queued_total": self.queued_total,
+            "shed_total": self.shed_queue_full + self.shed_wait_timeout,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_wait_timeout": self.shed_wait_timeout,
+            "limit_increases": self.limit_increases,
+            "limit_decreases": self.limit_decreases,
+            "min_latency_ms": round(min(self._rtts) * 1000, 3) if self._rtts else None,
+        }
+
+
+def build_limiter(name: str) -> AdaptiveConcurrencyLimiter:
+    """按配置为某个下游创建并发上限控制器。"""
+    return AdaptiveConcurrencyLimiter(
+        name,
+        initial_limit=settings.concurrency_initial_limit,
+        min_limit=settings.concurrency_min_limit,
+        max_limit=settings.concurrency_max_limit,
+        queue_size=settings.concurrency_queue_size,
+        max_wait_ms=settings.concurrency_max_wait_ms,
+        latency_tolerance=settings.concurrency_latency_tolerance,
+        backoff_ratio=settings.concurrency_backoff_ratio,
+    )
@@ -7,6 +7,8 @@
 """
 
 from functools import lru_cache
+from typing import Dict
+
 from pydantic import AnyHttpUrl
 from pydantic_settings import BaseSettings
 
@@ -23,12 +25,136 @@ class Settings(BaseSettings):
     rbac_jwt_algorithm: str = "HS256"
     """JWT 加密算法，需与 RBAC 服务保持一致。"""
 
+    breaker_window_seconds: float = 10.0
+    """熔断器统计失败率的滚动窗口（秒）。"""
+
+    breaker_min_requests: int = 20
+    """窗口内请求数达到这个值才会根据失败率判断是否熔断。"""
+
+    breaker_error_rate_threshold: float = 0.5
+    """窗口内失败率（传输错误与 5xx）达到该比例时打开熔断。"""
+
+    breaker_open_seconds: float = 5.0
+    """熔断打开后持续的秒数，之后进入半开状态放行探测请求。"""
+
+    breaker_half_open_probes: int = 1
+    """半开状态下同时允许的探测请求数。"""
+
+    retry_max_attempts: int = 3
+    """幂等 GET 请求的最大尝试次数（含第一次），POST 请求不重试。"""
+
+    retry_base_delay_ms: int = 50
+    """重试退避的基数（毫秒），第 n 次重试前随机等待 [0, 基数 * 2^n]。"""
+
+    retry_max_delay_ms: int = 1000
+    """单次重试退避的上限（毫秒）。"""
+
+    hedge_enabled: bool = False
+    """是否对幂等 GET 请求启用对冲：超过近期 p95 延迟仍未返回时再发一个相同请求。"""
+
+    hedge_min_samples: int = 20
+    """启用对冲前至少需要的延迟样本数。"""
+
+    concurrency_limit_enabled: bool = True
+    """是否限制每个下游的在途请求数（上限按响应耗时自动调整），超出且等待队列已满时返回 503。"""
+
+    concurrency_initial_limit: int = 20
+    """每个下游在途请求上限的初始值。"""
+
+    concurrency_min_limit: int = 2
+    """在途请求上限的下限，下游再慢也至少允许这么多请求同时进行。"""
+
+    concurrency_max_limit: int = 100
+    """在途请求上限的上限，不应超过 GATEWAY_DOWNSTREAM_MAX_CONNECTIONS。"""
+
+    concurrency_queue_size: int = 50
+    """达到在途上限后最多允许多少个请求排队等待名额，再多的直接返回 503。"""
+
+    concurrency_max_wait_ms: int = 100
+    """排队等待名额的最长时间（毫秒），超时返回 503。"""
+
+    concurrency_latency_tolerance: float = 2.0
+    """响应耗时超过近期最小耗时的多少倍视为下游开始排队，此时下调在途上限。"""
+
+    concurrency_backoff_ratio: float = 0.9
+    """下调在途上限时乘以的系数。"""
+
+    jwt_cache_enabled: bool = True
+    """是否缓存验证通过的 JWT payload，避免同一 token 每次请求都重新验签。"""
+
+    jwt_cache_max_size: int = 10000
+    """JWT 缓存最多保存的 token 数，超出后按 LRU 淘汰。"""
+
+    jwt_cache_ttl_seconds: float = 300.0
+    """JWT 缓存条目的最长保留秒数，同时不会超过 token 自身的 exp。"""
+
+    user_cache_enabled: bool = True
+    """是否缓存 GET /gateway/backend/users/{user_id} 的下游查询结果。"""
+
+    user_cache_max_size: int = 10000
+    """用户信息缓存最多保存的用户数，超出后按 LRU 淘汰。"""
+
+    user_cache_ttl_seconds: float = 30.0
+    """用户信息缓存的新鲜期（秒），期间直接返回缓存。"""
+
+    user_cache_stale_seconds: float = 300.0
+    """新鲜期过后仍可先返回旧值、同时后台刷新的窗口（秒），即 stale-while-revalidate。"""
+
+    user_cache_negative_ttl_seconds: float = 5.0
+    """下游返回 404 时缓存这个结果的秒数。"""
+
+    users_batch_max_ids: int = 100
+    """POST /gateway/backend/users:batch 单次最多查询的用户数（去重后）。"""
+
+    users_batch_concurrency: int = 10
+    """批量查询用户时，未命中缓存的用户逐个查询下游的最大并发数。"""
+
+    backend_users_batch_api: bool = False
+    """下游是否提供 POST /api/users/batch 批量查询接口；开启后未命中缓存的用户合并成一次批量查询。"""
+
+    rate_limit_enabled: bool = True
+    """是否按（JWT sub，路由）做令牌桶限流，超出返回 429。"""
+
+    rate_limit_rules: Dict[str, str] = {"POST /gateway/log-detective/analyze": "10/60"}
+    """按路由配置的限流规则，键为 "方法 路由模板"（"*" 表示其余所有路由），值为 "次数/秒数"；
+    环境变量用 JSON 配置，例如 {"POST /gateway/log-detective/analyze": "10/60", "*": "600/60"}。"""
+
+    rate_limit_backend: str = "memory"
+    """限流状态的存储后端：memory（进程内，单实例）或 redis（多实例共享）。"""
+
+    rate_limit_redis_url: str | None = None
+    """redis 后端的连接地址，例如 redis://localhost:6379/0。"""
+
+    rate_limit_redis_use_lua: bool = True
+    """redis 后端是否使用 Lua 脚本；不支持脚本的 Redis 兼容服务设为 false，改用 WATCH/MULTI 事务。"""
+
     log_audit_base_url: AnyHttpUrl | None = None
     """日志 / 审计服务基础地址，未配置则网关不上报审计日志。"""
 
+    audit_queue_max_size: int = 10000
+    """审计日志上报队列的最大长度，满了丢弃最旧的一条。"""
+
+    audit_batch_size: int = 100
+    """每批上报的审计日志条数，不能超过日志服务的 LOG_AUDIT_BATCH_MAX_ITEMS（默认 500）。"""
+
+    audit_flush_interval_ms: int = 1000
+    """队列未攒够一批时，最长等待多久上报一次（毫秒）。"""
+
+    audit_shutdown_timeout: float = 5.0
+    """应用关闭时等待剩余审计日志发完的最长秒数。"""
+
     log_detective_base_url: str = "http://localhost:9003"
     """日志侦探服务基础地址"""
 
+    downstream_max_connections: int = 100
+    """每个下游连接池的最大连接数（含正在使用的连接）。"""
+
+    downstream_max_keepalive_connections: int = 20
+    """每个下游连接池最多保留的空闲 keep-alive 连接数。"""
+
+    downstream_keepalive_expiry: float = 30.0
+    """空闲连接保留的秒数，应小于下游服务端的 keep-alive 超时，避免复用到已被对端关闭的连接。"""
+
     class Config:
         env_prefix = "GATEWAY_"
         env_file = ".env"
@@ -2,33 +2,43 @@
 依赖注入相关工具。
 
 包括：
-- 获取通用后端服务客户端；
-- 基于 RBAC 风格的 JWT 验证当前用户（简化版，只校验签名与基本字段）。
+- 获取通用后端服务客户端（注入 lifespan 中创建的共享连接池）；
+- 基于 RBAC 风格的 JWT 验证当前用户（简化版，只校验签名与基本字段），
+  验证通过的 payload 会按 token 摘要缓存（见 jwt_cache.py）；
+- 按（当前用户，路由）的令牌桶限流（见 rate_limit.py）。
 """
 
 from typing import Annotated, Dict, Any
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 
-from .client_backend_service import BackendServiceClient
+from .client_backend_service import AsyncBackendServiceClient
 from .log_detective_client import LogDetectiveClient
 from .config import settings
+from .http_clients import http_clients
+from .jwt_cache import verified_token_cache
+from .rate_limit import rate_limiter
+from .resilience import downstream_policies
 
 
 # Bearer 认证提取器：先只负责从请求头拿 token，真正的 JWT 解码在 get_current_user() 中完成。
 http_bearer_scheme = HTTPBearer(auto_error=False)
 
 
-def get_backend_client() -> BackendServiceClient:
-    """注入通用后端服务客户端实例。"""
-    return BackendServiceClient()
+def get_backend_client() -> AsyncBackendServiceClient:
+    """注入通用后端服务客户端实例（异步版本，复用共享连接池与熔断策略）。"""
+    return AsyncBackendServiceClient(
+        http_client=http_clients.backend, policy=downstream_policies.backend
+    )
 
 
 def get_log_detective_client() -> LogDetectiveClient:
-    """注入日志侦探服务客户端实例。"""
-    return LogDetectiveClient()
+    """注入日志侦探服务客户端实例（复用共享连接池与熔断策略）。"""
+    return LogDetectiveClient(
+        http_client=http_clients.log_detective, policy=downstream_policies.log_detective
+    )
 
 
 def get_current_user(
@@ -49,6 +59,12 @@ def get_current_user(
         )
 
     token = credentials.credentials
+    # 同一个 token 通常会被复用很久：验签通过过一次的直接从缓存返回。
+    if settings.jwt_cache_enabled:
+        cached = verified_token_cache.get(token)
+        if cached is not None:
+            return cached
+
     try:
         payload = jwt.decode(
             token,
@@ -67,8 +83,33 @@ def get_current_user(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="令牌中缺少用户标识字段",
         )
+    if settings.jwt_cache_enabled:
+        verified_token_cache.put(token, payload)
     return payload
 
 
 # 语义化别名：路由函数通过这个别名就能直接声明“我依赖当前用户 payload”。
 CurrentUserPayload = Annotated[Dict[str, Any], Depends(get_current_user)]
+
+
+async def enforce_rate_limit(request: Request, current_user: CurrentUserPayload) -> None:
+    """
+    按（JWT sub，"方法 路由模板"）取一个令牌，取不到时返回 429。
+
+    作为 router 级依赖挂在所有网关路由上，是否限流、限多少由 GATEWAY_RATE_LIMIT_RULES 决定。
+    放行时把结果放进 request.state，由 RateLimitHeadersMiddleware 写出 X-RateLimit-* 响应头。
+    """
+    if not settings.rate_limit_enabled:
+        return
+    route = request.scope.get("route")
+    route_key = f"{request.method} {getattr(route, 'path', request.url.path)}"
+    decision = await rate_limiter.check(str(current_user.get("sub", "")), route_key)
+    if decision is None:
+        return
+    if not decision.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="请求过于频繁，请稍后重试",
+            headers=decision.headers(),
+        )
+    request.state.rate_limit = decision
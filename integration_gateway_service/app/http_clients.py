@@ -0,0 +1,138 @@
+"""
+下游 HTTP 连接池（随应用生命周期创建与关闭）。
+
+调用关系：
+main.py lifespan
+    -> http_clients.start()   启动时为每个下游建一个共享客户端
+    -> http_clients.aclose()  关闭时释放所有连接
+dependencies.get_backend_client / get_log_detective_client
+    -> 把共享客户端注入 AsyncBackendServiceClient / LogDetectiveClient
+
+设计要点：
+- 每个下游一个客户端、一个连接池，请求之间复用 TCP 连接（keep-alive），
+  不再每次调用都重新建连；
+- 连接上限、空闲连接上限与空闲连接过期时间由 GATEWAY_DOWNSTREAM_* 配置；
+- 连接池统计（当前连接数 / 空闲 / 占用、累计请求数）通过
+  GET /gateway/stats/http-pools 暴露，用来观察连接复用情况；
+- 未经过 lifespan（例如单独构造客户端的测试）时共享客户端为 None，
+  各客户端退回到“每次调用临时建一个 httpx 客户端”的旧行为。
+"""
+
+from typing import Any, Dict
+
+import httpx
+
+from .config import settings
+
+
+# 各下游的默认超时，与原先每次调用时传入的超时保持一致。
+BACKEND_TIMEOUT = 5.0
+LOG_DETECTIVE_TIMEOUT = 30.0
+LOG_AUDIT_TIMEOUT = 2.0
+
+
+def build_limits() -> httpx.Limits:
+    """按配置生成连接池限制。"""
+    return httpx.Limits(
+        max_connections=settings.downstream_max_connections,
+        max_keepalive_connections=settings.downstream_max_keepalive_connections,
+        keepalive_expiry=settings.downstream_keepalive_expiry,
+    )
+
+
+class _RequestCounter:
+    """通过 httpx 的 event hook 累计经过某个连接池的请求数。"""
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    async def on_request(self, request: httpx.Request) -> None:
+        self.count += 1
+
+
+def _pool_stats(client: httpx.AsyncClient, counter: _RequestCounter) -> Dict[str, Any]:
+    """读取 httpcore 连接池里的连接状态（httpx 没有公开接口，只能从 transport 上取）。"""
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []))
+    idle = sum(1 for conn in connections if conn.is_idle())
+    closed = sum(1 for conn in connections if conn.is_closed())
+    limits = build_limits()
+    return {
+        "max_connections": limits.max_connections,
+        "max_keepalive_connections": limits.max_keepalive_connections,
+        "keepalive_expiry": limits.keepalive_expiry,
+        "connections": len(connections),
+        "idle": idle,
+        "active": len(connections) - idle - closed,
+        "requests": counter.count,
+    }
+
+
+class DownstreamClients:
+    """网关访问的各个下游的共享 HTTP 客户端。"""
+
+    def __init__(self) -> None:
+        self.backend: httpx.AsyncClient | None = None
+        self.log_detective: httpx.AsyncClient | None = None
+        self.log_audit: httpx.AsyncClient | None = None
+        self._backend_counter = _RequestCounter()
+        self._log_detective_counter = _RequestCounter()
+        self._log_audit_counter = _RequestCounter()
+
+    @property
+    def started(self) -> bool:
+        return self.backend is not None
+
+    def start(self) -> None:
+        """创建共享客户端（重复调用无副作用）。"""
+        if self.started:
+            return
+        self._backend_counter = _RequestCounter()
+        self._log_detective_counter = _RequestCounter()
+        self._log_audit_counter = _RequestCounter()
+        self.backend = httpx.AsyncClient(
+            limits=build_limits(),
+            timeout=BACKEND_TIMEOUT,
+            trust_env=False,
+            event_hooks={"request": [self._backend_counter.on_request]},
+        )
+        self.log_detective = httpx.AsyncClient(
+            limits=build_limits(),
+            timeout=LOG_DETECTIVE_TIMEOUT,
+            trust_env=False,
+            event_hooks={"request": [self._log_detective_counter.on_request]},
+        )
+        # 审计日志只由后台上报任务使用，同一时刻最多一个请求在途。
+        self.log_audit = httpx.AsyncClient(
+            limits=build_limits(),
+            timeout=LOG_AUDIT_TIMEOUT,
+            trust_env=False,
+            event_hooks={"request": [self._log_audit_counter.on_request]},
+        )
+
+    async def aclose(self) -> None:
+        """关闭所有共享客户端，释放连接。"""
+        if self.backend is not None:
+            await self.backend.aclose()
+            self.backend = None
+        if self.log_detective is not None:
+            await self.log_detective.aclose()
+            self.log_detective = None
+        if self.log_audit is not None:
+            await self.log_audit.aclose()
+            self.log_audit = None
+
+    def stats(self) -> Dict[str, Any]:
+        """各下游连接池的统计信息。"""
+        if not self.started:
+            return {"started": False}
+        return {
+            "started": True,
+            "backend": _pool_stats(self.backend, self._backend_counter),
+            "log_detective": _pool_stats(self.log_detective, self._log_detective_counter),
+            "log_audit": _pool_stats(self.log_audit, self._log_audit_counter),
+        }
+
+
+http_clients = DownstreamClients()
+# 模块级单例：lifespan 负责启动 / 关闭，dependencies 从这里取共享客户端注入。
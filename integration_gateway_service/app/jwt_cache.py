@@ -0,0 +1,122 @@
+"""
+已验证 JWT 的本地缓存。
+
+调用关系：
+dependencies.get_current_user()
+    -> verified_token_cache.get(token)  命中则直接返回 payload，跳过 jwt.decode
+    -> 未命中：jwt.decode 验签 + 校验字段 -> verified_token_cache.put(token, payload)
+
+设计要点：
+- 键是整个 token（header.payload.signature）的 SHA-256 摘要，不在内存里保存原始 token；
+  签名被改过的 token 摘要不同，一定会走完整的验签，因此会被拒绝；
+- 只缓存验证通过的 payload，伪造 / 过期的 token 不会挤占缓存；
+- 条目的过期时间 = min(写入时间 + GATEWAY_JWT_CACHE_TTL_SECONDS, token 的 exp)，
+  token 过期后缓存一定不会再返回它；
+- 容量有界（GATEWAY_JWT_CACHE_MAX_SIZE），超出后按 LRU 淘汰；
+- 验签密钥或算法变化（例如运行中轮换密钥）时整体清空，旧 token 必须重新验签；
+- get_current_user 是同步依赖，跑在线程池里，读写都在锁内完成。
+
+命中率等指标：GET /gateway/stats/jwt-cache。
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .config import settings
+
+
+class VerifiedTokenCache:
+    """按 token 摘要缓存验证通过的 JWT payload（LRU + 过期时间）。"""
+
+    def __init__(self, max_size: int, ttl_seconds: float) -> None:
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # 摘要 -> (payload, 过期时间戳)；OrderedDict 的顺序即 LRU 顺序，末尾最新。
+        self._entries: "OrderedDict[bytes, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 写入缓存时使用的验签配置，配置变化后旧条目全部作废。
+        self._key_config: Optional[Tuple[str, str]] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def _check_key_config(self) -> None:
+        """验签密钥 / 算法变化时清空缓存（调用方需持有锁）。"""
+        key_config = (settings.rbac_jwt_secret_key, settings.rbac_jwt_algorithm)
+        if key_config != self._key_config:
+            self._entries.clear()
+            self._key_config = key_config
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """返回缓存的 payload 副本；未命中或已过期时返回 None。"""
+        digest = self._digest(token)
+        with self._lock:
+            self._check_key_config()
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, expires_at = entry
+            if time.time() >= expires_at:
+                del self._entries[digest]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+        # 返回副本，避免调用方修改 payload 影响后续请求。
+        return dict(payload)
+
+    def put(self, token: str, payload: Dict[str, Any]) -> None:
+        """缓存一个刚验证通过的 payload。"""
+        expires_at = time.time() + self.ttl_seconds
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, float(exp))
+        if expires_at <= time.time():
+            return
+        digest = self._digest(token)
+        with self._lock:
+            self._check_key_config()
+            self._entries[digest] = (dict(payload), expires_at)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """清空缓存（计数保留）。"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存大小、命中率与淘汰 / 过期计数。"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": settings.jwt_cache_enabled,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+verified_token_cache = VerifiedTokenCache(
+    max_size=settings.jwt_cache_max_size,
+    ttl_seconds=settings.jwt_cache_ttl_seconds,
+)
+# 模块级单例：get_current_user 读写，统计接口读取。
@@ -3,43 +3,181 @@
 
 用于在网关中将关键操作（例如通过网关创建订单）上报到独立的
 log_audit_service，不影响主流程。
+
+调用关系：
+routers/gateway.py
+    -> log_audit_client.send_log()   只入队，立即返回，不做任何网络调用
+    -> 后台 shipper 任务 -> POST {log_audit_base_url}/logs/batch 批量上报
+main.py lifespan
+    -> start() 启动后台任务；关闭时 stop() 把队列中剩余日志发完再退出
+
+上报时机：攒够 audit_batch_size 条，或距上次上报超过 audit_flush_interval_ms，先到者为准。
+队列有界（audit_queue_max_size），满了丢弃最旧的一条，保证审计永远不拖慢主链路。
+
+排查建议：
+- 审计日志“丢了”，先看 GET /gateway/stats/audit-shipper 中的 dropped_total（队列满）
+  与 failed_total（上报失败）；
+- 上报慢，看 last_ship_latency_ms / max_ship_latency_ms。
 """
 
-from typing import Any, Dict
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
 
 import httpx
 
 from .config import settings
 
 
+logger = logging.getLogger(__name__)
+
+
 class LogAuditClient:
-    """审计日志客户端。"""
+    """审计日志客户端：有界内存队列 + 后台批量上报任务。"""
 
-    def __init__(self, base_url: str | None = None) -> None:
+    def __init__(
+        self,
+        base_url: str | None = None,
+        *,
+        max_size: int | None = None,
+        batch_size: int | None = None,
+        flush_interval_ms: int | None = None,
+    ) -> None:
         self._base_url = base_url
+        self.max_size = max_size or settings.audit_queue_max_size
+        self.batch_size = batch_size or settings.audit_batch_size
+        self.flush_interval = (flush_interval_ms or settings.audit_flush_interval_ms) / 1000
+
+        # maxlen 让 deque 在满了之后追加时自动挤掉最旧的一条（drop-oldest）。
+        self._queue: Deque[Dict[str, Any]] = deque(maxlen=self.max_size)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._stopping = False
+
+        self.enqueued_total = 0
+        self.shipped_total = 0
+        self.dropped_total = 0
+        self.failed_total = 0
+        self.batch_count = 0
+        self.last_ship_latency_ms = 0.0
+        self.max_ship_latency_ms = 0.0
 
     @property
     def base_url(self) -> str | None:
         """返回当前使用的日志服务基础地址。"""
-        return self._base_url or (str(settings.log_audit_base_url) if settings.log_audit_base_url else None)
+        if self._base_url:
+            return self._base_url
+        return str(settings.log_audit_base_url) if settings.log_audit_base_url else None
+
+    @property
+    def running(self) -> bool:
+        """后台上报任务是否在运行。"""
+        return self._task is not None and not self._task.done()
+
+    @property
+    def queue_depth(self) -> int:
+        """当前排队等待上报的日志条数。"""
+        return len(self._queue)
 
     def send_log(self, payload: Dict[str, Any]) -> None:
         """
-        发送审计日志到日志服务。
+        把一条审计日志放入上报队列，立即返回。
 
-        若未配置地址或请求失败，将静默忽略，不抛出异常。
+        若未配置地址将静默忽略；队列已满时丢弃最旧的一条并计入 dropped_total。
+        需在事件循环线程中调用（网关路由都是 async，直接调用即可）。
         """
         # 审计日志是“尽力而为”的旁路调用：主链成功与否不依赖这里。
-        base = self.base_url
-        if not base:
+        if not self.base_url:
+            return
+        if len(self._queue) == self.max_size:
+            self.dropped_total += 1
+        self._queue.append(payload)
+        self.enqueued_total += 1
+        if self._wakeup is not None and len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self, http_client: httpx.AsyncClient) -> None:
+        """在当前事件循环中启动后台上报任务（重复调用无副作用）。"""
+        if self.running:
+            return
+        self._http_client = http_client
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="audit-log-shipper")
+
+    async def stop(self, timeout: float | None = None) -> None:
+        """通知后台任务把队列发完后退出；超时仍未发完则放弃剩余日志。"""
+        if self._task is None:
             return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.warning("审计日志关闭前未能发完，剩余 %d 条被丢弃", len(self._queue))
+            self.dropped_total += len(self._queue)
+            self._queue.clear()
+        finally:
+            self._task = None
+            self._wakeup = None
+            self._http_client = None
+
+    async def _take_batch(self) -> List[Dict[str, Any]]:
+        """等待到“攒够一批 / 到达上报间隔 / 收到停止信号”之一，取出一批日志。"""
+        if not self._stopping and len(self._queue) < self.batch_size:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+        size = min(len(self._queue), self.batch_size)
+        return [self._queue.popleft() for _ in range(size)]
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._take_batch()
+            if batch:
+                await self._ship(batch)
+            if self._stopping and not self._queue:
+                return
 
-        url = f"{base.rstrip('/')}/logs"
+    async def _ship(self, batch: List[Dict[str, Any]]) -> None:
+        """把一批日志通过 POST /logs/batch 发给日志服务，失败时整批丢弃并计数。"""
+        url = f"{self.base_url.rstrip('/')}/logs/batch"
+        started = time.perf_counter()
         try:
-            httpx.post(url, json=payload, timeout=2.0)
+            resp = await self._http_client.post(url, json={"items": batch})
+            resp.raise_for_status()
         except Exception:
             # 日志上报失败不影响主流程
+            self.failed_total += len(batch)
+            logger.warning("审计日志批量上报失败，本批 %d 条被丢弃", len(batch), exc_info=True)
             return
 
+        latency_ms = (time.perf_counter() - started) * 1000
+        self.shipped_total += len(batch)
+        self.batch_count += 1
+        self.last_ship_latency_ms = latency_ms
+        self.max_ship_latency_ms = max(self.max_ship_latency_ms, latency_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回队列深度、上报延迟与丢弃计数等指标。"""
+        return {
+            "running": self.running,
+            "queue_depth": self.queue_depth,
+            "max_size": self.max_size,
+            "enqueued_total": self.enqueued_total,
+            "shipped_total": self.shipped_total,
+            "dropped_total": self.dropped_total,
+            "failed_total": self.failed_total,
+            "batch_count": self.batch_count,
+            "last_ship_latency_ms": round(self.last_ship_latency_ms, 3),
+            "max_ship_latency_ms": round(self.max_ship_latency_ms, 3),
+        }
+
 
 log_audit_client = LogAuditClient()
+# 模块级单例：路由层入队、main.py 的 lifespan 负责启动与排空。
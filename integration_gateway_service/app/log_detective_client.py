@@ -4,15 +4,17 @@
 真实调用链：
 log-detective.html
     -> integration_gateway_service/app/routers/gateway.py
-    -> LogDetectiveClient.analyze_logs()
+    -> LogDetectiveClient.analyze_logs_raw()（请求 / 响应字节透传；analyze_logs() 为解析成 dict 的版本）
     -> log_detective_service /internal/log-detective/analyze
 """
 
-from typing import Any, Dict
+from typing import Any, AsyncIterable, Dict
 
 import httpx
 
 from .config import settings
+from .http_clients import LOG_DETECTIVE_TIMEOUT
+from .resilience import DownstreamPolicy
 
 
 class LogDetectiveServiceError(Exception):
@@ -22,30 +24,39 @@ class LogDetectiveServiceError(Exception):
 class LogDetectiveClient:
     """日志侦探服务客户端封装。"""
 
-    def __init__(self, base_url: str | None = None) -> None:
+    def __init__(
+        self,
+        base_url: str | None = None,
+        http_client: httpx.AsyncClient | None = None,
+        policy: DownstreamPolicy | None = None,
+    ) -> None:
         self.base_url = base_url or str(settings.log_detective_base_url)
+        # 共享连接池客户端（由 dependencies 从 http_clients 注入），未注入时每次调用临时建连。
+        self.http_client = http_client
+        # 熔断策略（由 dependencies 从 downstream_policies 注入）；分析请求是 POST，不重试。
+        self.policy = policy
 
-    async def analyze_logs(self, log_request: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        调用日志侦探服务分析日志。
+    async def _post(self, url: str, **kwargs: Any) -> httpx.Response:
+        """经过熔断策略发送请求。"""
+        if self.policy is None:
+            return await self._send(url, **kwargs)
+        return await self.policy.call(lambda: self._send(url, **kwargs), idempotent=False)
 
-        Args:
-            log_request: 日志分析请求体，包含 log_text、profile、max_results 等字段
+    async def _send(self, url: str, **kwargs: Any) -> httpx.Response:
+        """发送一次请求：优先复用共享连接池。"""
+        if self.http_client is not None:
+            return await self.http_client.post(url, **kwargs)
+        async with httpx.AsyncClient(timeout=LOG_DETECTIVE_TIMEOUT, trust_env=False) as client:
+            return await client.post(url, **kwargs)
 
-        Returns:
-            分析结果字典，包含 summary、suspicious_ips、critical_errors 等
-
-        Raises:
-            LogDetectiveServiceError: 调用服务失败时抛出
-        """
+    async def _call_analyze(self, **kwargs: Any) -> httpx.Response:
+        """调用分析接口，把超时 / 状态码 / 网络错误统一转换成 LogDetectiveServiceError。"""
         # 网关只知道下游服务地址，不直接关心分析算法细节。
         url = f"{self.base_url}/internal/log-detective/analyze"
-
         try:
-            async with httpx.AsyncClient(timeout=30.0, trust_env=False) as client:
-                resp = await client.post(url, json=log_request)
-                resp.raise_for_status()
-                return resp.json()
+            resp = await self._post(url, **kwargs)
+            resp.raise_for_status()
+            return resp
         except httpx.TimeoutException as exc:
             raise LogDetectiveServiceError("日志分析服务超时") from exc
         except httpx.HTTPStatusError as exc:
@@ -56,7 +67,54 @@ class LogDetectiveClient:
             raise LogDetectiveServiceError(
                 f"调用日志分析服务失败：{str(exc)}"
             ) from exc
+
+    async def analyze_logs(self, log_request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        调用日志侦探服务分析日志。
+
+        Args:
+            log_request: 日志分析请求体，包含 log_text、profile、max_results 等字段
+
+        Returns:
+            分析结果字典，包含 summary、suspicious_ips、critical_errors 等
+
+        Raises:
+            LogDetectiveServiceError: 调用服务失败时抛出
+        """
+        resp = await self._call_analyze(json=log_request)
+        try:
+            return resp.json()
         except ValueError as exc:
             raise LogDetectiveServiceError(
                 "日志分析服务返回了非 JSON 格式的数据"
             ) from exc
+
+    async def analyze_logs_raw(
+        self,
+        body: bytes | AsyncIterable[bytes],
+        *,
+        content_type: str | None = None,
+        content_length: str | None = None,
+    ) -> bytes:
+        """
+        透传版本：请求体字节原样转发，返回下游响应体的原始 JSON 字节。
+
+        日志正文可能有几 MB，网关既不解析请求体，也不解析分析结果，
+        只检查返回内容看起来是 JSON 对象 / 数组，由调用方直接拼进响应外壳。
+
+        Args:
+            body: 请求体字节，或逐块读取的异步字节流（例如 Request.stream()）
+            content_type / content_length: 原请求的对应请求头，原样转发
+
+        Raises:
+            LogDetectiveServiceError: 调用服务失败或返回内容不是 JSON 时抛出
+        """
+        headers = {"Content-Type": content_type or "application/json"}
+        if content_length is not None:
+            # 带上长度就不会退化成 chunked 传输。
+            headers["Content-Length"] = content_length
+        resp = await self._call_analyze(content=body, headers=headers)
+        raw = resp.content
+        if raw.lstrip()[:1] not in (b"{", b"["):
+            raise LogDetectiveServiceError("日志分析服务返回了非 JSON 格式的数据")
+        return raw
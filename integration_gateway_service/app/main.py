@@ -12,16 +12,59 @@
 - 客户端 -> /gateway/backend/* -> backend_user_order_service
 """
 
-from fastapi import FastAPI
+import math
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
+
+from .config import settings
+from .http_clients import http_clients
+from .concurrency_limit import DownstreamOverloadedError
+from .log_audit_client import log_audit_client
+from .rate_limit import RateLimitHeadersMiddleware, rate_limiter
+from .resilience import CircuitOpenError
+from .user_cache import user_profile_cache
 from .routers import gateway
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """启动时为各下游创建共享连接池并启动审计日志上报任务，关闭时先发完审计日志再释放连接。"""
+    http_clients.start()
+    log_audit_client.start(http_clients.log_audit)
+    user_profile_cache.clear()
+    rate_limiter.start()
+    try:
+        yield
+    finally:
+        await log_audit_client.stop(timeout=settings.audit_shutdown_timeout)
+        await rate_limiter.aclose()
+        await http_clients.aclose()
+
+
+async def downstream_unavailable_handler(
+    request: Request, exc: CircuitOpenError | DownstreamOverloadedError
+) -> JSONResponse:
+    """下游熔断中或在途请求已满：立即返回 503，并通过 Retry-After 告诉调用方多久后再试。"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
+
+
 def create_app() -> FastAPI:
     """创建 FastAPI 应用实例，并挂载网关路由。"""
-    app = FastAPI(title="Integration Gateway Service", version="0.1.0")
+    app = FastAPI(title="Integration Gateway Service", version="0.1.0", lifespan=lifespan)
     # 当前网关的所有对外入口都集中在 routers/gateway.py 中。
     app.include_router(gateway.router)
+    # 任何下游熔断 / 过载都在这里统一转成 503，路由层不用逐个处理。
+    app.add_exception_handler(CircuitOpenError, downstream_unavailable_handler)
+    app.add_exception_handler(DownstreamOverloadedError, downstream_unavailable_handler)
+    # 限流依赖放行时记下的 X-RateLimit-* 响应头，在这里统一写到响应上。
+    app.add_middleware(RateLimitHeadersMiddleware)
     return app
 
 
@@ -0,0 +1,361 @@
+"""
+按用户 + 路由的令牌桶限流。
+
+调用关系：
+routers/gateway.py（router 级依赖）
+    -> dependencies.enforce_rate_limit(request, current_user)
+        -> rate_limiter.check(sub, "POST /gateway/log-detective/analyze")
+            - 该路由没有配置规则：不限流；
+            - 桶里还有令牌：取走一个，X-RateLimit-* 响应头由 RateLimitHeadersMiddleware 补上；
+            - 桶空了：抛 429，带 Retry-After 与 X-RateLimit-* 响应头。
+main.py lifespan
+    -> rate_limiter.start()   按 GATEWAY_RATE_LIMIT_BACKEND 创建存储后端
+    -> rate_limiter.aclose()  关闭 Redis 连接
+
+设计要点：
+- 每个（JWT sub，路由）一个令牌桶：规则 "10/60" 表示桶容量 10，每 60 秒匀速补满，
+  即允许 10 次突发、长期平均每 6 秒 1 次；规则通过 GATEWAY_RATE_LIMIT_RULES 按路由配置，
+  键为 "方法 路由模板"，"*" 表示所有未单独配置的路由；
+- memory 后端：进程内字典，单个网关实例时使用，lifespan 启动时清空；
+- redis 后端：多个网关实例共享同一个桶。默认用 Lua 脚本在 Redis 端一次完成“补充 + 取令牌”，
+  不支持脚本的 Redis 兼容服务可关闭 GATEWAY_RATE_LIMIT_REDIS_USE_LUA，
+  改用 WATCH/MULTI 乐观事务（冲突时重试）；两种方式都不会出现并发请求同时取到最后一个令牌；
+- 桶的时间戳使用网关的墙上时钟（time.time），多实例之间需要做好时钟同步；
+- Redis 不可用时放行请求（fail open）并计入 backend_errors，限流不应该让网关整体不可用。
+
+限流计数：GET /gateway/stats/rate-limit。
+"""
+
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .config import settings
+
+try:
+    from redis import asyncio as redis_asyncio  # type: ignore
+    from redis.exceptions import RedisError, WatchError  # type: ignore
+except ImportError:  # pragma: no cover
+    redis_asyncio = None  # 未安装 redis 时只能使用 memory 后端
+
+    class RedisError(Exception):  # type: ignore[no-redef]
+        """未安装 redis 时的占位异常，让 except 子句保持可用。"""
+
+    WatchError = RedisError  # type: ignore[misc]
+
+
+logger = logging.getLogger(__name__)
+
+# 所有未单独配置规则的路由共用的规则键。
+DEFAULT_ROUTE = "*"
+
+# Redis 中令牌桶的键前缀，完整的键形如 gateway:ratelimit:<sub>:<方法 路由模板>。
+REDIS_KEY_PREFIX = "gateway:ratelimit:"
+
+# WATCH/MULTI 模式下同一个键连续冲突的最大重试次数，超过按 Redis 错误处理（放行）。
+_MAX_WATCH_RETRIES = 20
+
+# 在 Redis 端一次完成“按经过时间补充令牌 + 尝试取走一个”，返回 {是否放行, 剩余令牌数}。
+# 令牌数是小数，Lua 数字返回给客户端会被截断成整数，所以转成字符串返回。
+_TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local ttl_ms = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil or ts == nil then
+    tokens = burst
+else
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+end
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], ttl_ms)
+return {allowed, tostring(tokens)}
+"""
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    """一条令牌桶规则：容量 burst，每 period_seconds 秒匀速补满。"""
+
+    burst: int
+    period_seconds: float
+
+    @property
+    def rate(self) -> float:
+        """每秒补充的令牌数。"""
+        return self.burst / self.period_seconds
+
+    @property
+    def ttl_ms(self) -> int:
+        """桶从空到满所需的时间；超过这个时间没有请求，桶一定是满的，存储里的状态可以丢掉。"""
+        return int(math.ceil(self.period_seconds * 1000))
+
+    @classmethod
+    def parse(cls, text: str) -> "RateLimitRule":
+        """解析 "次数/秒数" 形式的规则，例如 "10/60"。"""
+        try:
+            burst_text, period_text = text.split("/")
+            rule = cls(burst=int(burst_text), period_seconds=float(period_text))
+        except ValueError:
+            raise ValueError(f"限流规则格式错误：{text!r}，应为 \"次数/秒数\"，例如 \"10/60\"")
+        if rule.burst < 1 or rule.period_seconds <= 0:
+            raise ValueError(f"限流规则格式错误：{text!r}，次数和秒数都必须大于 0")
+        return rule
+
+    def __str__(self) -> str:
+        return f"{self.burst}/{self.period_seconds:g}"
+
+
+@dataclass(frozen=True)
+class RateLimitDecision:
+    """一次限流判断的结果，以及需要写回给调用方的响应头。"""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float
+    reset_after: float
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(int(math.ceil(self.reset_after))),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, int(math.ceil(self.retry_after))))
+        return headers
+
+
+def _refill_and_take(
+    tokens: Optional[float], updated_at: Optional[float], rule: RateLimitRule, now: float
+) -> Tuple[bool, float]:
+    """按经过的时间补充令牌并尝试取走一个，返回（是否放行，剩余令牌数）。与 Lua 脚本的逻辑一致。"""
+    if tokens is None or updated_at is None:
+        tokens = float(rule.burst)
+    else:
+        tokens = min(float(rule.burst), tokens + max(0.0, now - updated_at) * rule.rate)
+    if tokens >= 1:
+        return True, tokens - 1
+    return False, tokens
+
+
+def _decision(allowed: bool, tokens: float, rule: RateLimitRule) -> RateLimitDecision:
+    return RateLimitDecision(
+        allowed=allowed,
+        limit=rule.burst,
+        remaining=int(math.floor(tokens)),
+        retry_after=0.0 if allowed else (1 - tokens) / rule.rate,
+        reset_after=(rule.burst - tokens) / rule.rate,
+    )
+
+
+class MemoryTokenBucketBackend:
+    """进程内令牌桶：键 -> (剩余令牌数, 上次更新时间)，数量有上限，超出按 LRU 淘汰。"""
+
+    name = "memory"
+
+    def __init__(self, max_keys: int = 100_000) -> None:
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, rule: RateLimitRule, now: float) -> Tuple[bool, float]:
+        # 读、算、写之间没有 await，在事件循环里天然是原子的。
+        tokens, updated_at = self._buckets.get(key, (None, None))
+        allowed, tokens = _refill_and_take(tokens, updated_at, rule, now)
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            # 最久没有请求的桶最可能已经补满，丢掉等价于“重新给满桶”。
+            self._buckets.popitem(last=False)
+        return allowed, tokens
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    async def aclose(self) -> None:
+        self.clear()
+
+
+class RedisTokenBucketBackend:
+    """Redis 令牌桶：多个网关实例共享；Lua 脚本或 WATCH/MULTI 保证“补充 + 取令牌”的原子性。"""
+
+    name = "redis"
+
+    def __init__(
+        self, client: Any, *, use_lua: bool = True, key_prefix: str = REDIS_KEY_PREFIX
+    ) -> None:
+        self._client = client
+        self.use_lua = use_lua
+        self.key_prefix = key_prefix
+        self._script = client.register_script(_TOKEN_BUCKET_LUA) if use_lua else None
+
+    async def take(self, key: str, rule: RateLimitRule, now: float) -> Tuple[bool, float]:
+        redis_key = self.key_prefix + key
+        if self._script is not None:
+            allowed, tokens = await self._script(
+                keys=[redis_key], args=[rule.rate, rule.burst, now, rule.ttl_ms]
+            )
+            return bool(int(allowed)), float(tokens)
+        return await self._take_with_transaction(redis_key, rule, now)
+
+    async def _take_with_transaction(
+        self, redis_key: str, rule: RateLimitRule, now: float
+    ) -> Tuple[bool, float]:
+        """WATCH 住桶、在客户端计算、MULTI/EXEC 写回；期间桶被别人改过则 EXEC 失败并重试。"""
+        async with self._client.pipeline(transaction=True) as pipe:
+            for _ in range(_MAX_WATCH_RETRIES):
+                try:
+                    await pipe.watch(redis_key)
+                    raw_tokens, raw_ts = await pipe.hmget(redis_key, "tokens", "ts")
+                    allowed, tokens = _refill_and_take(
+                        float(raw_tokens) if raw_tokens is not None else None,
+                        float(raw_ts) if raw_ts is not None else None,
+                        rule,
+                        now,
+                    )
+                    pipe.multi()
+                    pipe.hset(redis_key, mapping={"tokens": repr(tokens), "ts": repr(now)})
+                    pipe.pexpire(redis_key, rule.ttl_ms)
+                    await pipe.execute()
+                    return allowed, tokens
+                except WatchError:
+                    continue
+        raise WatchError(f"限流键 {redis_key} 冲突过于频繁")
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+def parse_rules(rules: Dict[str, str]) -> Dict[str, RateLimitRule]:
+    """把配置里的 {"方法 路由模板": "次数/秒数"} 解析成规则对象。"""
+    return {route: RateLimitRule.parse(text) for route, text in rules.items()}
+
+
+def build_backend() -> Any:
+    """按配置创建存储后端；要求 redis 但未安装 redis 库或未配置地址时退回 memory。"""
+    if settings.rate_limit_backend == "redis":
+        if redis_asyncio is None:
+            logger.warning(
+                "GATEWAY_RATE_LIMIT_BACKEND=redis 但未安装 redis 库，限流退回进程内存储"
+            )
+        elif not settings.rate_limit_redis_url:
+            logger.warning(
+                "GATEWAY_RATE_LIMIT_BACKEND=redis 但未配置 GATEWAY_RATE_LIMIT_REDIS_URL，"
+                "限流退回进程内存储"
+            )
+        else:
+            client = redis_asyncio.Redis.from_url(settings.rate_limit_redis_url)
+            return RedisTokenBucketBackend(client, use_lua=settings.rate_limit_redis_use_lua)
+    return MemoryTokenBucketBackend()
+
+
+class RateLimiter:
+    """按（用户，路由）查规则、调用存储后端，并累计限流指标。"""
+
+    def __init__(
+        self,
+        rules: Dict[str, str],
+        backend: Any = None,
+        *,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.rules = parse_rules(rules)
+        self.backend = backend if backend is not None else MemoryTokenBucketBackend()
+        self._clock = clock
+
+        self.allowed_total = 0
+        self.limited_total = 0
+        self.backend_errors = 0
+        self.limited_by_route: Dict[str, int] = {}
+
+    def start(self) -> None:
+        """按配置创建存储后端（lifespan 启动时调用，进程内的桶随之清空）。"""
+        self.backend = build_backend()
+
+    async def aclose(self) -> None:
+        """释放存储后端持有的连接。"""
+        await self.backend.aclose()
+
+    def rule_for(self, route: str) -> Optional[RateLimitRule]:
+        """返回路由对应的规则，没有单独配置时使用 "*"，都没有则不限流。"""
+        return self.rules.get(route) or self.rules.get(DEFAULT_ROUTE)
+
+    async def check(self, identity: str, route: str) -> Optional[RateLimitDecision]:
+        """为 identity 在 route 上取一个令牌；路由不限流或存储后端出错时返回 None（放行）。"""
+        rule = self.rule_for(route)
+        if rule is None:
+            return None
+        try:
+            allowed, tokens = await self.backend.take(f"{identity}:{route}", rule, self._clock())
+        except RedisError:
+            self.backend_errors += 1
+            logger.warning("限流存储访问失败，本次请求直接放行", exc_info=True)
+            return None
+        if allowed:
+            self.allowed_total += 1
+        else:
+            self.limited_total += 1
+            self.limited_by_route[route] = self.limited_by_route.get(route, 0) + 1
+        return _decision(allowed, tokens, rule)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回后端类型、生效规则与放行 / 限流 / 后端错误计数。"""
+        return {
+            "enabled": settings.rate_limit_enabled,
+            "backend": self.backend.name,
+            "rules": {route: str(rule) for route, rule in self.rules.items()},
+            "allowed_total": self.allowed_total,
+            "limited_total": self.limited_total,
+            "limited_by_route": dict(self.limited_by_route),
+            "backend_errors": self.backend_errors,
+        }
+
+
+class RateLimitHeadersMiddleware:
+    """
+    把放行请求的 X-RateLimit-* 响应头写到最终响应上。
+
+    限流判断发生在依赖里，但有的路由直接返回 Response 对象（例如日志分析透传），
+    依赖里注入的 Response 上设置的头不会被带出去，所以由依赖把结果放进 request.state，
+    这里在响应开始发送时补上。被限流的 429 响应自带这些头，不经过这里。
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                decision = scope.get("state", {}).get("rate_limit")
+                if decision is not None:
+                    extra: List[Tuple[bytes, bytes]] = [
+                        (name.lower().encode("latin-1"), value.encode("latin-1"))
+                        for name, value in decision.headers().items()
+                    ]
+                    message["headers"] = list(message.get("headers", [])) + extra
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+rate_limiter = RateLimiter(settings.rate_limit_rules)
+# 模块级单例：enforce_rate_limit 依赖调用，lifespan 负责创建 / 关闭存储后端，统计接口读取。
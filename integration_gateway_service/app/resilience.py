@@ -0,0 +1,355 @@
+"""
+下游调用的熔断、重试与对冲请求。
+
+调用关系：
+dependencies.get_backend_client / get_log_detective_client
+    -> 注入 downstream_policies.backend / downstream_policies.log_detective
+AsyncBackendServiceClient._request / LogDetectiveClient._post
+    -> DownstreamPolicy.call(send, idempotent=...)
+        -> CircuitBreaker.before_call()      熔断打开时直接抛 CircuitOpenError（main.py 转成 503）
+        -> 幂等 GET：失败按带抖动的指数退避重试；可选在 p95 延迟后发出对冲请求
+        -> 每次真正发送经过 AdaptiveConcurrencyLimiter（concurrency_limit.py），超出在途上限时 503
+        -> CircuitBreaker.record_success() / record_failure()
+
+设计要点：
+- 每个下游一个熔断器：按秒分桶统计最近 GATEWAY_BREAKER_WINDOW_SECONDS 秒的请求，
+  请求数达到 GATEWAY_BREAKER_MIN_REQUESTS 且失败率达到阈值时打开；
+  打开 GATEWAY_BREAKER_OPEN_SECONDS 秒后进入半开，只放行少量探测请求，探测成功则关闭、失败则重新打开；
+- “失败”指连接 / 超时等传输错误和 5xx 响应；4xx 是调用方的问题，不计入失败率；
+- 只有幂等的 GET 才会重试和对冲，POST（下单、日志分析）最多发送一次；
+- 一次逻辑调用（含重试）只向熔断器记录一次结果；
+- 对冲默认关闭（GATEWAY_HEDGE_ENABLED）：样本足够后，首个请求超过近期 p95 延迟仍未返回时
+  再发一个相同请求，先成功的为准，另一个取消。
+
+熔断器状态与重试 / 对冲计数：GET /gateway/stats/breakers。
+"""
+
+import asyncio
+import math
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+import httpx
+
+from .concurrency_limit import AdaptiveConcurrencyLimiter, build_limiter
+from .config import settings
+
+
+Send = Callable[[], Awaitable[httpx.Response]]
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开时拒绝调用下游，由 main.py 统一转换为 503。"""
+
+    def __init__(self, downstream: str, retry_after: float) -> None:
+        super().__init__(f"下游服务 {downstream} 暂不可用（熔断中），请稍后重试")
+        self.downstream = downstream
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """基于滚动窗口失败率的熔断器。"""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        window_seconds: float,
+        min_requests: int,
+        error_rate_threshold: float,
+        open_seconds: float,
+        half_open_probes: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_requests = min_requests
+        self.error_rate_threshold = error_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        # 每个元素为 [秒级时间桶, 请求数, 失败数]。
+        self._buckets: Deque[List[int]] = deque()
+
+        self.opened_total = 0
+        self.rejected_total = 0
+
+    def _trim(self, now: float) -> None:
+        oldest = int(now - self.window_seconds)
+        while self._buckets and self._buckets[0][0] <= oldest:
+            self._buckets.popleft()
+
+    def _window_counts(self, now: float) -> tuple:
+        self._trim(now)
+        total = sum(bucket[1] for bucket in self._buckets)
+        failures = sum(bucket[2] for bucket in self._buckets)
+        return total, failures
+
+    def _add(self, now: float, failed: bool) -> None:
+        second = int(now)
+        if not self._buckets or self._buckets[-1][0] != second:
+            self._buckets.append([second, 0, 0])
+        self._buckets[-1][1] += 1
+        if failed:
+            self._buckets[-1][2] += 1
+
+    def _open(self, now: float) -> None:
+        self.state = OPEN
+        self._opened_at = now
+        self._probes_in_flight = 0
+        self.opened_total += 1
+
+    def before_call(self) -> None:
+        """调用下游前检查；熔断打开或半开探测名额已满时抛出 CircuitOpenError。"""
+        now = self._clock()
+        if self.state == OPEN:
+            remaining = self._opened_at + self.open_seconds - now
+            if remaining > 0:
+                self.rejected_total += 1
+                raise CircuitOpenError(self.name, remaining)
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_probes:
+                self.rejected_total += 1
+                raise CircuitOpenError(self.name, self.open_seconds)
+            self._probes_in_flight += 1
+
+    def record_success(self) -> None:
+        now = self._clock()
+        if self.state == HALF_OPEN:
+            # 探测成功：关闭熔断，从干净的窗口重新统计。
+            self.state = CLOSED
+            self._probes_in_flight = 0
+            self._buckets.clear()
+        self._add(now, failed=False)
+
+    def record_failure(self) -> None:
+        now = self._clock()
+        if self.state == HALF_OPEN:
+            self._open(now)
+            return
+        self._add(now, failed=True)
+        total, failures = self._window_counts(now)
+        if total >= self.min_requests and failures / total >= self.error_rate_threshold:
+            self._open(now)
+
+    def release(self) -> None:
+        """调用被取消、没有结果可记录时，归还半开探测名额。"""
+        if self.state == HALF_OPEN and self._probes_in_flight > 0:
+            self._probes_in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        now = self._clock()
+        total, failures = self._window_counts(now)
+        return {
+            "state": self.state,
+            "window_requests": total,
+            "window_failures": failures,
+            "error_rate": round(failures / total, 4) if total else 0.0,
+            "open_remaining_seconds": (
+                round(max(0.0, self._opened_at + self.open_seconds - now), 3)
+                if self.state == OPEN
+                else 0.0
+            ),
+            "opened_total": self.opened_total,
+            "rejected_total": self.rejected_total,
+        }
+
+
+class LatencyTracker:
+    """保存最近若干次成功请求的耗时，用于计算对冲延迟。"""
+
+    def __init__(self, size: int = 200) -> None:
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, math.ceil(len(ordered) * pct / 100) - 1)]
+
+
+def _is_failure(resp: httpx.Response) -> bool:
+    return resp.status_code >= 500
+
+
+class DownstreamPolicy:
+    """单个下游的调用策略：熔断 + 幂等请求重试 + 可选对冲。"""
+
+    def __init__(
+        self,
+        breaker: CircuitBreaker,
+        *,
+        max_attempts: int,
+        base_delay_ms: int,
+        max_delay_ms: int,
+        hedge_enabled: bool,
+        hedge_min_samples: int,
+        limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+    ) -> None:
+        self.breaker = breaker
+        self.limiter = limiter
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay_ms / 1000
+        self.max_delay = max_delay_ms / 1000
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_samples = hedge_min_samples
+        self.latency = LatencyTracker()
+
+        self.retries_total = 0
+        self.hedged_total = 0
+        self.hedge_wins = 0
+
+    def _backoff(self, attempt: int) -> float:
+        """full jitter：在 [0, min(上限, 基数 * 2^attempt)] 内随机等待，避免重试扎堆。"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2**attempt)))
+
+    async def call(self, send: Send, *, idempotent: bool) -> httpx.Response:
+        """
+        经过熔断器发送一次逻辑请求。
+
+        返回下游响应（可能是 4xx / 5xx，由调用方按原有逻辑处理）；传输错误在重试用尽后原样抛出。
+        """
+        self.breaker.before_call()
+        recorded = False
+        try:
+            attempts = self.max_attempts if idempotent else 1
+            attempt = 0
+            while True:
+                last_attempt = attempt == attempts - 1
+                try:
+                    if idempotent and self.hedge_enabled:
+                        resp = await self._send_hedged(send)
+                    else:
+                        resp = await self._send_timed(send)
+                except httpx.TransportError:
+                    if last_attempt:
+                        recorded = True
+                        self.breaker.record_failure()
+                        raise
+                else:
+                    if not _is_failure(resp) or last_attempt:
+                        recorded = True
+                        if _is_failure(resp):
+                            self.breaker.record_failure()
+                        else:
+                            self.breaker.record_success()
+                        return resp
+                self.retries_total += 1
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+        finally:
+            if not recorded:
+                self.breaker.release()
+
+    async def _send_timed(self, send: Send) -> httpx.Response:
+        started = time.perf_counter()
+        if self.limiter is not None and settings.concurrency_limit_enabled:
+            resp = await self.limiter.run(send)
+        else:
+            resp = await send()
+        if not _is_failure(resp):
+            self.latency.add(time.perf_counter() - started)
+        return resp
+
+    async def _send_hedged(self, send: Send) -> httpx.Response:
+        """首个请求超过近期 p95 仍未返回时再发一个，先成功的为准。"""
+        if len(self.latency) < self.hedge_min_samples:
+            return await self._send_timed(send)
+        delay = self.latency.percentile(95)
+        primary = asyncio.ensure_future(self._send_timed(send))
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+            self.hedged_total += 1
+            hedge = asyncio.ensure_future(self._send_timed(send))
+            pending = {primary, hedge}
+            finished: Optional[asyncio.Future] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    finished = task
+                    if task.exception() is None and not _is_failure(task.result()):
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+            # 两个都失败：按最后完成的那个返回 / 抛出。
+            return finished.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.latency.percentile(95)
+        return {
+            **self.breaker.stats(),
+            "retries_total": self.retries_total,
+            "hedge_enabled": self.hedge_enabled,
+            "hedged_total": self.hedged_total,
+            "hedge_wins": self.hedge_wins,
+            "latency_p95_ms": round(p95 * 1000, 3) if p95 is not None else None,
+        }
+
+
+def build_policy(name: str) -> DownstreamPolicy:
+    """按配置为某个下游创建调用策略。"""
+    return DownstreamPolicy(
+        CircuitBreaker(
+            name,
+            window_seconds=settings.breaker_window_seconds,
+            min_requests=settings.breaker_min_requests,
+            error_rate_threshold=settings.breaker_error_rate_threshold,
+            open_seconds=settings.breaker_open_seconds,
+            half_open_probes=settings.breaker_half_open_probes,
+        ),
+        max_attempts=settings.retry_max_attempts,
+        base_delay_ms=settings.retry_base_delay_ms,
+        max_delay_ms=settings.retry_max_delay_ms,
+        hedge_enabled=settings.hedge_enabled,
+        hedge_min_samples=settings.hedge_min_samples,
+        limiter=build_limiter(name),
+    )
+
+
+class DownstreamPolicies:
+    """各下游的调用策略。"""
+
+    def __init__(self) -> None:
+        self.backend = build_policy("backend")
+        self.log_detective = build_policy("log_detective")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend.stats(),
+            "log_detective": self.log_detective.stats(),
+        }
+
+    def concurrency_stats(self) -> Dict[str, Any]:
+        """各下游在途请求上限控制器的状态。"""
+        return {
+            "enabled": settings.concurrency_limit_enabled,
+            "backend": self.backend.limiter.stats(),
+            "log_detective": self.log_detective.limiter.stats(),
+        }
+
+
+downstream_policies = DownstreamPolicies()
+# 模块级单例：熔断状态需要跨请求共享，dependencies 注入到各客户端，统计接口读取。
@@ -7,26 +7,42 @@ RBAC 风格的认证与“由网关补充用户信息”的典型模式。
 
 from typing import Any, Dict
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 
-from ..dependencies import get_backend_client, get_log_detective_client, CurrentUserPayload
-from ..schemas import ApiResponse, OrderCreateIn, OrderOut
-from ..client_backend_service import BackendServiceClient, BackendServiceError
+from ..dependencies import (
+    get_backend_client,
+    get_log_detective_client,
+    enforce_rate_limit,
+    CurrentUserPayload,
+)
+from ..schemas import ApiResponse, OrderCreateIn, OrderOut, UsersBatchIn
+from ..client_backend_service import AsyncBackendServiceClient, BackendServiceError
 from ..log_detective_client import LogDetectiveClient, LogDetectiveServiceError
 from ..log_audit_client import log_audit_client
+from ..http_clients import http_clients
+from ..jwt_cache import verified_token_cache
+from ..rate_limit import rate_limiter
+from ..resilience import downstream_policies
+from ..user_batch import fetch_users
+from ..user_cache import user_profile_cache
 from ..config import settings
 
 
-router = APIRouter(prefix="/gateway", tags=["gateway"])
+# 所有网关路由都经过限流依赖；哪些路由真正限流由 GATEWAY_RATE_LIMIT_RULES 决定。
+router = APIRouter(prefix="/gateway", tags=["gateway"], dependencies=[Depends(enforce_rate_limit)])
+
+# 日志分析透传时的统一响应外壳，下游 JSON 原样放在中间作为 data。
+_ENVELOPE_PREFIX = b'{"success":true,"data":'
+_ENVELOPE_SUFFIX = b',"error":null}'
 # 这里是所有“前端可见 / 客户端可见”的网关入口集合。
 
 
 # 网关代理查询用户：适合演示“JWT 已校验 -> 请求转发到下游服务”的最短链路。
 @router.get("/backend/users/{user_id}", response_model=ApiResponse)
-def proxy_get_user(
+async def proxy_get_user(
     user_id: int,
     current_user: CurrentUserPayload,
-    backend_client: BackendServiceClient = Depends(get_backend_client),
+    backend_client: AsyncBackendServiceClient = Depends(get_backend_client),
 ) -> ApiResponse:
     """
     代理调用下游用户服务的查询接口。
@@ -34,9 +50,16 @@ def proxy_get_user(
     仅作为示例：调用前会校验当前用户的身份，再转发请求。
     """
     # 这里可以根据 current_user 中的角色/权限做更细粒度控制，此处先只要求登录成功。
-    # 链路：router -> BackendServiceClient.get_user() -> backend_user_order_service
+    # 链路：router -> AsyncBackendServiceClient.get_user() -> backend_user_order_service
+    # 等待下游时不占线程，并发上限由连接池决定，而不是线程池。
+    # 用户资料很少变化：先查网关缓存，同一用户的并发未命中只会发一次下游请求。
     try:
-        user_data: Dict[str, Any] = backend_client.get_user(user_id)
+        if settings.user_cache_enabled:
+            user_data: Dict[str, Any] = await user_profile_cache.get(
+                user_id, lambda: backend_client.get_user(user_id)
+            )
+        else:
+            user_data = await backend_client.get_user(user_id)
     except BackendServiceError as exc:
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
@@ -46,13 +69,49 @@ def proxy_get_user(
     return ApiResponse(success=True, data=user_data)
 
 
+# 批量查询用户：前端渲染订单列表时一次拿到所有下单人，不再逐个调用上面的单用户接口。
+@router.post("/backend/users:batch", response_model=ApiResponse)
+async def proxy_get_users_batch(
+    batch_in: UsersBatchIn,
+    current_user: CurrentUserPayload,
+    backend_client: AsyncBackendServiceClient = Depends(get_backend_client),
+) -> ApiResponse:
+    """
+    批量查询用户信息，结果按用户 ID 返回。
+
+    重复的 ID 只查一次；命中网关缓存的直接返回，其余并发查询下游（或走下游批量接口）。
+    单个用户查询失败不影响其他用户，失败原因放在 data.errors 中。
+    """
+    unique_count = len(set(batch_in.ids))
+    if unique_count > settings.users_batch_max_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"一次最多查询 {settings.users_batch_max_ids} 个用户",
+        )
+    data = await fetch_users(batch_in.ids, backend_client)
+    return ApiResponse(success=True, data=data)
+
+
+# 用户资料变更后的主动失效入口：后台系统改完用户信息可以调用这里，不必等缓存过期。
+@router.delete("/backend/users/{user_id}/cache", response_model=ApiResponse)
+async def invalidate_user_cache(user_id: int, current_user: CurrentUserPayload) -> ApiResponse:
+    """让某个用户的网关缓存立即失效（仅超级管理员）。"""
+    if not current_user.get("is_superuser"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="权限不足，无法清除用户缓存",
+        )
+    invalidated = user_profile_cache.invalidate(user_id)
+    return ApiResponse(success=True, data={"user_id": user_id, "invalidated": invalidated})
+
+
 # 网关代理创建订单：除了转发，还会补当前登录用户 ID，并尝试写审计日志。
 @router.post("/backend/orders", response_model=ApiResponse, status_code=status.HTTP_201_CREATED)
-def proxy_create_order(
+async def proxy_create_order(
     order_in: OrderCreateIn,
     current_user: CurrentUserPayload,
     request: Request,
-    backend_client: BackendServiceClient = Depends(get_backend_client),
+    backend_client: AsyncBackendServiceClient = Depends(get_backend_client),
 ) -> ApiResponse:
     """
     代理调用下游订单服务的创建订单接口。
@@ -97,14 +156,14 @@ def proxy_create_order(
     )
 
     try:
-        order_out: OrderOut = backend_client.create_order(enriched_order)
+        order_out: OrderOut = await backend_client.create_order(enriched_order)
     except BackendServiceError as exc:
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail=str(exc),
         ) from exc
 
-    # 上报通过网关创建订单的审计日志（失败时静默忽略）。
+    # 上报通过网关创建订单的审计日志：只入队，由后台任务批量发送，不增加接口延迟。
     # 这条日志最终会落到 log_audit_service。
     client_host = request.client.host if request.client else None
     log_audit_client.send_log(
@@ -126,21 +185,23 @@ async def analyze_logs(
     request: Request,
     current_user: CurrentUserPayload,
     log_detective_client: LogDetectiveClient = Depends(get_log_detective_client),
-) -> ApiResponse:
+) -> Response:
     """
     转发日志分析请求到日志侦探服务。
 
     教学用：演示网关转发模式
     - 验证用户身份（JWT）
     - 转发到日志侦探服务
-    - 统一错误处理和响应包装
+    - 统一错误处理和响应包装（字节级透传，不解析 JSON）
     """
-    # 这里不在网关层解析日志字段细节，而是原样读取请求体并转发。
-    # 网关转发日志分析：前端传什么 body，这里基本原样交给下游日志侦探服务。
-    body = await request.json()
-
+    # 透传：请求体字节边读边转发给下游，下游返回的 JSON 字节直接拼进统一响应外壳，
+    # 网关全程不做 JSON 解析 / 序列化（日志正文可能有几 MB）。
     try:
-        result = await log_detective_client.analyze_logs(body)
+        raw_result = await log_detective_client.analyze_logs_raw(
+            request.stream(),
+            content_type=request.headers.get("content-type"),
+            content_length=request.headers.get("content-length"),
+        )
     except LogDetectiveServiceError as exc:
         # 根据错误类型返回不同的 HTTP 状态码
         if "超时" in str(exc):
@@ -153,4 +214,59 @@ async def analyze_logs(
             detail=str(exc),
         ) from exc
 
-    return ApiResponse(success=True, data=result)
+    # 与 ApiResponse(success=True, data=...) 序列化后的结构一致。
+    return Response(
+        content=_ENVELOPE_PREFIX + raw_result + _ENVELOPE_SUFFIX,
+        media_type="application/json",
+    )
+
+
+@router.get("/stats/http-pools", response_model=ApiResponse)
+def http_pool_stats(current_user: CurrentUserPayload) -> ApiResponse:
+    """
+    查看各下游共享连接池的统计信息。
+
+    connections 远小于 requests 说明连接在被复用；active 长时间贴近 max_connections
+    说明连接池已成为瓶颈，可以调大 GATEWAY_DOWNSTREAM_MAX_CONNECTIONS。
+    """
+    return ApiResponse(success=True, data=http_clients.stats())
+
+
+@router.get("/stats/audit-shipper", response_model=ApiResponse)
+def audit_shipper_stats(current_user: CurrentUserPayload) -> ApiResponse:
+    """查看审计日志上报队列的统计信息（队列深度、上报 / 丢弃 / 失败计数、上报延迟）。"""
+    return ApiResponse(success=True, data=log_audit_client.stats())
+
+
+@router.get("/stats/jwt-cache", response_model=ApiResponse)
+def jwt_cache_stats(current_user: CurrentUserPayload) -> ApiResponse:
+    """查看 JWT 验证缓存的统计信息（大小、命中率、淘汰 / 过期计数）。"""
+    return ApiResponse(success=True, data=verified_token_cache.stats())
+
+
+@router.get("/stats/user-cache", response_model=ApiResponse)
+def user_cache_stats(current_user: CurrentUserPayload) -> ApiResponse:
+    """查看用户信息缓存的统计信息（命中 / 旧值命中 / 负缓存命中、合并的请求数等）。"""
+    return ApiResponse(success=True, data=user_profile_cache.stats())
+
+
+@router.get("/stats/breakers", response_model=ApiResponse)
+def breaker_stats(current_user: CurrentUserPayload) -> ApiResponse:
+    """查看各下游熔断器状态、窗口失败率以及重试 / 对冲计数。"""
+    return ApiResponse(success=True, data=downstream_policies.stats())
+
+
+@router.get("/stats/concurrency", response_model=ApiResponse)
+def concurrency_stats(current_user: CurrentUserPayload) -> ApiResponse:
+    """
+    查看各下游的在途请求上限、当前在途 / 排队数以及被拒绝（503）的次数。
+
+    limit 持续贴着 min_limit 说明下游已经很慢；shed_total 增长说明请求量超过了下游当前的承载能力。
+    """
+    return ApiResponse(success=True, data=downstream_policies.concurrency_stats())
+
+
+@router.get("/stats/rate-limit", response_model=ApiResponse)
+def rate_limit_stats(current_user: CurrentUserPayload) -> ApiResponse:
+    """查看限流存储后端、生效规则以及放行 / 限流 / 存储错误计数。"""
+    return ApiResponse(success=True, data=rate_limiter.stats())
@@ -11,7 +11,7 @@
 """
 
 from datetime import datetime
-from typing import Any, Optional
+from typing import Any, List, Optional
 from pydantic import BaseModel, Field
 
 
@@ -32,6 +32,12 @@ class OrderOut(BaseModel):
     created_at: datetime = Field(..., description="订单创建时间")
 
 
+class UsersBatchIn(BaseModel):
+    """批量查询用户入参模型，重复的 ID 只查询一次。"""
+
+    ids: List[int] = Field(..., min_length=1, description="要查询的用户 ID 列表")
+
+
 class ApiResponse(BaseModel):
     """统一 API 响应包装结构。"""
 
@@ -0,0 +1,149 @@
+"""
+批量查询用户（POST /gateway/backend/users:batch）。
+
+调用关系：
+routers/gateway.py (proxy_get_users_batch)
+    -> fetch_users(user_ids, backend_client)
+        -> 去重后每个 ID 走 user_profile_cache.get(user_id, loader)：命中直接返回，
+           与同时进行的单个查询之间同样 single-flight；
+        -> 未命中时的 loader：
+            - GATEWAY_BACKEND_USERS_BATCH_API 开启：UserBatchLoader 把同一轮里的未命中合并成
+              POST /api/users/batch（每次最多 DOWNSTREAM_BATCH_MAX_IDS 个）；
+            - 否则：逐个 GET /api/users/{user_id}，
+              同时进行的下游请求数受 GATEWAY_USERS_BATCH_CONCURRENCY 限制。
+
+设计要点：
+- 信号量只包住下游调用，缓存命中的用户不用排队；
+- 批量接口没有返回的用户按 404 处理，与单个查询一样进入负缓存；
+- 单个用户失败不影响其他用户：结果按 ID 分成 users / errors 两部分返回，
+  errors 中的 status_code 为 404（用户不存在）、502（下游出错）或 503（下游熔断 / 繁忙）；
+  其他意外异常记日志后同样按 502 返回，不会让整批请求变成 500。
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Set
+
+from .client_backend_service import AsyncBackendServiceClient, BackendServiceError
+from .concurrency_limit import DownstreamOverloadedError
+from .config import settings
+from .resilience import CircuitOpenError
+from .user_cache import user_profile_cache
+
+
+logger = logging.getLogger(__name__)
+
+# 与 backend_user_order_service 中 UsersBatchIn 的上限一致，超出的部分拆成多次批量查询。
+DOWNSTREAM_BATCH_MAX_IDS = 100
+
+FetchMany = Callable[[List[int]], Awaitable[List[Dict[str, Any]]]]
+
+
+class UserBatchLoader:
+    """把同一轮事件循环里发起的单用户查询合并成下游批量查询（DataLoader 模式）。"""
+
+    def __init__(
+        self, fetch_many: FetchMany, max_batch_size: int = DOWNSTREAM_BATCH_MAX_IDS
+    ) -> None:
+        self._fetch_many = fetch_many
+        self.max_batch_size = max_batch_size
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._scheduled = False
+        # 持有批量请求任务的引用，避免任务在完成前被回收。
+        self._tasks: Set[asyncio.Task] = set()
+        self.batch_calls = 0
+
+    async def load(self, user_id: int) -> Dict[str, Any]:
+        """登记一个待查询的用户，等本轮的批量查询返回。"""
+        future = self._pending.get(user_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[user_id] = future
+        if not self._scheduled:
+            self._scheduled = True
+            # call_soon 排在本轮已就绪的任务之后，同一轮里的其他查询都能登记进来。
+            asyncio.get_running_loop().call_soon(self._dispatch)
+        return await future
+
+    def _dispatch(self) -> None:
+        pending, self._pending, self._scheduled = self._pending, {}, False
+        user_ids = list(pending)
+        for start in range(0, len(user_ids), self.max_batch_size):
+            chunk_ids = user_ids[start : start + self.max_batch_size]
+            chunk = {user_id: pending[user_id] for user_id in chunk_ids}
+            task = asyncio.ensure_future(self._run(chunk))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, chunk: Dict[int, asyncio.Future]) -> None:
+        self.batch_calls += 1
+        try:
+            users = await self._fetch_many(list(chunk))
+        except asyncio.CancelledError:
+            for future in chunk.values():
+                future.cancel()
+            raise
+        except Exception as exc:
+            for future in chunk.values():
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        found = {user["id"]: user for user in users if isinstance(user, dict) and "id" in user}
+        for user_id, future in chunk.items():
+            if future.done():
+                continue
+            if user_id in found:
+                future.set_result(found[user_id])
+            else:
+                # 与单个查询时下游返回 404 的错误保持一致，才能进入负缓存。
+                future.set_exception(
+                    BackendServiceError("调用后端服务失败，状态码：404", status_code=404)
+                )
+
+
+def _error_detail(user_id: int, exc: BaseException) -> Dict[str, Any]:
+    """把单个用户的查询异常转换成返回给调用方的错误信息。"""
+    if isinstance(exc, (CircuitOpenError, DownstreamOverloadedError)):
+        return {"status_code": 503, "detail": str(exc)}
+    if isinstance(exc, BackendServiceError):
+        return {"status_code": 404 if exc.status_code == 404 else 502, "detail": str(exc)}
+    if not isinstance(exc, Exception):
+        # 取消等非业务异常照常向上抛。
+        raise exc
+    logger.error("批量查询用户 %s 时出现意外异常", user_id, exc_info=exc)
+    return {"status_code": 502, "detail": "调用后端服务失败"}
+
+
+async def fetch_users(
+    user_ids: List[int], backend_client: AsyncBackendServiceClient
+) -> Dict[str, Dict[str, Any]]:
+    """去重后查询一批用户，返回 {"users": {id: 用户信息}, "errors": {id: 错误信息}}。"""
+    unique_ids = list(dict.fromkeys(user_ids))
+
+    if settings.backend_users_batch_api:
+        load_one = UserBatchLoader(backend_client.get_users_batch).load
+    else:
+        semaphore = asyncio.Semaphore(settings.users_batch_concurrency)
+
+        async def load_one(user_id: int) -> Dict[str, Any]:
+            async with semaphore:
+                return await backend_client.get_user(user_id)
+
+    async def fetch(user_id: int) -> Dict[str, Any]:
+        if settings.user_cache_enabled:
+            return await user_profile_cache.get(user_id, lambda: load_one(user_id))
+        return await load_one(user_id)
+
+    results = await asyncio.gather(
+        *(fetch(user_id) for user_id in unique_ids), return_exceptions=True
+    )
+
+    users: Dict[str, Any] = {}
+    errors: Dict[str, Any] = {}
+    for user_id, result in zip(unique_ids, results):
+        if isinstance(result, BaseException):
+            errors[str(user_id)] = _error_detail(user_id, result)
+        else:
+            users[str(user_id)] = result
+    return {"users": users, "errors": errors}
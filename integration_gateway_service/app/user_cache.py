@@ -0,0 +1,203 @@
+"""
+用户信息查询结果缓存（GET /gateway/backend/users/{user_id}）。
+
+调用关系：
+routers/gateway.py (proxy_get_user)
+    -> user_profile_cache.get(user_id, loader)
+        - 新鲜（TTL 内）：直接返回；
+        - 过期但在 stale-while-revalidate 窗口内：先返回旧值，后台刷新一次；
+        - 未命中：调用 loader（AsyncBackendServiceClient.get_user）查下游。
+routers/gateway.py (DELETE /gateway/backend/users/{user_id}/cache)
+    -> user_profile_cache.invalidate(user_id)  用户资料变更后主动失效
+
+设计要点：
+- single-flight：同一个 user_id 同时有多个未命中（或多个后台刷新）时只发一次下游请求，
+  其他请求等待同一个结果；等待方被取消（客户端断开）不会取消这次共享的下游请求；
+- 下游 404 作为“负缓存”保存 GATEWAY_USER_CACHE_NEGATIVE_TTL_SECONDS 秒，期间直接返回同样的错误，
+  负缓存过期后不走 stale-while-revalidate；其他错误（5xx、超时）不缓存；
+- 失效发生时，正在进行的下游请求结果不再写回缓存，避免把失效前的旧数据写回去；
+- 容量有界（GATEWAY_USER_CACHE_MAX_SIZE），超出按 LRU 淘汰；
+- 缓存随应用生命周期存在，lifespan 启动时清空。
+
+命中率等指标：GET /gateway/stats/user-cache。
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .client_backend_service import BackendServiceError
+from .config import settings
+
+
+Loader = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+@dataclass(frozen=True)
+class _Entry:
+    """一条缓存：正常结果（value）或 404 错误（error_message）。"""
+
+    value: Optional[Dict[str, Any]]
+    error_message: Optional[str]
+    fresh_until: float
+    stale_until: float
+
+    @property
+    def negative(self) -> bool:
+        return self.error_message is not None
+
+    def unwrap(self) -> Dict[str, Any]:
+        if self.error_message is not None:
+            raise BackendServiceError(self.error_message, status_code=404)
+        return self.value
+
+
+class UserProfileCache:
+    """带 TTL、stale-while-revalidate、负缓存与 single-flight 的异步缓存。"""
+
+    def __init__(
+        self,
+        *,
+        max_size: int,
+        ttl_seconds: float,
+        stale_seconds: float,
+        negative_ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Any, _Entry]" = OrderedDict()
+        self._inflight: Dict[Any, asyncio.Task] = {}
+        # 每次失效加一；下游请求开始后若发生过失效，结果不写回缓存。
+        self._invalidation_epoch = 0
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.loads = 0
+        self.load_errors = 0
+        self.evictions = 0
+
+    async def get(self, key: Any, loader: Loader) -> Dict[str, Any]:
+        """按 key 取缓存，必要时调用 loader 查下游（同一 key 的并发请求合并为一次）。"""
+        now = self._clock()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if now < entry.fresh_until:
+                self._entries.move_to_end(key)
+                if entry.negative:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return entry.unwrap()
+            if now < entry.stale_until:
+                # 旧值先返回，后台刷新一次；刷新失败时旧值继续可用直到窗口结束。
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                self._start_load(key, loader)
+                return entry.unwrap()
+        self.misses += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._start_load(key, loader)
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _start_load(self, key: Any, loader: Loader) -> asyncio.Task:
+        """为 key 发起一次下游请求；已有进行中的请求时直接复用。"""
+        task = self._inflight.get(key)
+        if task is not None:
+            return task
+        task = asyncio.ensure_future(self._load(key, loader, self._invalidation_epoch))
+        self._inflight[key] = task
+
+        def _done(finished: asyncio.Task) -> None:
+            if self._inflight.get(key) is finished:
+                del self._inflight[key]
+            # 后台刷新没有等待方，这里取走异常，避免 “exception was never retrieved”。
+            if not finished.cancelled():
+                finished.exception()
+
+        task.add_done_callback(_done)
+        return task
+
+    async def _load(self, key: Any, loader: Loader, epoch: int) -> Dict[str, Any]:
+        self.loads += 1
+        try:
+            value = await loader()
+        except Exception as exc:
+            self.load_errors += 1
+            if (
+                isinstance(exc, BackendServiceError)
+                and exc.status_code == 404
+                and epoch == self._invalidation_epoch
+            ):
+                now = self._clock()
+                until = now + self.negative_ttl_seconds
+                self._store(key, _Entry(None, str(exc), until, until))
+            raise
+        if epoch == self._invalidation_epoch:
+            now = self._clock()
+            fresh_until = now + self.ttl_seconds
+            self._store(key, _Entry(value, None, fresh_until, fresh_until + self.stale_seconds))
+        return value
+
+    def _store(self, key: Any, entry: _Entry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Any) -> bool:
+        """让某个 key 的缓存立即失效，返回是否确实删除了缓存。"""
+        self._invalidation_epoch += 1
+        # 进行中的请求结果不会写回缓存；后续请求重新发起。
+        self._inflight.pop(key, None)
+        return self._entries.pop(key, None) is not None
+
+    def clear(self) -> None:
+        """清空全部缓存。"""
+        self._invalidation_epoch += 1
+        self._inflight.clear()
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存大小、各类命中计数与命中率。"""
+        served = self.hits + self.stale_hits + self.negative_hits
+        lookups = served + self.misses
+        return {
+            "enabled": settings.user_cache_enabled,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "stale_seconds": self.stale_seconds,
+            "negative_ttl_seconds": self.negative_ttl_seconds,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_ratio": round(served / lookups, 4) if lookups else 0.0,
+            "coalesced": self.coalesced,
+            "loads": self.loads,
+            "load_errors": self.load_errors,
+            "evictions": self.evictions,
+            "inflight": len(self._inflight),
+        }
+
+
+user_profile_cache = UserProfileCache(
+    max_size=settings.user_cache_max_size,
+    ttl_seconds=settings.user_cache_ttl_seconds,
+    stale_seconds=settings.user_cache_stale_seconds,
+    negative_ttl_seconds=settings.user_cache_negative_ttl_seconds,
+)
+# 模块级单例：proxy_get_user 读写，lifespan 启动时清空，失效接口与统计接口读取。
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JWT 验证缓存微基准：get_current_user 的单次耗时对比。
+
+模拟 --tokens 个客户端各自反复使用同一个 token 的场景，分别在关闭 / 开启
+GATEWAY_JWT_CACHE_ENABLED 时调用 --calls 次 get_current_user，输出 p50 / p99 与平均耗时。
+
+运行示例（在仓库根目录）：
+    python -m integration_gateway_service.bench_jwt_cache --calls 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import List
+
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import jwt
+
+from integration_gateway_service.app.config import settings
+from integration_gateway_service.app.dependencies import get_current_user
+from integration_gateway_service.app.jwt_cache import verified_token_cache
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[index]
+
+
+def measure(label: str, credentials: List[HTTPAuthorizationCredentials], calls: int) -> float:
+    rng = random.Random(42)
+    latencies = []
+    for _ in range(calls):
+        creds = rng.choice(credentials)
+        started = time.perf_counter()
+        get_current_user(creds)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    mean = sum(latencies) / len(latencies)
+    print(
+        f"{label:>9}  p50 {_percentile(latencies, 50) * 1e6:7.2f} us  "
+        f"p99 {_percentile(latencies, 99) * 1e6:7.2f} us  mean {mean * 1e6:7.2f} us"
+    )
+    return mean
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="JWT 验证缓存的单次鉴权耗时对比")
+    parser.add_argument("--calls", type=int, default=100_000, help="调用 get_current_user 的次数")
+    parser.add_argument("--tokens", type=int, default=100, help="参与轮换的不同 token 数")
+    args = parser.parse_args()
+
+    exp = int(time.time()) + 3600
+    credentials = [
+        HTTPAuthorizationCredentials(
+            scheme="Bearer",
+            credentials=jwt.encode(
+                {"sub": str(i), "username": f"user-{i}", "is_superuser": False, "exp": exp},
+                settings.rbac_jwt_secret_key,
+                algorithm=settings.rbac_jwt_algorithm,
+            ),
+        )
+        for i in range(args.tokens)
+    ]
+
+    settings.jwt_cache_enabled = False
+    uncached = measure("no-cache", credentials, args.calls)
+    settings.jwt_cache_enabled = True
+    verified_token_cache.clear()
+    cached = measure("cache", credentials, args.calls)
+    hit_ratio = verified_token_cache.stats()["hit_ratio"]
+    print(f"hit ratio {hit_ratio:.4f}  speedup {uncached / cached:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -20,10 +20,10 @@ from integration_gateway_service.app.schemas import OrderOut
 class _DummyBackendClient:
     """用于测试的后端服务客户端假实现。"""
 
-    def get_user(self, user_id: int) -> dict:
+    async def get_user(self, user_id: int) -> dict:
         return {"id": user_id, "username": "dummy", "full_name": "Dummy User"}
 
-    def create_order(self, order_in) -> OrderOut:
+    async def create_order(self, order_in) -> OrderOut:
         return OrderOut(
             order_id=123,
             status="CREATED",
@@ -35,10 +35,10 @@ class _DummyBackendClient:
 class _ErrorBackendClient:
     """总是抛出错误的后端客户端，用于测试 502 场景。"""
 
-    def get_user(self, user_id: int) -> dict:
+    async def get_user(self, user_id: int) -> dict:
         raise BackendServiceError("后端服务异常")
 
-    def create_order(self, order_in) -> OrderOut:
+    async def create_order(self, order_in) -> OrderOut:
         raise BackendServiceError("后端服务异常")
 
 
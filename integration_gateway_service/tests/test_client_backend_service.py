@@ -1,10 +1,13 @@
 """BackendServiceClient HTTP 层测试。"""
 
+import json
+
 import pytest
 import respx
 from httpx import Response
 
 from app.client_backend_service import (
+    AsyncBackendServiceClient,
     BackendServiceClient,
     BackendServiceError,
 )
@@ -88,4 +91,55 @@ def test_create_order_invalid_response_structure():
 
     order_in = OrderCreateIn(user_id=1, product_id=42, quantity=2)
     with pytest.raises(BackendServiceError, match="数据结构不符合预期"):
-        client.create_order(order_in)
\ No newline at end of file
+        client.create_order(order_in)
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_async_get_user_success():
+    """异步客户端正常获取用户信息。"""
+    client = AsyncBackendServiceClient(base_url="http://backend")
+    respx.get("http://backend/api/users/1").mock(
+        return_value=Response(200, json={"id": 1, "username": "test"})
+    )
+
+    assert await client.get_user(1) == {"id": 1, "username": "test"}
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_async_get_user_404_raises_error():
+    """异步客户端：后端返回 404 时抛出同样的异常。"""
+    client = AsyncBackendServiceClient(base_url="http://backend")
+    respx.get("http://backend/api/users/999").mock(return_value=Response(404))
+
+    with pytest.raises(BackendServiceError, match="状态码：404"):
+        await client.get_user(999)
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_async_create_order_invalid_response_structure():
+    """异步客户端：后端返回结构不符合预期时抛出异常。"""
+    client = AsyncBackendServiceClient(base_url="http://backend")
+    respx.post("http://backend/api/orders").mock(
+        return_value=Response(200, json={"invalid": "data"})
+    )
+
+    order_in = OrderCreateIn(user_id=1, product_id=42, quantity=2)
+    with pytest.raises(BackendServiceError, match="数据结构不符合预期"):
+        await client.create_order(order_in)
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_async_get_users_batch():
+    """异步客户端：批量查询把 ID 列表发给下游，返回非列表时抛出异常。"""
+    client = AsyncBackendServiceClient(base_url="http://backend")
+    route = respx.post("http://backend/api/users/batch").mock(
+        side_effect=[Response(200, json=[{"id": 1}]), Response(200, json={"id": 1})]
+    )
+
+    assert await client.get_users_batch([1, 2]) == [{"id": 1}]
+    assert json.loads(route.calls[0].request.content) == {"ids": [1, 2]}
+    with pytest.raises(BackendServiceError, match="数据结构不符合预期"):
+        await client.get_users_batch([1])
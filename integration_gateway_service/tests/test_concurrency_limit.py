@@ -0,0 +1,177 @@
+"""下游在途请求上限测试（有界等待队列、超出拒绝、AIMD 调整）。"""
+
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.client_backend_service import AsyncBackendServiceClient
+from app.concurrency_limit import AdaptiveConcurrencyLimiter, DownstreamOverloadedError
+from app.dependencies import get_backend_client, get_current_user
+from app.main import app
+from app.resilience import CircuitBreaker, DownstreamPolicy
+
+
+class _Clock:
+    """可手动拨动的时钟。"""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _limiter(clock=None, **overrides) -> AdaptiveConcurrencyLimiter:
+    options = dict(
+        initial_limit=2,
+        min_limit=1,
+        max_limit=10,
+        queue_size=1,
+        max_wait_ms=1000,
+        latency_tolerance=2.0,
+        backoff_ratio=0.5,
+    )
+    options.update(overrides)
+    return AdaptiveConcurrencyLimiter("backend", clock=clock or _Clock(), **options)
+
+
+class _Gate:
+    """send 桩：挂起直到 open()，方便控制在途请求数。"""
+
+    def __init__(self) -> None:
+        self.event = asyncio.Event()
+        self.started = 0
+
+    async def send(self) -> httpx.Response:
+        self.started += 1
+        await self.event.wait()
+        return httpx.Response(200)
+
+    def open(self) -> None:
+        self.event.set()
+
+
+def _timed_send(clock: _Clock, seconds: float, status_code: int = 200):
+    async def send() -> httpx.Response:
+        clock.now += seconds
+        return httpx.Response(status_code)
+
+    return send
+
+
+@pytest.mark.asyncio
+async def test_queue_then_shed_when_full():
+    """上限 2、队列 1：第 3 个请求排队，第 4 个立即被拒绝；名额空出后排队的请求继续。"""
+    limiter = _limiter()
+    gate = _Gate()
+    running = [asyncio.ensure_future(limiter.run(gate.send)) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert gate.started == 2
+    assert limiter.stats()["inflight"] == 2
+    assert limiter.stats()["queued"] == 1
+
+    with pytest.raises(DownstreamOverloadedError, match="繁忙"):
+        await limiter.run(gate.send)
+
+    gate.open()
+    responses = await asyncio.gather(*running)
+    assert [resp.status_code for resp in responses] == [200, 200, 200]
+    stats = limiter.stats()
+    assert stats["inflight"] == 0 and stats["queued"] == 0
+    assert stats["queued_total"] == 1
+    assert stats["shed_queue_full"] == 1 and stats["shed_total"] == 1
+
+
+@pytest.mark.asyncio
+async def test_wait_timeout_sheds_and_cancelled_waiter_leaves_queue():
+    limiter = _limiter(initial_limit=1, queue_size=5, max_wait_ms=20)
+    gate = _Gate()
+    holder = asyncio.ensure_future(limiter.run(gate.send))
+    await asyncio.sleep(0)
+
+    with pytest.raises(DownstreamOverloadedError):
+        await limiter.run(gate.send)
+    assert limiter.stats()["shed_wait_timeout"] == 1
+
+    waiter = asyncio.ensure_future(limiter.run(gate.send))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.sleep(0)
+    assert limiter.stats()["queued"] == 0
+
+    gate.open()
+    await holder
+    assert limiter.stats()["inflight"] == 0
+    assert gate.started == 1
+
+
+@pytest.mark.asyncio
+async def test_aimd_increases_on_fast_and_decreases_on_slow_or_failed():
+    clock = _Clock()
+    limiter = _limiter(clock, initial_limit=2)
+
+    # 串行请求在途数为 1，达到上限 2 的一半，耗时正常时加 1；上限变成 3 后不再算“被用到”。
+    for _ in range(3):
+        await limiter.run(_timed_send(clock, 0.01))
+    assert limiter.limit == 3
+
+    # 耗时超过最小耗时的 2 倍：下游在排队，上限减半。
+    await limiter.run(_timed_send(clock, 0.05))
+    assert limiter.limit == 1
+
+    limiter._limit = 4.0
+    await limiter.run(_timed_send(clock, 0.01, status_code=503))
+    assert limiter.limit == 2
+
+    async def broken() -> httpx.Response:
+        raise httpx.ConnectError("boom")
+
+    with pytest.raises(httpx.ConnectError):
+        await limiter.run(broken)
+    assert limiter.limit == 1  # 不低于 min_limit
+    stats = limiter.stats()
+    assert stats["limit_increases"] == 1
+    assert stats["limit_decreases"] == 3
+    assert stats["min_latency_ms"] == pytest.approx(10.0)
+
+
+def test_overloaded_downstream_returns_503_without_tripping_breaker():
+    """在途请求已满时路由立即返回 503，熔断器不把它计为失败。"""
+    limiter = _limiter(initial_limit=1, queue_size=0)
+    limiter.inflight = 1  # 模拟已有一个请求占着名额
+    policy = DownstreamPolicy(
+        CircuitBreaker(
+            "backend",
+            window_seconds=10,
+            min_requests=1,
+            error_rate_threshold=0.5,
+            open_seconds=5,
+            half_open_probes=1,
+        ),
+        max_attempts=3,
+        base_delay_ms=1,
+        max_delay_ms=5,
+        hedge_enabled=False,
+        hedge_min_samples=5,
+        limiter=limiter,
+    )
+    client = AsyncBackendServiceClient(base_url="http://backend", policy=policy)
+    app.dependency_overrides[get_backend_client] = lambda: client
+    app.dependency_overrides[get_current_user] = lambda: {"sub": "1"}
+    try:
+        with TestClient(app) as c:
+            resp = c.get("/gateway/backend/users/42")
+            stats = c.get("/gateway/stats/concurrency")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "1"
+    assert "繁忙" in resp.json()["detail"]
+    assert policy.breaker.stats()["window_requests"] == 0
+    assert limiter.stats()["shed_total"] == 1
+
+    assert stats.status_code == 200
+    assert set(stats.json()["data"]) == {"enabled", "backend", "log_detective"}
@@ -0,0 +1,85 @@
+"""下游共享连接池测试（lifespan 创建 / 关闭、依赖注入、连接池统计）。"""
+
+import httpx
+import pytest
+import respx
+from fastapi.testclient import TestClient
+
+from app.client_backend_service import AsyncBackendServiceClient
+from app.dependencies import get_backend_client, get_current_user, get_log_detective_client
+from app.http_clients import DownstreamClients, http_clients
+from app.log_detective_client import LogDetectiveClient
+from app.main import app
+
+
+def test_lifespan_creates_and_closes_shared_clients():
+    """应用启动时创建共享客户端，关闭时释放。"""
+    assert not http_clients.started
+    with TestClient(app):
+        assert http_clients.started
+        backend_client = get_backend_client()
+        assert backend_client.http_client is http_clients.backend
+        assert get_backend_client().http_client is backend_client.http_client
+        assert get_log_detective_client().http_client is http_clients.log_detective
+        shared = http_clients.backend
+    assert not http_clients.started
+    assert shared.is_closed
+    # 生命周期之外退回到每次调用临时建连。
+    assert get_backend_client().http_client is None
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_backend_client_reuses_shared_pool():
+    """注入共享客户端后，多次调用都经过同一个连接池并计入统计。"""
+    respx.get("http://backend/api/users/1").mock(
+        return_value=httpx.Response(200, json={"id": 1})
+    )
+    clients = DownstreamClients()
+    clients.start()
+    try:
+        client = AsyncBackendServiceClient(base_url="http://backend", http_client=clients.backend)
+        for _ in range(3):
+            assert await client.get_user(1) == {"id": 1}
+        stats = clients.stats()
+        assert stats["backend"]["requests"] == 3
+        assert stats["log_detective"]["requests"] == 0
+        assert stats["backend"]["max_connections"] == 100
+    finally:
+        await clients.aclose()
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_log_detective_client_uses_shared_pool():
+    """日志侦探客户端复用共享 AsyncClient。"""
+    respx.post("http://log-detective/internal/log-detective/analyze").mock(
+        return_value=httpx.Response(200, json={"summary": "ok"})
+    )
+    clients = DownstreamClients()
+    clients.start()
+    try:
+        client = LogDetectiveClient(
+            base_url="http://log-detective", http_client=clients.log_detective
+        )
+        assert await client.analyze_logs({"log_text": "x"}) == {"summary": "ok"}
+        assert await client.analyze_logs({"log_text": "y"}) == {"summary": "ok"}
+        assert clients.stats()["log_detective"]["requests"] == 2
+    finally:
+        await clients.aclose()
+
+
+def test_http_pool_stats_endpoint():
+    """连接池统计接口返回各下游的配置与计数。"""
+    app.dependency_overrides[get_current_user] = lambda: {"sub": "1"}
+    try:
+        with TestClient(app) as c:
+            response = c.get("/gateway/stats/http-pools")
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["started"] is True
+    assert set(data) == {"started", "backend", "log_detective", "log_audit"}
+    assert data["backend"]["connections"] == 0
+    assert data["backend"]["keepalive_expiry"] == 30.0
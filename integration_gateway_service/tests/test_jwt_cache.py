@@ -0,0 +1,108 @@
+"""JWT 验证缓存测试（命中、篡改签名、exp、LRU、密钥轮换）。"""
+
+import time
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import jwt
+
+from app import dependencies
+from app.config import settings
+from app.dependencies import get_current_user
+from app.jwt_cache import VerifiedTokenCache
+
+
+def _token(**claims) -> str:
+    payload = {"sub": "1", "username": "test", **claims}
+    return jwt.encode(payload, settings.rbac_jwt_secret_key, algorithm=settings.rbac_jwt_algorithm)
+
+
+def _credentials(token: str) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    """给 get_current_user 换上一个全新的缓存实例，并统计 jwt.decode 调用次数。"""
+    fresh = VerifiedTokenCache(max_size=100, ttl_seconds=300)
+    monkeypatch.setattr(dependencies, "verified_token_cache", fresh)
+    calls = []
+    real_decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr(dependencies.jwt, "decode", counting_decode)
+    fresh.decode_calls = calls
+    return fresh
+
+
+def test_repeated_token_is_verified_once(cache):
+    """同一 token 第二次请求直接命中缓存，不再验签。"""
+    token = _token(exp=int(time.time()) + 3600)
+    first = get_current_user(_credentials(token))
+    second = get_current_user(_credentials(token))
+    assert first == second
+    assert first["sub"] == "1"
+    assert len(cache.decode_calls) == 1
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_tampered_signature_rejected_after_caching(cache):
+    """原 token 已缓存时，改过签名的 token 仍要验签并被拒绝。"""
+    token = _token()
+    get_current_user(_credentials(token))
+    # header 和 payload 不变，只换签名。
+    forged_signature = jwt.encode(
+        {"sub": "1", "username": "test"}, "attacker-secret", algorithm=settings.rbac_jwt_algorithm
+    ).rsplit(".", 1)[1]
+    tampered = f"{token.rsplit('.', 1)[0]}.{forged_signature}"
+    assert tampered != token
+    with pytest.raises(HTTPException) as exc_info:
+        get_current_user(_credentials(tampered))
+    assert exc_info.value.status_code == 401
+
+
+def test_expired_token_not_cached(cache):
+    """过期 token 验签失败返回 401，也不会进入缓存。"""
+    token = _token(exp=int(time.time()) - 10)
+    with pytest.raises(HTTPException):
+        get_current_user(_credentials(token))
+    assert cache.stats()["size"] == 0
+
+
+def test_cache_entry_expires_with_token(monkeypatch):
+    """缓存条目不会活过 token 自身的 exp。"""
+    cache = VerifiedTokenCache(max_size=10, ttl_seconds=300)
+    now = time.time()
+    cache.put("t", {"sub": "1", "exp": now + 10})
+    assert cache.get("t") == {"sub": "1", "exp": now + 10}
+    monkeypatch.setattr("app.jwt_cache.time.time", lambda: now + 11)
+    assert cache.get("t") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_lru_eviction():
+    """超出容量时淘汰最久未使用的条目。"""
+    cache = VerifiedTokenCache(max_size=2, ttl_seconds=300)
+    cache.put("a", {"sub": "a"})
+    cache.put("b", {"sub": "b"})
+    assert cache.get("a") is not None
+    cache.put("c", {"sub": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_secret_rotation_clears_cache(monkeypatch):
+    """验签密钥变化后，旧缓存全部作废。"""
+    cache = VerifiedTokenCache(max_size=10, ttl_seconds=300)
+    cache.put("t", {"sub": "1"})
+    monkeypatch.setattr(settings, "rbac_jwt_secret_key", "rotated-secret")
+    assert cache.get("t") is None
@@ -0,0 +1,123 @@
+"""
+代理接口并发压测（慢速桩后端）。
+
+桩后端每个请求固定耗时 DELAY 秒，同时向网关发出 CONCURRENCY 个查询用户请求，
+桩后端记录同时在途的请求数峰值：
+- 对照组：改造前的实现，同步 def 路由 + 同步 BackendServiceClient，每个在途请求占一个
+  线程池线程，峰值不超过线程池大小（默认 40 个）；
+- 实验组：当前的 async 路由 + AsyncBackendServiceClient，等待下游时不占线程，
+  峰值不受线程池限制。
+
+断言只看在途峰值而不比较耗时，在负载较高的 CI 机器上也稳定。
+"""
+
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.client_backend_service import AsyncBackendServiceClient, BackendServiceClient
+from app.config import settings
+from app.dependencies import get_backend_client, get_current_user
+from app.main import app
+
+
+DELAY = 0.25
+CONCURRENCY = 200
+# Starlette 运行同步路由所用 anyio 线程池的默认大小。
+THREADPOOL_SIZE = 40
+
+
+def _user_response(request: httpx.Request) -> httpx.Response:
+    user_id = int(request.url.path.rsplit("/", 1)[-1])
+    return httpx.Response(200, json={"id": user_id})
+
+
+class _SlowSyncBackend(httpx.BaseTransport):
+    """同步桩后端：阻塞 DELAY 秒后返回，记录在途请求数峰值。"""
+
+    def __init__(self) -> None:
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(DELAY)
+        finally:
+            with self._lock:
+                self.active -= 1
+        return _user_response(request)
+
+
+class _SlowAsyncBackend(httpx.AsyncBaseTransport):
+    """异步桩后端：挂起 DELAY 秒后返回，记录在途请求数峰值。"""
+
+    def __init__(self) -> None:
+        self.active = 0
+        self.max_active = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(DELAY)
+        finally:
+            self.active -= 1
+        return _user_response(request)
+
+
+def _build_sync_gateway(backend: _SlowSyncBackend) -> FastAPI:
+    """对照组：复现改造前的同步代理路由。"""
+    sync_app = FastAPI()
+    backend_client = BackendServiceClient(
+        base_url="http://backend", http_client=httpx.Client(transport=backend)
+    )
+
+    @sync_app.get("/gateway/backend/users/{user_id}")
+    def proxy_get_user(user_id: int) -> dict:
+        return {"success": True, "data": backend_client.get_user(user_id)}
+
+    return sync_app
+
+
+async def _fire(asgi_app: FastAPI) -> None:
+    """并发发出 CONCURRENCY 个请求，并检查每个请求都正确返回。"""
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as client:
+        responses = await asyncio.gather(
+            *(client.get(f"/gateway/backend/users/{i}") for i in range(CONCURRENCY))
+        )
+    assert all(resp.status_code == 200 for resp in responses)
+    assert [resp.json()["data"]["id"] for resp in responses] == list(range(CONCURRENCY))
+
+
+@pytest.mark.asyncio
+async def test_async_proxy_is_not_bounded_by_threadpool(monkeypatch):
+    """async 代理路由的并发不受线程池限制：同时压在下游上的请求数超过线程池大小。"""
+    # 只比较转发本身，不让网关缓存参与。
+    monkeypatch.setattr(settings, "user_cache_enabled", False)
+    async_backend = _SlowAsyncBackend()
+    shared = httpx.AsyncClient(transport=async_backend)
+    app.dependency_overrides[get_current_user] = lambda: {"sub": "1"}
+    app.dependency_overrides[get_backend_client] = lambda: AsyncBackendServiceClient(
+        base_url="http://backend", http_client=shared
+    )
+    try:
+        await _fire(app)
+    finally:
+        app.dependency_overrides.clear()
+        await shared.aclose()
+
+    sync_backend = _SlowSyncBackend()
+    await _fire(_build_sync_gateway(sync_backend))
+
+    # 同步实现每个在途请求占一个线程，峰值被线程池卡住；async 实现不受此限制。
+    assert 1 < sync_backend.max_active <= THREADPOOL_SIZE
+    assert async_backend.max_active > THREADPOOL_SIZE
@@ -0,0 +1,68 @@
+"""审计日志上报测试（有界队列、批量上报、关闭时排空）。"""
+
+import json
+
+import httpx
+import pytest
+import respx
+
+from app.log_audit_client import LogAuditClient
+
+
+def _event(i: int) -> dict:
+    return {"actor": str(i), "action": "create_order_via_gateway", "source_service": "gateway"}
+
+
+def test_send_log_without_base_url_is_ignored():
+    """未配置日志服务地址时不入队。"""
+    client = LogAuditClient()
+    client.send_log(_event(1))
+    assert client.queue_depth == 0
+    assert client.enqueued_total == 0
+
+
+def test_queue_full_drops_oldest():
+    """队列满时丢弃最旧的日志并计数，send_log 本身从不阻塞。"""
+    client = LogAuditClient(base_url="http://audit", max_size=3)
+    for i in range(5):
+        client.send_log(_event(i))
+    assert client.queue_depth == 3
+    assert client.dropped_total == 2
+    assert [item["actor"] for item in client._queue] == ["2", "3", "4"]
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_ships_in_batches_and_flushes_on_stop():
+    """按批上报到 /logs/batch，关闭时把剩余日志发完。"""
+    route = respx.post("http://audit/logs/batch").mock(
+        return_value=httpx.Response(201, json={"count": 0, "ids": []})
+    )
+    client = LogAuditClient(base_url="http://audit", batch_size=2, flush_interval_ms=60_000)
+    async with httpx.AsyncClient() as http_client:
+        client.start(http_client)
+        for i in range(5):
+            client.send_log(_event(i))
+        await client.stop(timeout=5)
+
+    shipped = [json.loads(call.request.content)["items"] for call in route.calls]
+    assert [len(items) for items in shipped] == [2, 2, 1]
+    assert [item["actor"] for items in shipped for item in items] == ["0", "1", "2", "3", "4"]
+    assert client.stats()["shipped_total"] == 5
+    assert client.stats()["batch_count"] == 3
+    assert not client.running
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_ship_failure_is_counted_not_raised():
+    """日志服务出错时整批计入 failed_total，不影响调用方。"""
+    respx.post("http://audit/logs/batch").mock(return_value=httpx.Response(500))
+    client = LogAuditClient(base_url="http://audit", batch_size=10, flush_interval_ms=10)
+    async with httpx.AsyncClient() as http_client:
+        client.start(http_client)
+        client.send_log(_event(1))
+        client.send_log(_event(2))
+        await client.stop(timeout=5)
+    assert client.failed_total == 2
+    assert client.shipped_total == 0
@@ -64,4 +64,40 @@ async def test_analyze_logs_5xx_raises_error():
     )
 
     with pytest.raises(LogDetectiveServiceError, match="状态码：500"):
-        await client.analyze_logs({"log_text": "test"})
\ No newline at end of file
+        await client.analyze_logs({"log_text": "test"})
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_analyze_logs_raw_passes_bytes_through():
+    """透传版本：请求体字节原样转发，返回下游的原始 JSON 字节。"""
+    client = LogDetectiveClient(base_url="http://detective")
+    downstream_body = b'{"summary": "\xe5\x88\x86\xe6\x9e\x90\xe5\xae\x8c\xe6\x88\x90", "n": 1.50}'
+    route = respx.post("http://detective/internal/log-detective/analyze").mock(
+        return_value=Response(200, content=downstream_body)
+    )
+    request_body = b'{"log_text":  "line1\\nline2"}'
+
+    async def stream():
+        yield request_body[:10]
+        yield request_body[10:]
+
+    raw = await client.analyze_logs_raw(
+        stream(), content_type="application/json", content_length=str(len(request_body))
+    )
+    assert raw == downstream_body
+    sent = route.calls[0].request
+    assert sent.content == request_body
+    assert sent.headers["content-length"] == str(len(request_body))
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_analyze_logs_raw_non_json_raises_error():
+    """透传版本：下游返回的不是 JSON 时抛出异常。"""
+    client = LogDetectiveClient(base_url="http://detective")
+    respx.post("http://detective/internal/log-detective/analyze").mock(
+        return_value=Response(200, text="not json")
+    )
+
+    with pytest.raises(LogDetectiveServiceError, match="非 JSON 格式"):
+        await client.analyze_logs_raw(b'{"log_text": "x"}')
@@ -0,0 +1,166 @@
+"""令牌桶限流测试（memory / redis 后端、429 响应与限流响应头）。"""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.dependencies import get_current_user, get_log_detective_client
+from app.main import app
+from app.rate_limit import (
+    MemoryTokenBucketBackend,
+    RateLimiter,
+    RateLimitRule,
+    RedisTokenBucketBackend,
+    parse_rules,
+    rate_limiter,
+)
+
+ANALYZE = "POST /gateway/log-detective/analyze"
+
+
+class _Clock:
+    """可手动拨动的时钟。"""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def fakeredis():
+    """redis 后端的测试依赖 fakeredis，未安装时只跳过这些测试。"""
+    return pytest.importorskip("fakeredis")
+
+
+def _redis_backend(fakeredis, server=None, **kwargs) -> RedisTokenBucketBackend:
+    client = fakeredis.FakeAsyncRedis(server=server or fakeredis.FakeServer())
+    return RedisTokenBucketBackend(client, **kwargs)
+
+
+def test_parse_rule():
+    rule = RateLimitRule.parse("10/60")
+    assert rule.burst == 10 and rule.period_seconds == 60
+    assert rule.rate == pytest.approx(10 / 60)
+    assert str(rule) == "10/60"
+    for bad in ("10", "ten/60", "0/60", "10/0"):
+        with pytest.raises(ValueError):
+            RateLimitRule.parse(bad)
+
+
+@pytest.mark.asyncio
+async def test_memory_bucket_allows_burst_then_refills():
+    """容量 3、每秒补 1 个：连发 3 次放行，第 4 次限流，1 秒后再放行 1 次。"""
+    clock = _Clock()
+    limiter = RateLimiter({ANALYZE: "3/3"}, MemoryTokenBucketBackend(), clock=clock)
+
+    decisions = [await limiter.check("1", ANALYZE) for _ in range(4)]
+    assert [d.allowed for d in decisions] == [True, True, True, False]
+    assert [d.remaining for d in decisions] == [2, 1, 0, 0]
+    limited = decisions[-1]
+    assert limited.headers()["Retry-After"] == "1"
+    assert limited.headers()["X-RateLimit-Limit"] == "3"
+    assert limited.headers()["X-RateLimit-Reset"] == "3"
+
+    clock.now += 1
+    assert (await limiter.check("1", ANALYZE)).allowed
+    assert not (await limiter.check("1", ANALYZE)).allowed
+    assert limiter.stats()["limited_by_route"] == {ANALYZE: 2}
+
+
+@pytest.mark.asyncio
+async def test_buckets_are_per_user_and_route():
+    limiter = RateLimiter(
+        {ANALYZE: "1/60", "*": "2/60"}, MemoryTokenBucketBackend(), clock=_Clock()
+    )
+    assert (await limiter.check("1", ANALYZE)).allowed
+    assert not (await limiter.check("1", ANALYZE)).allowed
+    # 其他用户、其他路由各有自己的桶；其他路由使用 "*" 规则。
+    assert (await limiter.check("2", ANALYZE)).allowed
+    other = await limiter.check("1", "GET /gateway/backend/users/{user_id}")
+    assert other.allowed and other.limit == 2
+
+    no_default = RateLimiter({ANALYZE: "1/60"}, MemoryTokenBucketBackend())
+    assert await no_default.check("1", "GET /gateway/stats/rate-limit") is None
+
+
+@pytest.mark.asyncio
+async def test_redis_transaction_backend_is_shared_and_atomic(fakeredis):
+    """两个网关实例（两个客户端）共享同一个桶；并发取令牌不会超发。"""
+    server = fakeredis.FakeServer()
+    clock = _Clock()
+    rules = {ANALYZE: "5/60"}
+    gateway_a = RateLimiter(rules, _redis_backend(fakeredis, server, use_lua=False), clock=clock)
+    gateway_b = RateLimiter(rules, _redis_backend(fakeredis, server, use_lua=False), clock=clock)
+
+    decisions = await asyncio.gather(
+        *(limiter.check("1", ANALYZE) for limiter in [gateway_a, gateway_b] * 5)
+    )
+    assert sum(d.allowed for d in decisions) == 5
+    assert gateway_a.limited_total + gateway_b.limited_total == 5
+
+    clock.now += 12  # 每 12 秒补 1 个
+    assert (await gateway_b.check("1", ANALYZE)).allowed
+    assert not (await gateway_a.check("1", ANALYZE)).allowed
+
+    key = "gateway:ratelimit:1:" + ANALYZE
+    ttl_ms = await fakeredis.FakeAsyncRedis(server=server).pttl(key)
+    assert 0 < ttl_ms <= 60_000
+
+
+@pytest.mark.asyncio
+async def test_redis_lua_backend(fakeredis):
+    pytest.importorskip("lupa")  # fakeredis 执行 Lua 需要 lupa（fakeredis[lua]）
+    backend = _redis_backend(fakeredis, use_lua=True)
+    limiter = RateLimiter({ANALYZE: "2/60"}, backend, clock=_Clock())
+    decisions = [await limiter.check("1", ANALYZE) for _ in range(3)]
+    assert [d.allowed for d in decisions] == [True, True, False]
+    assert decisions[1].remaining == 0
+
+
+@pytest.mark.asyncio
+async def test_redis_unavailable_fails_open(fakeredis):
+    server = fakeredis.FakeServer()
+    server.connected = False
+    limiter = RateLimiter({ANALYZE: "1/60"}, _redis_backend(fakeredis, server, use_lua=False))
+    assert await limiter.check("1", ANALYZE) is None
+    assert await limiter.check("1", ANALYZE) is None
+    assert limiter.stats()["backend_errors"] == 2
+
+
+class _MockLogDetectiveClient:
+    async def analyze_logs_raw(self, body, **kwargs) -> bytes:
+        async for _ in body:
+            pass
+        return b'{"summary":"ok"}'
+
+
+def test_analyze_route_returns_429_with_headers(monkeypatch):
+    """超出规则后返回 429 + Retry-After；放行的响应（包括直接返回 Response 的透传路由）带限流头。"""
+    app.dependency_overrides[get_current_user] = lambda: {"sub": "42"}
+    app.dependency_overrides[get_log_detective_client] = _MockLogDetectiveClient
+    try:
+        with TestClient(app) as c:
+            monkeypatch.setattr(rate_limiter, "rules", parse_rules({ANALYZE: "2/60"}))
+            responses = [
+                c.post("/gateway/log-detective/analyze", json={"logs": "x"}) for _ in range(3)
+            ]
+            stats = c.get("/gateway/stats/rate-limit")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert [r.status_code for r in responses] == [200, 200, 429]
+    assert responses[0].json()["data"] == {"summary": "ok"}
+    assert responses[0].headers["X-RateLimit-Limit"] == "2"
+    assert responses[1].headers["X-RateLimit-Remaining"] == "0"
+    limited = responses[2]
+    assert limited.json()["detail"] == "请求过于频繁，请稍后重试"
+    assert int(limited.headers["Retry-After"]) >= 1
+    assert limited.headers["X-RateLimit-Remaining"] == "0"
+
+    # 统计接口本身没有配置规则，不限流也不带限流头。
+    assert stats.status_code == 200
+    assert "X-RateLimit-Limit" not in stats.headers
+    assert stats.json()["data"]["limited_by_route"] == {ANALYZE: 1}
@@ -0,0 +1,177 @@
+"""熔断、重试与对冲请求测试。"""
+
+import asyncio
+
+import httpx
+import pytest
+import respx
+from fastapi.testclient import TestClient
+
+from app.client_backend_service import AsyncBackendServiceClient, BackendServiceError
+from app.dependencies import get_backend_client, get_current_user
+from app.main import app
+from app.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    DownstreamPolicy,
+)
+from app.schemas import OrderCreateIn
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _breaker(clock=None, **overrides) -> CircuitBreaker:
+    options = dict(
+        window_seconds=10,
+        min_requests=4,
+        error_rate_threshold=0.5,
+        open_seconds=5,
+        half_open_probes=1,
+    )
+    options.update(overrides)
+    return CircuitBreaker("backend", clock=clock or _Clock(), **options)
+
+
+def _policy(breaker=None, **overrides) -> DownstreamPolicy:
+    options = dict(
+        max_attempts=3, base_delay_ms=1, max_delay_ms=5, hedge_enabled=False, hedge_min_samples=5
+    )
+    options.update(overrides)
+    return DownstreamPolicy(breaker or _breaker(), **options)
+
+
+def test_breaker_opens_half_opens_and_closes():
+    """失败率达到阈值后打开；到期后半开只放行一个探测，探测成功则关闭。"""
+    clock = _Clock()
+    breaker = _breaker(clock)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_success()
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError) as exc_info:
+        breaker.before_call()
+    assert exc_info.value.retry_after == pytest.approx(5)
+
+    clock.now += 5
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.stats()["rejected_total"] == 2
+
+
+def test_breaker_reopens_when_probe_fails():
+    """半开探测失败时重新打开。"""
+    clock = _Clock()
+    breaker = _breaker(clock, min_requests=1)
+    breaker.before_call()
+    breaker.record_failure()
+    clock.now += 5
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.stats()["opened_total"] == 2
+
+
+def test_old_failures_leave_the_window():
+    """窗口外的失败不再计入失败率。"""
+    clock = _Clock()
+    breaker = _breaker(clock)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 11
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    assert breaker.stats()["window_requests"] == 1
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_get_retried_post_not_retried():
+    """GET 遇到 5xx 会重试，POST 只发一次。"""
+    get_route = respx.get("http://backend/api/users/1").mock(
+        side_effect=[httpx.Response(503), httpx.Response(502), httpx.Response(200, json={"id": 1})]
+    )
+    post_route = respx.post("http://backend/api/orders").mock(return_value=httpx.Response(500))
+    policy = _policy()
+    client = AsyncBackendServiceClient(base_url="http://backend", policy=policy)
+
+    assert await client.get_user(1) == {"id": 1}
+    assert get_route.call_count == 3
+    assert policy.retries_total == 2
+
+    with pytest.raises(BackendServiceError, match="状态码：500"):
+        await client.create_order(OrderCreateIn(user_id=1, product_id=2, quantity=1))
+    assert post_route.call_count == 1
+    # 一次逻辑调用只记录一次结果：GET 成功、POST 失败。
+    assert policy.breaker.stats()["window_requests"] == 2
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_transport_error_maps_to_backend_error_after_retries():
+    """连接错误重试用尽后转成 BackendServiceError，并计入熔断失败。"""
+    route = respx.get("http://backend/api/users/1").mock(side_effect=httpx.ConnectError("boom"))
+    policy = _policy()
+    client = AsyncBackendServiceClient(base_url="http://backend", policy=policy)
+    with pytest.raises(BackendServiceError, match="调用后端服务失败"):
+        await client.get_user(1)
+    assert route.call_count == 3
+    assert policy.breaker.stats()["window_failures"] == 1
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_wins_over_slow_primary():
+    """首个请求超过 p95 未返回时发出对冲请求，先返回的结果生效。"""
+    policy = _policy(hedge_enabled=True)
+    for _ in range(10):
+        policy.latency.add(0.01)
+    delays = [1.0, 0.0]
+    cancelled = []
+
+    async def send() -> httpx.Response:
+        delay = delays.pop(0)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(delay)
+            raise
+        return httpx.Response(200, json={"delay": delay})
+
+    resp = await asyncio.wait_for(policy.call(send, idempotent=True), timeout=0.5)
+    assert resp.json() == {"delay": 0.0}
+    assert policy.hedged_total == 1
+    assert policy.hedge_wins == 1
+    await asyncio.sleep(0)
+    assert cancelled == [1.0]
+
+
+def test_open_breaker_returns_503_with_retry_after():
+    """熔断打开时路由立即返回 503，不再等待下游超时。"""
+    breaker = _breaker(min_requests=1)
+    breaker.record_failure()
+    client = AsyncBackendServiceClient(base_url="http://backend", policy=_policy(breaker))
+    app.dependency_overrides[get_backend_client] = lambda: client
+    app.dependency_overrides[get_current_user] = lambda: {"sub": "1"}
+    try:
+        with TestClient(app) as c:
+            resp = c.get("/gateway/backend/users/42")
+    finally:
+        app.dependency_overrides.clear()
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "5"
+    assert "熔断" in resp.json()["detail"]
@@ -1,6 +1,10 @@
 """Gateway Router 层测试（使用依赖覆盖 Mock Client）。"""
 
+import json
+
 import pytest
+import respx
+from httpx import Response
 from fastapi.testclient import TestClient
 
 from app.client_backend_service import BackendServiceError
@@ -9,23 +13,23 @@ from app.dependencies import (
     get_current_user,
     get_log_detective_client,
 )
-from app.log_detective_client import LogDetectiveServiceError
+from app.log_detective_client import LogDetectiveClient, LogDetectiveServiceError
 from app.main import app
 from app.schemas import OrderCreateIn, OrderOut
 
 
 class MockBackendClient:
-    """Mock BackendServiceClient。"""
+    """Mock AsyncBackendServiceClient。"""
 
     def __init__(self, base_url: str):
         self.base_url = base_url
 
-    def get_user(self, user_id: int) -> dict:
+    async def get_user(self, user_id: int) -> dict:
         if user_id == 1:
             return {"id": 1, "username": "test_user"}
         raise BackendServiceError(f"用户 {user_id} 不存在")
 
-    def create_order(self, order_in: OrderCreateIn) -> OrderOut:
+    async def create_order(self, order_in: OrderCreateIn) -> OrderOut:
         if order_in.user_id == 1:
             return OrderOut(
                 order_id=123,
@@ -49,6 +53,12 @@ class MockLogDetectiveClient:
             raise LogDetectiveServiceError("日志分析服务内部错误")
         return {"summary": "分析完成", "suspicious_ips": ["1.2.3.4"]}
 
+    async def analyze_logs_raw(self, body, content_type=None, content_length=None) -> bytes:
+        # 路由透传的是请求体字节流，这里读完后按 dict 版本的逻辑返回 JSON 字节。
+        chunks = [chunk async for chunk in body]
+        result = await self.analyze_logs(json.loads(b"".join(chunks)))
+        return json.dumps(result, ensure_ascii=False).encode("utf-8")
+
 
 def mock_superuser():
     """Mock 超级管理员用户。"""
@@ -193,3 +203,31 @@ def test_analyze_logs_backend_error_returns_502(log_detective_error_client):
     )
     assert response.status_code == 502
     assert "内部错误" in response.json()["detail"]
+
+
+@respx.mock
+def test_analyze_logs_passthrough_splices_downstream_bytes():
+    """日志分析透传：请求体原样转发，下游 JSON 字节原样放进统一响应外壳。"""
+    downstream_body = b'{"summary":"ok","ratio":1.50,"ips":["1.2.3.4"]}'
+    route = respx.post("http://detective/internal/log-detective/analyze").mock(
+        return_value=Response(200, content=downstream_body)
+    )
+    request_body = '{"log_text": "ERROR 登录失败\\n", "max_results": 5}'.encode("utf-8")
+    app.dependency_overrides[get_current_user] = mock_superuser
+    app.dependency_overrides[get_log_detective_client] = lambda: LogDetectiveClient(
+        base_url="http://detective"
+    )
+    try:
+        with TestClient(app) as c:
+            response = c.post(
+                "/gateway/log-detective/analyze",
+                content=request_body,
+                headers={"Content-Type": "application/json"},
+            )
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert route.calls[0].request.content == request_body
+    assert response.content == b'{"success":true,"data":' + downstream_body + b',"error":null}'
+    assert response.json()["data"]["ratio"] == 1.50
@@ -0,0 +1,150 @@
+"""批量查询用户测试（去重、缓存、并发上限、下游批量接口、按 ID 返回错误）。"""
+
+import asyncio
+
+import httpx
+import pytest
+import respx
+from fastapi.testclient import TestClient
+
+from app.client_backend_service import AsyncBackendServiceClient, BackendServiceError
+from app.config import settings
+from app.dependencies import get_backend_client, get_current_user
+from app.main import app
+from app import user_batch
+from app.user_batch import UserBatchLoader, fetch_users
+from app.user_cache import UserProfileCache
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    """每个测试使用独立的用户缓存，不影响全局单例的计数。"""
+    fresh = UserProfileCache(
+        max_size=100, ttl_seconds=30, stale_seconds=300, negative_ttl_seconds=5
+    )
+    monkeypatch.setattr(user_batch, "user_profile_cache", fresh)
+    return fresh
+
+
+class _FakeBackendClient:
+    """记录调用的下游桩：id >= 100 的用户不存在。"""
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.single_calls = []
+        self.batch_calls = []
+        self.active = 0
+        self.max_active = 0
+
+    async def get_user(self, user_id: int) -> dict:
+        self.single_calls.append(user_id)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        if user_id >= 100:
+            raise BackendServiceError("调用后端服务失败，状态码：404", status_code=404)
+        return {"id": user_id}
+
+    async def get_users_batch(self, user_ids: list) -> list:
+        self.batch_calls.append(list(user_ids))
+        await asyncio.sleep(self.delay)
+        return [{"id": user_id} for user_id in user_ids if user_id < 100]
+
+
+@pytest.mark.asyncio
+async def test_fan_out_is_bounded_and_deduplicated(monkeypatch):
+    monkeypatch.setattr(settings, "users_batch_concurrency", 3)
+    backend = _FakeBackendClient(delay=0.01)
+    ids = list(range(1, 11)) + [1, 2, 100]
+
+    data = await fetch_users(ids, backend)
+
+    assert sorted(backend.single_calls) == list(range(1, 11)) + [100]
+    assert backend.max_active == 3
+    assert set(data["users"]) == {str(i) for i in range(1, 11)}
+    assert data["errors"] == {"100": {"status_code": 404, "detail": "调用后端服务失败，状态码：404"}}
+
+
+@pytest.mark.asyncio
+async def test_unexpected_error_is_reported_as_502_for_that_user(caplog):
+    """意外异常（例如下游返回了无法解析的内容）只影响对应用户，按 502 返回并记日志。"""
+    backend = _FakeBackendClient()
+
+    async def get_user(user_id: int) -> dict:
+        if user_id == 2:
+            raise ValueError("invalid json")
+        return {"id": user_id}
+
+    backend.get_user = get_user
+    data = await fetch_users([1, 2], backend)
+    assert data["users"] == {"1": {"id": 1}}
+    assert data["errors"] == {"2": {"status_code": 502, "detail": "调用后端服务失败"}}
+    assert "批量查询用户 2" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_cached_users_are_served_without_downstream_call(cache):
+    backend = _FakeBackendClient()
+    await cache.get(1, lambda: backend.get_user(1))
+    backend.single_calls.clear()
+
+    data = await fetch_users([1, 2], backend)
+    assert backend.single_calls == [2]
+    assert data["users"] == {"1": {"id": 1}, "2": {"id": 2}}
+
+
+@pytest.mark.asyncio
+async def test_batch_api_merges_misses_and_caches_not_found(monkeypatch, cache):
+    monkeypatch.setattr(settings, "backend_users_batch_api", True)
+    backend = _FakeBackendClient()
+    await cache.get(1, lambda: backend.get_user(1))
+
+    data = await fetch_users([1, 2, 3, 2, 100], backend)
+    assert backend.batch_calls == [[2, 3, 100]]
+    assert set(data["users"]) == {"1", "2", "3"}
+    assert data["errors"]["100"]["status_code"] == 404
+
+    # 不存在的用户进入负缓存，短时间内不再查下游。
+    data = await fetch_users([100], backend)
+    assert backend.batch_calls == [[2, 3, 100]]
+    assert data["errors"]["100"]["status_code"] == 404
+
+
+@pytest.mark.asyncio
+async def test_batch_loader_splits_large_batches():
+    backend = _FakeBackendClient()
+    loader = UserBatchLoader(backend.get_users_batch, max_batch_size=2)
+    results = await asyncio.gather(*(loader.load(i) for i in range(1, 6)))
+    assert [user["id"] for user in results] == [1, 2, 3, 4, 5]
+    assert backend.batch_calls == [[1, 2], [3, 4], [5]]
+
+
+@respx.mock
+def test_batch_route_returns_results_keyed_by_id(monkeypatch):
+    """经过路由：重复 ID 只查一次，失败的用户放在 errors 中，不影响其他用户。"""
+    monkeypatch.setattr(settings, "users_batch_max_ids", 3)
+    respx.get("http://backend/api/users/1").mock(return_value=httpx.Response(200, json={"id": 1}))
+    respx.get("http://backend/api/users/2").mock(return_value=httpx.Response(500))
+    missing = respx.get("http://backend/api/users/3").mock(return_value=httpx.Response(404))
+    client = AsyncBackendServiceClient(base_url="http://backend")
+    app.dependency_overrides[get_backend_client] = lambda: client
+    app.dependency_overrides[get_current_user] = lambda: {"sub": "1"}
+    try:
+        with TestClient(app) as c:
+            resp = c.post("/gateway/backend/users:batch", json={"ids": [1, 2, 3, 3]})
+            too_many = c.post("/gateway/backend/users:batch", json={"ids": [1, 2, 3, 4]})
+            empty = c.post("/gateway/backend/users:batch", json={"ids": []})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert resp.status_code == 200
+    data = resp.json()["data"]
+    assert data["users"] == {"1": {"id": 1}}
+    assert data["errors"]["2"]["status_code"] == 502
+    assert data["errors"]["3"]["status_code"] == 404
+    assert missing.call_count == 1
+    assert too_many.status_code == 400
+    assert empty.status_code == 422
@@ -0,0 +1,148 @@
+"""用户信息缓存测试（TTL、stale-while-revalidate、负缓存、single-flight、失效）。"""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.client_backend_service import BackendServiceError
+from app.dependencies import get_backend_client, get_current_user
+from app.main import app
+from app.user_cache import UserProfileCache
+
+
+class _Clock:
+    """可手动拨动的时钟。"""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _CountingLoader:
+    """记录调用次数的下游桩：每次返回带版本号的用户信息。"""
+
+    def __init__(self, delay: float = 0.0, status_code: int | None = None) -> None:
+        self.calls = 0
+        self.delay = delay
+        self.status_code = status_code
+
+    async def __call__(self) -> dict:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.status_code is not None:
+            raise BackendServiceError(
+                f"调用后端服务失败，状态码：{self.status_code}", status_code=self.status_code
+            )
+        return {"id": 1, "version": self.calls}
+
+
+def _cache(clock: _Clock) -> UserProfileCache:
+    return UserProfileCache(
+        max_size=100, ttl_seconds=30, stale_seconds=300, negative_ttl_seconds=5, clock=clock
+    )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_are_coalesced():
+    """同一用户的 N 个并发未命中只产生一次下游请求。"""
+    cache = _cache(_Clock())
+    loader = _CountingLoader(delay=0.05)
+    results = await asyncio.gather(*(cache.get(1, loader) for _ in range(20)))
+    assert loader.calls == 1
+    assert all(result == {"id": 1, "version": 1} for result in results)
+    assert cache.stats()["coalesced"] == 19
+
+
+@pytest.mark.asyncio
+async def test_ttl_then_stale_while_revalidate():
+    """TTL 内命中缓存；过期后先返回旧值并在后台刷新；超出旧值窗口后重新加载。"""
+    clock = _Clock()
+    cache = _cache(clock)
+    loader = _CountingLoader()
+    assert (await cache.get(1, loader))["version"] == 1
+    clock.now += 10
+    assert (await cache.get(1, loader))["version"] == 1
+    assert loader.calls == 1
+
+    clock.now += 30
+    assert (await cache.get(1, loader))["version"] == 1
+    # 等后台刷新完成。
+    await asyncio.sleep(0.01)
+    assert loader.calls == 2
+    assert (await cache.get(1, loader))["version"] == 2
+
+    clock.now += 1000
+    assert (await cache.get(1, loader))["version"] == 3
+    stats = cache.stats()
+    assert stats["stale_hits"] == 1
+    assert stats["misses"] == 2
+
+
+@pytest.mark.asyncio
+async def test_not_found_is_cached_briefly():
+    """下游 404 会被短暂缓存，其他错误不缓存。"""
+    clock = _Clock()
+    cache = _cache(clock)
+    not_found = _CountingLoader(status_code=404)
+    for _ in range(3):
+        with pytest.raises(BackendServiceError) as exc_info:
+            await cache.get(7, not_found)
+        assert exc_info.value.status_code == 404
+    assert not_found.calls == 1
+    clock.now += 6
+    with pytest.raises(BackendServiceError):
+        await cache.get(7, not_found)
+    assert not_found.calls == 2
+
+    server_error = _CountingLoader(status_code=500)
+    for _ in range(2):
+        with pytest.raises(BackendServiceError):
+            await cache.get(8, server_error)
+    assert server_error.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_invalidate_drops_entry_and_inflight_result():
+    """失效后重新查下游，失效前发出的请求结果不会写回缓存。"""
+    cache = _cache(_Clock())
+    loader = _CountingLoader(delay=0.05)
+    assert (await cache.get(1, loader))["version"] == 1
+    assert cache.invalidate(1) is True
+    assert (await cache.get(1, loader))["version"] == 2
+
+    slow = asyncio.ensure_future(cache.get(2, loader))
+    await asyncio.sleep(0)
+    cache.invalidate(2)
+    await slow
+    assert cache.stats()["size"] == 1
+
+
+class _CountingBackendClient:
+    calls = 0
+
+    async def get_user(self, user_id: int) -> dict:
+        _CountingBackendClient.calls += 1
+        return {"id": user_id}
+
+
+def test_route_serves_from_cache_and_invalidation_endpoint():
+    """路由层：重复查询只打一次下游，超级管理员可以主动失效。"""
+    _CountingBackendClient.calls = 0
+    app.dependency_overrides[get_backend_client] = _CountingBackendClient
+    app.dependency_overrides[get_current_user] = lambda: {"sub": "1", "is_superuser": True}
+    try:
+        with TestClient(app) as c:
+            for _ in range(3):
+                assert c.get("/gateway/backend/users/5").json()["data"] == {"id": 5}
+            assert _CountingBackendClient.calls == 1
+            resp = c.delete("/gateway/backend/users/5/cache")
+            assert resp.json()["data"] == {"user_id": 5, "invalidated": True}
+            c.get("/gateway/backend/users/5")
+            assert _CountingBackendClient.calls == 2
+            stats = c.get("/gateway/stats/user-cache").json()["data"]
+            assert stats["hits"] == 2
+    finally:
+        app.dependency_overrides.clear()
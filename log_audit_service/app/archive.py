@@ -0,0 +1,460 @@
+"""
+审计日志冷数据归档（compaction）与查询穿透。
+
+归档任务：把早于 N 天的日志从 SQLite 搬到 archive_dir 下的只读段文件，再从热库删除：
+    python -m log_audit_service.manage archive --older-than-days 30
+
+段文件格式（一次归档可能产生多个段）：
+- <name>.seg：按 (created_at, id) 升序排列，每 archive_block_rows 行一个块，
+  每块是 zlib 压缩的 JSON 行（[id, created_at, actor, action, resource, source_service, ip, detail]）；
+- <name>.idx.json：稀疏索引，记录每个块的偏移、长度、min/max created_at 与 actor 布隆过滤器，
+  以及本段来自哪张表、覆盖到哪条日志（用于崩溃恢复）。
+
+查询穿透：query_audit_logs() 查完热库仍不够一页、且 since 落在归档范围内时，
+按时间从新到旧扫描段文件（仍带 .pending 标记的段不参与查询）；先用 min/max created_at 跳过整段 / 整块，
+按 actor 过滤时再用布隆过滤器跳过一定不包含该 actor 的块，只解压剩下的块。
+
+崩溃安全：每个段按 .pending 标记 -> 段文件 -> 索引 -> 删除热库行 -> 删除标记的顺序落盘。
+下次归档开始时，仍带 .pending 标记的段视为未完成：热库行还在就删掉这个段（稍后重新归档），
+热库行已删除（崩溃发生在删除标记之前）则保留段文件，只清理标记。
+"""
+
+import base64
+import hashlib
+import json
+import math
+import os
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import Table, select, tuple_
+from sqlalchemy.orm import Session
+
+from .compression import detail_text
+from .config import settings
+from .partitions import PARTITION_PREFIX, drop_partition, partition_range, tables_for_range
+
+
+SEGMENT_SUFFIX = ".seg"
+INDEX_SUFFIX = ".idx.json"
+PENDING_SUFFIX = ".pending"
+_BLOOM_FALSE_POSITIVE = 0.01
+
+
+class ArchivedAuditLog(NamedTuple):
+    """从段文件读出的一条日志，字段与 audit_logs 一致，可按属性读取或交给 AuditLogRead。"""
+
+    id: int
+    created_at: datetime
+    actor: Optional[str]
+    action: str
+    resource: Optional[str]
+    source_service: Optional[str]
+    ip: Optional[str]
+    detail: Optional[str]
+
+
+class BloomFilter:
+    """简单布隆过滤器：按期望元素个数与 1% 误判率确定位数组大小与哈希次数。"""
+
+    def __init__(self, num_bits: int, num_hashes: int, bits: Optional[bytearray] = None) -> None:
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bits if bits is not None else bytearray((num_bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int) -> "BloomFilter":
+        capacity = max(capacity, 1)
+        num_bits = max(8, int(-capacity * math.log(_BLOOM_FALSE_POSITIVE) / math.log(2) ** 2))
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        return cls(num_bits, num_hashes)
+
+    def _positions(self, value: str) -> Iterator[int]:
+        # 双重哈希：用一次 blake2b 的两段结果模拟 k 个独立哈希。
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, value: str) -> None:
+        for pos in self._positions(value):
+            self.bits[pos // 8] |= 1 << (pos % 8)
+
+    def might_contain(self, value: str) -> bool:
+        return all(self.bits[pos // 8] & (1 << (pos % 8)) for pos in self._positions(value))
+
+    def to_dict(self) -> dict:
+        return {
+            "num_bits": self.num_bits,
+            "num_hashes": self.num_hashes,
+            "bits": base64.b64encode(bytes(self.bits)).decode("ascii"),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BloomFilter":
+        return cls(data["num_bits"], data["num_hashes"], bytearray(base64.b64decode(data["bits"])))
+
+
+@dataclass
+class BlockInfo:
+    """段文件中一个压缩块的稀疏索引。"""
+
+    offset: int
+    length: int
+    count: int
+    min_created_at: datetime
+    max_created_at: datetime
+    actor_bloom: BloomFilter
+
+
+@dataclass
+class SegmentInfo:
+    """一个段文件及其稀疏索引。"""
+
+    path: str
+    min_created_at: datetime
+    max_created_at: datetime
+    row_count: int
+    blocks: List[BlockInfo]
+
+
+def _encode_row(row: ArchivedAuditLog) -> list:
+    # 热库中的 detail 可能是压缩句柄，段文件里统一存文本（整块另有 zlib 压缩）。
+    return [row.id, row.created_at.isoformat(), *row[2:-1], detail_text(row.detail)]
+
+
+def _decode_row(data: list) -> ArchivedAuditLog:
+    return ArchivedAuditLog(data[0], datetime.fromisoformat(data[1]), *data[2:])
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    """先写临时文件并 fsync，再原子替换，保证段文件和索引要么完整要么不存在。"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as fh:
+        fh.write(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+
+
+def segment_name(rows: Sequence[ArchivedAuditLog]) -> str:
+    """段文件名（不含后缀），由首行时间与首尾 id 决定。"""
+    first, last = rows[0], rows[-1]
+    return f"seg-{first.created_at:%Y%m%dT%H%M%S}-{first.id}-{last.id}"
+
+
+def write_segment(
+    archive_dir: str,
+    rows: Sequence[ArchivedAuditLog],
+    *,
+    source_table: str,
+    block_rows: int,
+) -> str:
+    """把已按 (created_at, id) 升序排好的日志写成一个段文件，返回段文件路径。"""
+    os.makedirs(archive_dir, exist_ok=True)
+    first, last = rows[0], rows[-1]
+    name = segment_name(rows)
+    seg_path = os.path.join(archive_dir, name + SEGMENT_SUFFIX)
+
+    payload = bytearray()
+    blocks = []
+    for start in range(0, len(rows), block_rows):
+        block = rows[start : start + block_rows]
+        bloom = BloomFilter.for_capacity(len(block))
+        for row in block:
+            if row.actor is not None:
+                bloom.add(row.actor)
+        raw = "\n".join(
+            json.dumps(_encode_row(row), ensure_ascii=False, separators=(",", ":"))
+            for row in block
+        )
+        compressed = zlib.compress(raw.encode("utf-8"), 6)
+        blocks.append(
+            {
+                "offset": len(payload),
+                "length": len(compressed),
+                "count": len(block),
+                "min_created_at": block[0].created_at.isoformat(),
+                "max_created_at": block[-1].created_at.isoformat(),
+                "actor_bloom": bloom.to_dict(),
+            }
+        )
+        payload.extend(compressed)
+
+    index = {
+        "version": 1,
+        "source_table": source_table,
+        "upto": [last.created_at.isoformat(), last.id],
+        "min_created_at": first.created_at.isoformat(),
+        "max_created_at": last.created_at.isoformat(),
+        "row_count": len(rows),
+        "blocks": blocks,
+    }
+    _write_atomic(seg_path, bytes(payload))
+    # 索引最后落盘：只有带索引的段文件才会被查询看到。
+    _write_atomic(
+        os.path.join(archive_dir, name + INDEX_SUFFIX),
+        json.dumps(index, separators=(",", ":")).encode("utf-8"),
+    )
+    return seg_path
+
+
+def _load_segment(index_path: str) -> SegmentInfo:
+    with open(index_path, "rb") as fh:
+        index = json.loads(fh.read())
+    blocks = [
+        BlockInfo(
+            offset=block["offset"],
+            length=block["length"],
+            count=block["count"],
+            min_created_at=datetime.fromisoformat(block["min_created_at"]),
+            max_created_at=datetime.fromisoformat(block["max_created_at"]),
+            actor_bloom=BloomFilter.from_dict(block["actor_bloom"]),
+        )
+        for block in index["blocks"]
+    ]
+    return SegmentInfo(
+        path=index_path[: -len(INDEX_SUFFIX)] + SEGMENT_SUFFIX,
+        min_created_at=datetime.fromisoformat(index["min_created_at"]),
+        max_created_at=datetime.fromisoformat(index["max_created_at"]),
+        row_count=index["row_count"],
+        blocks=blocks,
+    )
+
+
+class SegmentCatalog:
+    """某个归档目录下全部段文件的稀疏索引，目录有变化时才重新加载。"""
+
+    def __init__(self, archive_dir: str) -> None:
+        self.archive_dir = archive_dir
+        self._mtime_ns: Optional[int] = None
+        self._segments: List[SegmentInfo] = []
+
+    def segments(self) -> List[SegmentInfo]:
+        """返回所有已完成的段，按时间从新到旧排序。"""
+        try:
+            mtime_ns = os.stat(self.archive_dir).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        if mtime_ns != self._mtime_ns:
+            names = set(os.listdir(self.archive_dir))
+            # 还带 .pending 标记的段对应的热库行可能尚未删除，查询时跳过，避免同一行返回两次；
+            # 删除标记会改变目录 mtime，届时自动重新加载。
+            segments = [
+                _load_segment(os.path.join(self.archive_dir, name))
+                for name in names
+                if name.endswith(INDEX_SUFFIX)
+                and name[: -len(INDEX_SUFFIX)] + PENDING_SUFFIX not in names
+            ]
+            segments.sort(key=lambda seg: seg.max_created_at, reverse=True)
+            self._segments = segments
+            self._mtime_ns = mtime_ns
+        return self._segments
+
+
+_catalogs: Dict[str, SegmentCatalog] = {}
+
+
+def get_catalog(archive_dir: Optional[str] = None) -> Optional[SegmentCatalog]:
+    """获取归档目录对应的段目录；未配置归档目录时返回 None。"""
+    archive_dir = archive_dir or settings.archive_dir
+    if not archive_dir:
+        return None
+    if archive_dir not in _catalogs:
+        _catalogs[archive_dir] = SegmentCatalog(archive_dir)
+    return _catalogs[archive_dir]
+
+
+def archive_may_contain(since: Optional[datetime], until: Optional[datetime]) -> bool:
+    """归档中是否可能有落在 [since, until] 内的日志。"""
+    catalog = get_catalog()
+    if catalog is None:
+        return False
+    return any(
+        (since is None or seg.max_created_at >= since)
+        and (until is None or seg.min_created_at <= until)
+        for seg in catalog.segments()
+    )
+
+
+def _contains(value: Optional[str], term: str) -> bool:
+    return value is not None and term.casefold() in value.casefold()
+
+
+def _matches_text(row: ArchivedAuditLog, term: str) -> bool:
+    """与 LIKE 退化路径一致：检索词出现在 detail / action / resource 任一字段即可。"""
+    return any(_contains(value, term) for value in (row.detail, row.action, row.resource))
+
+
+def scan_archive(
+    *,
+    actor: Optional[str] = None,
+    action: Optional[str] = None,
+    source_service: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    q: Optional[str] = None,
+    after: Optional[Tuple[datetime, int]] = None,
+) -> Iterator[ArchivedAuditLog]:
+    """
+    按 (created_at, id) 倒序逐条产出归档中符合条件的日志。
+
+    过滤语义与热库查询一致；q 在归档中按不区分大小写的子串匹配处理。
+    """
+    catalog = get_catalog()
+    if catalog is None:
+        return
+    upper = until
+    if after is not None:
+        upper = after[0] if upper is None else min(upper, after[0])
+    terms = q.split() if q else []
+
+    for seg in catalog.segments():
+        if since is not None and seg.max_created_at < since:
+            continue
+        if upper is not None and seg.min_created_at > upper:
+            continue
+        with open(seg.path, "rb") as fh:
+            for block in reversed(seg.blocks):
+                if since is not None and block.max_created_at < since:
+                    continue
+                if upper is not None and block.min_created_at > upper:
+                    continue
+                if actor and not block.actor_bloom.might_contain(actor):
+                    continue
+                fh.seek(block.offset)
+                lines = zlib.decompress(fh.read(block.length)).decode("utf-8").split("\n")
+                for line in reversed(lines):
+                    row = _decode_row(json.loads(line))
+                    if actor and row.actor != actor:
+                        continue
+                    if action and row.action != action:
+                        continue
+                    if source_service and row.source_service != source_service:
+                        continue
+                    if since is not None and row.created_at < since:
+                        continue
+                    if until is not None and row.created_at > until:
+                        continue
+                    if after is not None and (row.created_at, row.id) >= after:
+                        continue
+                    if terms and not all(_matches_text(row, t) for t in terms):
+                        continue
+                    yield row
+
+
+def _delete_archived(db: Session, table: Table, upto: Tuple[datetime, int]) -> None:
+    """删除热库中已归档的行：即 (created_at, id) 不超过 upto 的全部行。"""
+    db.execute(
+        table.delete().where(tuple_(table.c.created_at, table.c.id) <= tuple_(*upto))
+    )
+
+
+def _source_table(db: Session, name: str) -> Optional[Table]:
+    for table in tables_for_range(db):
+        if table.name == name:
+            return table
+    return None
+
+
+def _has_rows_upto(db: Session, table: Table, upto: Tuple[datetime, int]) -> bool:
+    return (
+        db.execute(
+            select(table.c.id)
+            .where(tuple_(table.c.created_at, table.c.id) <= tuple_(*upto))
+            .limit(1)
+        ).first()
+        is not None
+    )
+
+
+def _remove_if_exists(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _recover_pending(db: Session, archive_dir: str) -> None:
+    """处理上次归档中崩溃留下的 .pending 标记。"""
+    if not os.path.isdir(archive_dir):
+        return
+    for name in os.listdir(archive_dir):
+        if not name.endswith(PENDING_SUFFIX):
+            continue
+        marker = os.path.join(archive_dir, name)
+        with open(marker, "rb") as fh:
+            pending = json.loads(fh.read())
+        table = _source_table(db, pending["source_table"])
+        created_at, log_id = pending["upto"]
+        if table is not None and _has_rows_upto(
+            db, table, (datetime.fromisoformat(created_at), log_id)
+        ):
+            # 热库删除还没提交：段不完整或与热库重复，先撤下索引再删段文件，之后重新归档。
+            base = marker[: -len(PENDING_SUFFIX)]
+            for suffix in (INDEX_SUFFIX, SEGMENT_SUFFIX):
+                _remove_if_exists(base + suffix)
+                _remove_if_exists(base + suffix + ".tmp")
+        os.remove(marker)
+
+
+def archive_old_logs(
+    db: Session,
+    *,
+    older_than_days: int,
+    archive_dir: Optional[str] = None,
+    segment_rows: int = 100_000,
+    block_rows: Optional[int] = None,
+    now: Optional[datetime] = None,
+) -> int:
+    """
+    把早于 older_than_days 天的日志搬进段文件并从热库删除，返回归档的条数。
+
+    每 segment_rows 行生成一个段文件，随后立即在一个事务里删除对应的热库行；
+    已经整体过期的分区在搬空后直接 DROP。
+    """
+    archive_dir = archive_dir or settings.archive_dir
+    if not archive_dir:
+        raise ValueError("未配置归档目录：请设置 LOG_AUDIT_ARCHIVE_DIR")
+    block_rows = block_rows or settings.archive_block_rows
+    cutoff = (now or datetime.utcnow()) - timedelta(days=older_than_days)
+    _recover_pending(db, archive_dir)
+
+    archived = 0
+    # 从最老的表开始搬，保证段文件之间的时间顺序与热库一致。
+    for table in reversed(tables_for_range(db, until=cutoff)):
+        while True:
+            chunk = [
+                ArchivedAuditLog(*row)
+                for row in db.execute(
+                    select(table)
+                    .where(table.c.created_at < cutoff)
+                    .order_by(table.c.created_at, table.c.id)
+                    .limit(segment_rows)
+                )
+            ]
+            if not chunk:
+                break
+            upto = (chunk[-1].created_at, chunk[-1].id)
+            os.makedirs(archive_dir, exist_ok=True)
+            marker = os.path.join(archive_dir, segment_name(chunk) + PENDING_SUFFIX)
+            # 标记先于段文件落盘，崩溃后任何没走完的段都能被 _recover_pending 找到。
+            _write_atomic(
+                marker,
+                json.dumps(
+                    {"source_table": table.name, "upto": [upto[0].isoformat(), upto[1]]}
+                ).encode("utf-8"),
+            )
+            write_segment(archive_dir, chunk, source_table=table.name, block_rows=block_rows)
+            _delete_archived(db, table, upto)
+            db.commit()
+            os.remove(marker)
+            archived += len(chunk)
+
+        if table.name.startswith(PARTITION_PREFIX) and partition_range(table.name)[1] <= cutoff:
+            drop_partition(db, table.name)
+            db.commit()
+    return archived
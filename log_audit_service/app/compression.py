@@ -0,0 +1,288 @@
+"""
+审计日志 detail 字段的透明压缩（LOG_AUDIT_DETAIL_COMPRESSION_ENABLED，仅 SQLite）。
+
+detail 是自由文本，占了库文件和页缓存的大头。开启后：
+- 写入：CompressedText 类型在绑定参数时把足够长的 detail 用 zlib 压缩，以 BLOB 存入原来的列；
+  配置了共享字典（LOG_AUDIT_DETAIL_COMPRESSION_DICT_PATH）时用字典压缩，短文本也能压下来；
+- 读取：查询结果里压缩过的值是 CompressedDetail 句柄，只在序列化（AuditLogRead、导出、
+  /logs/ui 渲染、归档）时才解压，被多取来判断翻页、或被丢弃的行不会解压；
+- 未压缩的历史数据（TEXT）照常读取，压缩与否按行区分，可以边跑边迁移：
+    python -m log_audit_service.manage compress-details
+
+存储格式（BLOB）：
+- 0x01 + zlib 数据：不带字典；
+- 0x02 + 字典 ID（4 字节）+ zlib 数据：用字典压缩，字典 ID 为字典内容的 blake2b 摘要。
+
+全文索引的触发器通过注册到每个 SQLite 连接上的 audit_detail_text() 函数索引解压后的文本，
+因此开启压缩后，不经过本服务的连接（例如 sqlite3 命令行）无法再写入日志表。
+PostgreSQL 会自动对大字段做 TOAST 压缩，这里不做处理，detail 仍以 TEXT 存储。
+"""
+
+import hashlib
+import re
+import zlib
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+from sqlalchemy import bindparam, event, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.types import LargeBinary, Text, TypeDecorator
+
+from .config import settings
+
+
+_PLAIN = b"\x01"
+_WITH_DICT = b"\x02"
+_DICT_ID_BYTES = 4
+# 触发器与 LIKE 退化路径中使用的 SQL 函数名。
+SQL_FUNCTION = "audit_detail_text"
+
+# 已加载过的字典：字典 ID -> 字典内容。
+_dictionaries: Dict[bytes, bytes] = {}
+
+
+def dictionary_id(zdict: bytes) -> bytes:
+    return hashlib.blake2b(zdict, digest_size=_DICT_ID_BYTES).digest()
+
+
+def register_dictionary(zdict: bytes) -> bytes:
+    """登记一份字典，使用它压缩过的数据才能解压；返回字典 ID。"""
+    dict_id = dictionary_id(zdict)
+    _dictionaries[dict_id] = zdict
+    return dict_id
+
+
+@lru_cache
+def _load_dictionary(path: str) -> Tuple[bytes, bytes]:
+    with open(path, "rb") as fh:
+        zdict = fh.read()
+    return register_dictionary(zdict), zdict
+
+
+def active_dictionary() -> Optional[Tuple[bytes, bytes]]:
+    """当前配置的字典 (ID, 内容)，未配置时返回 None。"""
+    if not settings.detail_compression_dict_path:
+        return None
+    return _load_dictionary(settings.detail_compression_dict_path)
+
+
+def compress_detail(text: str) -> bytes:
+    """按当前配置压缩一段 detail 文本。"""
+    data = text.encode("utf-8")
+    active = active_dictionary()
+    if active is None:
+        return _PLAIN + zlib.compress(data, settings.detail_compression_level)
+    dict_id, zdict = active
+    compressor = zlib.compressobj(settings.detail_compression_level, zdict=zdict)
+    return _WITH_DICT + dict_id + compressor.compress(data) + compressor.flush()
+
+
+def decompress_detail(raw: bytes) -> str:
+    """解压 compress_detail() 的输出。"""
+    marker = raw[:1]
+    if marker == _PLAIN:
+        return zlib.decompress(raw[1:]).decode("utf-8")
+    if marker == _WITH_DICT:
+        dict_id = raw[1 : 1 + _DICT_ID_BYTES]
+        if dict_id not in _dictionaries:
+            # 可能是启动后还没有压缩过任何数据，先按配置加载一次。
+            active_dictionary()
+        zdict = _dictionaries.get(dict_id)
+        if zdict is None:
+            raise ValueError(
+                f"找不到压缩字典 {dict_id.hex()}，请检查 LOG_AUDIT_DETAIL_COMPRESSION_DICT_PATH"
+            )
+        decompressor = zlib.decompressobj(zdict=zdict)
+        data = decompressor.decompress(raw[1 + _DICT_ID_BYTES :]) + decompressor.flush()
+        return data.decode("utf-8")
+    raise ValueError(f"无法识别的 detail 压缩格式：{marker!r}")
+
+
+def is_current_format(raw: bytes) -> bool:
+    """压缩数据是否与当前配置一致（是否用了当前字典），迁移工具据此决定是否重写。"""
+    active = active_dictionary()
+    if active is None:
+        return raw[:1] == _PLAIN
+    return raw[:1] == _WITH_DICT and raw[1 : 1 + _DICT_ID_BYTES] == active[0]
+
+
+class CompressedDetail:
+    """压缩过的 detail：首次转成文本时才解压，之后缓存结果。"""
+
+    __slots__ = ("raw", "_text")
+
+    def __init__(self, raw: bytes) -> None:
+        self.raw = raw
+        self._text: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = decompress_detail(self.raw)
+        return self._text
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __repr__(self) -> str:
+        return f"CompressedDetail({len(self.raw)} bytes)"
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, CompressedDetail):
+            return self.text == other.text
+        if isinstance(other, str):
+            return self.text == other
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.text)
+
+
+def detail_text(value: Union[str, CompressedDetail, None]) -> Optional[str]:
+    """把查询结果里的 detail（文本或压缩句柄）统一转成文本。"""
+    if isinstance(value, CompressedDetail):
+        return value.text
+    return value
+
+
+class CompressedText(TypeDecorator):
+    """detail 列的类型：DDL 仍是 TEXT，开启压缩时在 SQLite 中以 BLOB 保存压缩数据。"""
+
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value: Any, dialect) -> Any:
+        if isinstance(value, CompressedDetail):
+            # 原样写回（例如 ORM 对象被再次 flush），不重复解压 / 压缩。
+            return value.raw if dialect.name == "sqlite" else value.text
+        if (
+            value is None
+            or not settings.detail_compression_enabled
+            or dialect.name != "sqlite"
+            or len(value) < settings.detail_compression_min_length
+        ):
+            return value
+        return compress_detail(value)
+
+    def process_result_value(self, value: Any, dialect) -> Any:
+        if isinstance(value, bytes):
+            return CompressedDetail(value)
+        return value
+
+
+def _sql_detail_text(value: Union[str, bytes, None]) -> Optional[str]:
+    if isinstance(value, bytes):
+        return decompress_detail(value)
+    return value
+
+
+@event.listens_for(Engine, "connect")
+def _register_sql_function(dbapi_connection, connection_record) -> None:
+    """在每个 SQLite 连接（含 aiosqlite）上注册 audit_detail_text()，供触发器和 LIKE 使用。"""
+    create_function = getattr(dbapi_connection, "create_function", None)
+    if create_function is not None:
+        create_function(SQL_FUNCTION, 1, _sql_detail_text, deterministic=True)
+
+
+# 字典训练：按单词 / 标点切分片段（连同前导空白），统计单个片段以及连续 2 ~ 3 个片段的出现次数。
+_FRAGMENT_RE = re.compile(r"\s*(?:\w+|[^\w\s]+)")
+
+
+def train_dictionary(samples: Iterable[str], size: int = 16 * 1024) -> bytes:
+    """
+    从一批 detail 样本训练共享字典。
+
+    zlib 的预置字典就是一段“假装出现在数据之前”的文本：把样本里反复出现的片段
+    （模板化的句子、字段名、服务名等）拼进去，短文本也能引用它们。
+    收益高（出现次数 × 长度）的片段放在末尾，离数据更近，引用距离更短。
+    """
+    counter: Counter = Counter()
+    for sample in samples:
+        fragments = _FRAGMENT_RE.findall(sample)
+        for n in (1, 2, 3):
+            for start in range(len(fragments) - n + 1):
+                counter["".join(fragments[start : start + n])] += 1
+
+    chosen = []
+    used = 0
+    ranked = sorted(
+        ((count - 1) * len(fragment.encode("utf-8")), fragment)
+        for fragment, count in counter.items()
+        if count > 1
+    )
+    for _score, fragment in reversed(ranked):
+        if used >= size:
+            break
+        encoded = fragment.encode("utf-8")
+        if used + len(encoded) > size:
+            continue
+        if any(fragment in other for other in chosen):
+            continue
+        chosen.append(fragment)
+        used += len(encoded)
+    # chosen 按收益从高到低排列，反转后收益最高的在末尾。
+    return "".join(reversed(chosen)).encode("utf-8")
+
+
+def migrate_details(
+    db: Session, *, chunk_size: int = 1000, decompress: bool = False
+) -> Tuple[int, int]:
+    """
+    按 ID 分块重写已有日志的 detail，返回 (扫描行数, 重写行数)。
+
+    - 默认：把未压缩、或用旧字典压缩的 detail 按当前配置重新压缩；
+    - decompress=True：把压缩过的 detail 还原为文本，关闭压缩之前先执行。
+
+    两个方向都要求当前开启了压缩：触发器此时经 audit_detail_text() 维护全文索引，
+    UPDATE 前后的文本一致，索引不会错乱。每块一个事务，可以随时中断后重跑。
+    """
+    # partitions -> fulltext 依赖本模块，这里延迟导入避免循环引用。
+    from .partitions import tables_for_range
+
+    if not settings.detail_compression_enabled:
+        raise ValueError("请先开启 LOG_AUDIT_DETAIL_COMPRESSION_ENABLED 再迁移 detail")
+
+    scanned = rewritten = 0
+    for table in tables_for_range(db):
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(detail=bindparam("b_detail", type_=Text if decompress else LargeBinary))
+        )
+        last_id = 0
+        while True:
+            chunk = db.execute(
+                select(table.c.id, table.c.detail)
+                .where(table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(chunk_size)
+            ).all()
+            if not chunk:
+                break
+            params = []
+            for log_id, detail in chunk:
+                new_value = _migrated_value(detail, decompress)
+                if new_value is not None:
+                    params.append({"b_id": log_id, "b_detail": new_value})
+            if params:
+                db.execute(stmt, params)
+            db.commit()
+            scanned += len(chunk)
+            rewritten += len(params)
+            last_id = chunk[-1].id
+    return scanned, rewritten
+
+
+def _migrated_value(
+    detail: Union[str, CompressedDetail, None], decompress: bool
+) -> Union[str, bytes, None]:
+    """计算一行 detail 迁移后的存储值；不需要重写时返回 None。"""
+    if isinstance(detail, CompressedDetail):
+        if decompress:
+            return detail.text
+        return None if is_current_format(detail.raw) else compress_detail(detail.text)
+    if decompress or detail is None or len(detail) < settings.detail_compression_min_length:
+        return None
+    return compress_detail(detail)
@@ -4,16 +4,21 @@
 这个文件是数据层入口，主要负责：
 - 创建 engine；
 - 创建 SessionLocal；
-- 提供 FastAPI 依赖 get_db()。
+- 提供 FastAPI 依赖 get_db()；
+- LOG_AUDIT_DB_MODE=async 时，额外提供异步 engine 与依赖 get_async_db()。
 
 如果日志接口报数据库连接问题，通常先从这里查。
 """
 
-from typing import Generator
+from functools import lru_cache
+from typing import TYPE_CHECKING, AsyncGenerator, Generator
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import declarative_base, sessionmaker, Session
 
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
 from .config import settings
 
 
@@ -39,3 +44,40 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+# 同步连接串对应的异步驱动。
+_ASYNC_DRIVERS = {
+    "sqlite://": "sqlite+aiosqlite://",
+    "postgresql://": "postgresql+asyncpg://",
+}
+
+
+def async_database_url(url: str) -> str:
+    """把同步连接串换成异步驱动，例如 sqlite:///./log_audit.db -> sqlite+aiosqlite:///./log_audit.db。"""
+    for prefix, async_prefix in _ASYNC_DRIVERS.items():
+        if url.startswith(prefix):
+            return async_prefix + url[len(prefix):]
+    return url
+
+
+@lru_cache
+def get_async_engine() -> "AsyncEngine":
+    """异步 engine：首次使用时才创建，sync 模式下不要求安装 aiosqlite / greenlet。"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    return create_async_engine(async_database_url(SQLALCHEMY_DATABASE_URL))
+
+
+@lru_cache
+def get_async_sessionmaker() -> "async_sessionmaker[AsyncSession]":
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    # 提交后不过期对象属性：async 模式下访问过期属性会触发隐式 IO 而报错。
+    return async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db() -> AsyncGenerator["AsyncSession", None]:
+    """FastAPI 依赖：获取一个异步数据库会话。"""
+    async with get_async_sessionmaker()() as db:
+        yield db
@@ -0,0 +1,211 @@
+"""
+审计日志全文检索（SQLite FTS5）。
+
+索引结构：
+- 每张日志表（audit_logs 以及各分区表）对应一张外部内容 FTS5 表 <表名>_fts，
+  只索引 detail / action / resource，正文仍存放在原表中；
+- 原表上的 INSERT / UPDATE / DELETE 触发器负责同步索引，写入路径无需额外代码；
+- 默认使用 trigram 分词器，支持中文与订单号、用户名等任意子串（至少 3 个字符）检索；
+- 开启 detail 压缩时，触发器经 audit_detail_text() 索引解压后的文本（见 compression.py），
+  启动时发现触发器与当前配置不符会自动重建触发器。
+
+降级策略：
+- 非 SQLite 后端、SQLite 未编译 FTS5、或关闭了 LOG_AUDIT_FULLTEXT_ENABLED 时，
+  q 参数退化为对三个字段的 LIKE 子串匹配，结果一致，只是需要扫描；
+- 检索词短于 3 个字符时 trigram 无法命中，同样退化为 LIKE。
+"""
+
+import logging
+import re
+from typing import Set
+from weakref import WeakKeyDictionary
+
+from sqlalchemy import Table, Text, and_, func, literal_column, or_, select, table, text, true
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql.elements import ColumnElement
+
+from .compression import SQL_FUNCTION
+from .config import settings
+
+
+logger = logging.getLogger(__name__)
+
+FTS_SUFFIX = "_fts"
+_INDEXED_COLUMNS = ("detail", "action", "resource")
+# 需要建立全文索引的日志表：audit_logs 本身及其分区表（命名规则见 partitions.py）。
+_LOG_TABLE_RE = re.compile(r"^audit_logs(_p\d{6}|_p\d{8})?$")
+# trigram 分词器的最短可检索长度。
+_MIN_TERM_LENGTH = 3
+
+# 每个 engine（即每个数据库）已确认建好全文索引的日志表名。
+_fts_tables: "WeakKeyDictionary[Engine, Set[str]]" = WeakKeyDictionary()
+
+
+def _indexed_tables(engine: Engine) -> Set[str]:
+    return _fts_tables.setdefault(engine, set())
+
+
+def _indexed_values(prefix: str) -> str:
+    """触发器 / 重建语句中被索引的取值表达式，例如 new.detail, new.action, new.resource。"""
+    values = []
+    for col in _INDEXED_COLUMNS:
+        expr = f"{prefix}{col}"
+        if col == "detail" and settings.detail_compression_enabled:
+            expr = f"{SQL_FUNCTION}({expr})"
+        values.append(expr)
+    return ", ".join(values)
+
+
+def _drop_stale_triggers(conn: Connection, fts: str) -> None:
+    """已有触发器与当前的 detail 压缩配置不一致时删除，随后按当前配置重建。"""
+    trigger_sql = conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = :name"),
+        {"name": f"{fts}_ai"},
+    ).scalar()
+    if trigger_sql is None or (SQL_FUNCTION in trigger_sql) == settings.detail_compression_enabled:
+        return
+    for suffix in ("_ai", "_ad", "_au"):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {fts}{suffix}"))
+
+
+def fulltext_status(engine: Engine) -> dict:
+    """返回全文索引状态，供 /logs/metrics 展示。"""
+    return {
+        "enabled": settings.fulltext_enabled,
+        "indexed_tables": len(_fts_tables.get(engine, ())),
+    }
+
+
+def create_fulltext_index(conn: Connection, table_name: str) -> bool:
+    """
+    为一张日志表建立 FTS5 索引与同步触发器（幂等）。
+
+    新建索引时若原表已有数据，会执行一次 rebuild 补齐。
+    返回是否建立成功；失败（后端不支持等）时返回 False，调用方按 LIKE 降级。
+    """
+    if not settings.fulltext_enabled or conn.dialect.name != "sqlite":
+        return False
+    indexed = _indexed_tables(conn.engine)
+    if table_name in indexed:
+        return True
+
+    fts = f"{table_name}{FTS_SUFFIX}"
+    cols = ", ".join(_INDEXED_COLUMNS)
+    new_cols = _indexed_values("new.")
+    old_cols = _indexed_values("old.")
+    existed = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": fts},
+    ).first()
+    try:
+        # 只有第一条 CREATE VIRTUAL TABLE 可能因不支持 FTS5 而失败，此时库里尚未做任何改动。
+        conn.execute(
+            text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                f"{cols}, content='{table_name}', content_rowid='id', "
+                f"tokenize='{settings.fts_tokenizer}')"
+            )
+        )
+        _drop_stale_triggers(conn, fts)
+        conn.execute(
+            text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table_name} BEGIN "
+                f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+            )
+        )
+        conn.execute(
+            text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table_name} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {cols}) "
+                f"VALUES ('delete', old.id, {old_cols}); END"
+            )
+        )
+        conn.execute(
+            text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table_name} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {cols}) "
+                f"VALUES ('delete', old.id, {old_cols}); "
+                f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+            )
+        )
+        if not existed:
+            # 不用 FTS5 的 'rebuild'：它直接读原表的 detail 列，读到的可能是压缩数据。
+            conn.execute(
+                text(
+                    f"INSERT INTO {fts}(rowid, {cols}) "
+                    f"SELECT id, {_indexed_values('')} FROM {table_name}"
+                )
+            )
+    except OperationalError:
+        logger.warning(
+            "当前 SQLite 不支持 FTS5（或分词器 %s），q 检索将退化为 LIKE", settings.fts_tokenizer
+        )
+        return False
+
+    indexed.add(table_name)
+    return True
+
+
+def init_fulltext(engine: Engine) -> None:
+    """服务启动时为已有的日志表补建全文索引。"""
+    if not settings.fulltext_enabled or engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        init_fulltext_tables(conn)
+
+
+def init_fulltext_tables(conn: Connection) -> None:
+    """
+    在给定连接上为已有日志表补建（或登记）全文索引。
+
+    async 模式下由 AsyncConnection.run_sync() 调用，让异步 engine 也登记已建好的索引。
+    """
+    if not settings.fulltext_enabled or conn.dialect.name != "sqlite":
+        return
+    names = conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'")).scalars()
+    for name in [name for name in names if _LOG_TABLE_RE.match(name)]:
+        if not create_fulltext_index(conn, name):
+            return
+
+
+def drop_fulltext_index(conn: Connection, table_name: str) -> None:
+    """删除日志表对应的全文索引（触发器随原表一起删除）。"""
+    if conn.dialect.name == "sqlite":
+        conn.execute(text(f"DROP TABLE IF EXISTS {table_name}{FTS_SUFFIX}"))
+    _indexed_tables(conn.engine).discard(table_name)
+
+
+def _quote_term(term: str) -> str:
+    """把检索词包装成 FTS5 短语，避免用户输入被当成 MATCH 语法解析。"""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def fulltext_condition(engine: Engine, log_table: Table, q: str) -> ColumnElement:
+    """
+    生成“q 命中 detail / action / resource”的过滤条件。
+
+    多个空格分隔的词之间为 AND 关系；有索引时走 FTS5 MATCH，否则退化为 LIKE。
+    """
+    terms = q.split()
+    if not terms:
+        return true()
+
+    indexed = _fts_tables.get(engine, ())
+    if log_table.name in indexed and all(len(term) >= _MIN_TERM_LENGTH for term in terms):
+        fts = table(f"{log_table.name}{FTS_SUFFIX}")
+        match_expr = " AND ".join(_quote_term(term) for term in terms)
+        matched_ids = (
+            select(literal_column("rowid"))
+            .select_from(fts)
+            .where(literal_column(fts.name).op("MATCH")(match_expr))
+        )
+        return log_table.c.id.in_(matched_ids)
+
+    columns = [log_table.c[col] for col in _INDEXED_COLUMNS]
+    if settings.detail_compression_enabled and engine.dialect.name == "sqlite":
+        # 压缩过的 detail 是 BLOB，需要先解压再做子串匹配。
+        columns[0] = getattr(func, SQL_FUNCTION)(log_table.c.detail, type_=Text)
+    return and_(
+        *[or_(*[column.contains(term, autoescape=True) for column in columns]) for term in terms]
+    )
@@ -0,0 +1,185 @@
+"""
+审计日志缓冲写入（write-behind）。
+
+调用关系：
+routers/audit_logs.py (POST /logs, ingest_mode=buffered)
+    -> AuditLogBuffer.submit()  入队后立即返回 202
+    -> 后台 flusher 线程 -> bulk_create_audit_logs() 批量提交
+
+提交时机：攒够 flush_batch_size 条，或距上次提交超过 flush_interval_ms，先到者为准。
+应用关闭时由 main.py 的 lifespan 调用 stop()，把队列中剩余日志全部写完再退出。
+
+排查建议：
+- 日志“丢了”，先看 /logs/metrics 中的 dropped_total（队列满）与 failed_total（提交失败）；
+- 写入延迟高，看 last_flush_latency_ms / max_flush_latency_ms。
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import SessionLocal
+from .repositories.audit_log_repository import bulk_create_audit_logs
+from .schemas import AuditLogCreate
+
+
+logger = logging.getLogger(__name__)
+
+
+class AuditLogBuffer:
+    """有界内存队列 + 后台批量提交线程。"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        *,
+        max_size: int,
+        flush_interval_ms: int,
+        flush_batch_size: int,
+    ) -> None:
+        self._session_factory = session_factory
+        self.max_size = max_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_batch_size = flush_batch_size
+
+        # 队列元素为 (日志入参, 入队时间)，入队时间会作为日志的 created_at 落库。
+        self._queue: Deque[Tuple[AuditLogCreate, datetime]] = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        self.enqueued_total = 0
+        self.flushed_total = 0
+        self.dropped_total = 0
+        self.failed_total = 0
+        self.flush_count = 0
+        self.last_flush_latency_ms = 0.0
+        self.max_flush_latency_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        """后台提交线程是否在运行。"""
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def queue_depth(self) -> int:
+        """当前排队等待提交的日志条数。"""
+        with self._cond:
+            return len(self._queue)
+
+    def submit(self, log_in: AuditLogCreate) -> bool:
+        """
+        把一条日志放入队列。
+
+        队列已满时不阻塞调用方，直接丢弃并计入 dropped_total，返回 False。
+        """
+        with self._cond:
+            if len(self._queue) >= self.max_size:
+                self.dropped_total += 1
+                return False
+            self._queue.append((log_in, datetime.utcnow()))
+            self.enqueued_total += 1
+            if len(self._queue) >= self.flush_batch_size:
+                self._cond.notify()
+        return True
+
+    def start(self) -> None:
+        """启动后台提交线程（重复调用无副作用）。"""
+        if self.running:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._run, name="audit-log-flusher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """通知后台线程排空队列后退出，并等待其结束。"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+            return
+        # 后台线程从未启动过（例如运行中切换了写入模式），在当前线程直接排空。
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            self._flush(batch)
+
+    def _take_batch(self) -> List[Tuple[AuditLogCreate, datetime]]:
+        """等待到“攒够一批 / 到达提交间隔 / 收到停止信号”之一，取出一批日志。"""
+        deadline = time.monotonic() + self.flush_interval
+        with self._cond:
+            while not self._stopping and len(self._queue) < self.flush_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            size = min(len(self._queue), self.flush_batch_size)
+            return [self._queue.popleft() for _ in range(size)]
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if batch:
+                self._flush(batch)
+            with self._cond:
+                if self._stopping and not self._queue:
+                    return
+
+    def _flush(self, batch: List[Tuple[AuditLogCreate, datetime]]) -> None:
+        """把一批日志在一个事务中写入数据库。"""
+        started = time.perf_counter()
+        db = self._session_factory()
+        try:
+            bulk_create_audit_logs(
+                db,
+                [log_in for log_in, _ in batch],
+                created_at=[ts for _, ts in batch],
+            )
+        except Exception:
+            db.rollback()
+            self.failed_total += len(batch)
+            logger.exception("审计日志批量提交失败，本批 %d 条被丢弃", len(batch))
+            return
+        finally:
+            db.close()
+
+        latency_ms = (time.perf_counter() - started) * 1000
+        self.flushed_total += len(batch)
+        self.flush_count += 1
+        self.last_flush_latency_ms = latency_ms
+        self.max_flush_latency_ms = max(self.max_flush_latency_ms, latency_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回队列深度、提交延迟与丢弃计数等指标。"""
+        return {
+            "running": self.running,
+            "queue_depth": self.queue_depth,
+            "max_size": self.max_size,
+            "enqueued_total": self.enqueued_total,
+            "flushed_total": self.flushed_total,
+            "dropped_total": self.dropped_total,
+            "failed_total": self.failed_total,
+            "flush_count": self.flush_count,
+            "last_flush_latency_ms": round(self.last_flush_latency_ms, 3),
+            "max_flush_latency_ms": round(self.max_flush_latency_ms, 3),
+        }
+
+
+# 模块级单例：路由层入队、main.py 的 lifespan 负责启动与排空。
+audit_log_buffer = AuditLogBuffer(
+    SessionLocal,
+    max_size=settings.buffer_max_size,
+    flush_interval_ms=settings.buffer_flush_interval_ms,
+    flush_batch_size=settings.buffer_flush_batch_size,
+)
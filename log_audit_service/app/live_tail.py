@@ -0,0 +1,199 @@
+"""
+审计日志实时推送（GET /logs/stream，Server-Sent Events）。
+
+数据流：
+create_audit_log() / bulk_create_audit_logs() 提交成功
+    -> live_tail_hub.publish(rows)          （任意线程，无订阅者时直接返回）
+    -> 按订阅者的过滤条件匹配，loop.call_soon_threadsafe() 投递到各自的有界队列
+    -> event_stream() 从队列取出，格式化为 SSE 消息写给浏览器
+
+设计要点：
+- 推送由写入路径驱动，不轮询数据库；每条日志只序列化一次，所有订阅者共用；
+- 每个订阅者一个容量固定的队列：消费太慢导致队列写满时，清空队列并推送一条
+  overflow 事件后断开，由客户端自行重连，不会拖慢写入路径，也不会无限占用内存；
+- 长时间没有新日志时定期发送注释行作为心跳，便于代理保持连接、及时发现断开的客户端。
+"""
+
+import asyncio
+import json
+import threading
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from .config import settings
+from .schemas import AuditLogRead
+
+
+# 队列中表示“消费过慢已被断开”的标记。
+_OVERFLOW = object()
+
+
+@dataclass(eq=False)
+class Subscription:
+    """一个 SSE 订阅者：过滤条件 + 所属事件循环 + 有界队列。"""
+
+    hub: "LiveTailHub"
+    loop: asyncio.AbstractEventLoop
+    queue: "asyncio.Queue[Any]"
+    actor: Optional[str] = None
+    action: Optional[str] = None
+    source_service: Optional[str] = None
+    q_terms: List[str] = field(default_factory=list)
+    closed: bool = False
+
+    def matches(self, row: Dict[str, Any]) -> bool:
+        if self.actor and row.get("actor") != self.actor:
+            return False
+        if self.action and row.get("action") != self.action:
+            return False
+        if self.source_service and row.get("source_service") != self.source_service:
+            return False
+        for term in self.q_terms:
+            term = term.casefold()
+            if not any(
+                row.get(col) and term in row[col].casefold()
+                for col in ("detail", "action", "resource")
+            ):
+                return False
+        return True
+
+    def offer(self, message: str) -> None:
+        """在订阅者的事件循环中执行：入队，队列已满则标记为过慢并断开。"""
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.closed = True
+            # 清空积压的消息，腾出位置放断开标记。
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_OVERFLOW)
+            self.hub.record_slow_disconnect()
+
+
+class SubscriberLimitError(RuntimeError):
+    """订阅者数量已达上限。"""
+
+
+class LiveTailHub:
+    """进程内的扇出中心：写入路径 publish()，SSE 接口 subscribe() / unsubscribe()。"""
+
+    def __init__(self, *, buffer_size: int, max_subscribers: int) -> None:
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._subscribers: List[Subscription] = []
+        self._lock = threading.Lock()
+        self.published_total = 0
+        self.slow_disconnects_total = 0
+
+    def subscribe(
+        self,
+        *,
+        actor: Optional[str] = None,
+        action: Optional[str] = None,
+        source_service: Optional[str] = None,
+        q: Optional[str] = None,
+    ) -> Subscription:
+        """在当前事件循环中注册一个订阅者；超过上限时抛出 SubscriberLimitError。"""
+        subscription = Subscription(
+            hub=self,
+            loop=asyncio.get_running_loop(),
+            queue=asyncio.Queue(maxsize=self.buffer_size),
+            actor=actor,
+            action=action,
+            source_service=source_service,
+            q_terms=q.split() if q else [],
+        )
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise SubscriberLimitError(f"实时订阅数已达上限 {self.max_subscribers}")
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscription.closed = True
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def publish(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """推送一批已提交的日志（可在任意线程调用，rows 需包含 id）。"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        if not subscribers:
+            return
+        published = 0
+        for row in rows:
+            message: Optional[str] = None
+            for subscription in subscribers:
+                if subscription.closed or not subscription.matches(row):
+                    continue
+                if message is None:
+                    message = format_event(row)
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.offer, message)
+                except RuntimeError:
+                    # 订阅者所在的事件循环已关闭（服务正在退出）。
+                    self.unsubscribe(subscription)
+            published += 1
+        with self._lock:
+            self.published_total += published
+
+    def record_slow_disconnect(self) -> None:
+        with self._lock:
+            self.slow_disconnects_total += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """返回订阅者数量与推送计数，供 /logs/metrics 展示。"""
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "max_subscribers": self.max_subscribers,
+                "buffer_size": self.buffer_size,
+                "published_total": self.published_total,
+                "slow_disconnects_total": self.slow_disconnects_total,
+            }
+
+
+def format_event(row: Dict[str, Any]) -> str:
+    """把一条日志格式化为 SSE 消息（id 为日志 ID，便于客户端展示进度）。"""
+    data = json.dumps(
+        jsonable_encoder(AuditLogRead(**row)), ensure_ascii=False, separators=(",", ":")
+    )
+    return f"id: {row['id']}\nevent: audit_log\ndata: {data}\n\n"
+
+
+async def event_stream(
+    subscription: Subscription,
+    is_disconnected: Callable[[], Awaitable[bool]],
+    *,
+    heartbeat_seconds: float,
+) -> AsyncIterator[str]:
+    """逐条产出 SSE 消息，直到客户端断开或因消费过慢被断开；结束时自动退订。"""
+    try:
+        # 告诉浏览器断线后多久重连（毫秒）。
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), heartbeat_seconds)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    return
+                yield ": keepalive\n\n"
+                continue
+            if message is _OVERFLOW:
+                yield 'event: overflow\ndata: {"reason":"slow consumer"}\n\n'
+                return
+            yield message
+    finally:
+        subscription.hub.unsubscribe(subscription)
+
+
+live_tail_hub = LiveTailHub(
+    buffer_size=settings.live_tail_buffer_size,
+    max_subscribers=settings.live_tail_max_subscribers,
+)
+# 模块级单例：repository 在写入提交后 publish()，路由层 subscribe()。
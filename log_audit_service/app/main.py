@@ -10,18 +10,56 @@
     uvicorn log_audit_service.app.main:app --reload --port 8002
 """
 
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import FastAPI
 
-from .database import Base, engine
+from .config import settings
+from .database import Base, engine, get_async_engine
+from .fulltext import init_fulltext, init_fulltext_tables
+from .ingest_buffer import audit_log_buffer
+from .queue_ingest import audit_log_queue_consumer
 from .routers import audit_logs
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    应用生命周期：buffered 模式下启动后台提交线程，关闭时排空队列；
+    开启队列消费时启动消费线程；async 模式下让异步 engine 登记已有的全文索引，关闭时释放连接池。
+    """
+    if settings.db_mode == "async":
+        async with get_async_engine().begin() as conn:
+            await conn.run_sync(init_fulltext_tables)
+    if settings.ingest_mode == "buffered":
+        audit_log_buffer.start()
+    if settings.queue_ingest_enabled:
+        audit_log_queue_consumer.start()
+    try:
+        yield
+    finally:
+        # 先停消费线程：未确认的消息留在队列里，下次启动会重新投递。
+        audit_log_queue_consumer.stop()
+        # 即使启动后切回 sync 模式，也要把已入队的日志写完。
+        audit_log_buffer.stop()
+        if settings.db_mode == "async":
+            await get_async_engine().dispose()
+
+
 def create_app() -> FastAPI:
     """创建 FastAPI 应用实例并初始化数据库。"""
     # 启动时确保 audit_logs 表存在，避免第一次请求才暴露建表问题。
     Base.metadata.create_all(bind=engine)
+    # 全文索引（FTS5 虚表 + 同步触发器）不在 ORM 模型里，单独补建。
+    init_fulltext(engine)
+
+    app = FastAPI(title="Log & Audit Service", version="0.1.0", lifespan=lifespan)
+    # async 模式下高频接口的异步实现先挂载，同路径请求优先匹配；其余接口仍走同步路由。
+    if settings.db_mode == "async":
+        from .routers import audit_logs_async
 
-    app = FastAPI(title="Log & Audit Service", version="0.1.0")
+        app.include_router(audit_logs_async.router)
     # 当前服务所有对外接口都集中在 audit_logs 路由中。
     app.include_router(audit_logs.router)
     return app
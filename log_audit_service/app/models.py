@@ -1,14 +1,26 @@
 """
 日志 / 审计服务数据库模型定义。
 
-当前只有一个核心表：audit_logs。
-admin.html 查看日志、本地 /ui 页面查看日志，最终都依赖这张表。
+核心表是 audit_logs：admin.html 查看日志、本地 /ui 页面查看日志，最终都依赖这张表。
+开启按时间分区后（见 partitions.py），新日志会写入按天 / 按月拆分的同结构分区表，
+各分区共用 audit_log_id_seq 分配全局唯一的日志 ID。
+audit_log_rollups 是写入时增量维护的计数汇总表，供 GET /logs/stats 直接读取。
+audit_log_sketches 是写入时维护的近似统计 sketch（见 sketches.py），供 /logs/analytics/* 读取。
 """
 
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, Integer, String, Text, Index
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    LargeBinary,
+    PrimaryKeyConstraint,
+    String,
+)
 
+from .compression import CompressedText
 from .database import Base
 
 
@@ -24,9 +36,55 @@ class AuditLog(Base):
     resource = Column(String(100), nullable=True, index=True)
     source_service = Column(String(100), nullable=True, index=True)
     ip = Column(String(45), nullable=True)
-    detail = Column(Text, nullable=True)
+    # 开启 detail 压缩时以 BLOB 存储压缩数据，读取时惰性解压（见 compression.py）。
+    detail = Column(CompressedText, nullable=True)
 
 
 # 组合索引：便于按 actor / action + 时间倒序过滤最近日志。
 Index("idx_audit_logs_actor_created_at", AuditLog.actor, AuditLog.created_at)
 Index("idx_audit_logs_action_created_at", AuditLog.action, AuditLog.created_at)
+
+
+class AuditLogIdSequence(Base):
+    """分区模式下的全局日志 ID 分配器（单行计数表）。"""
+
+    __tablename__ = "audit_log_id_seq"
+
+    id = Column(Integer, primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+
+
+class AuditLogRollup(Base):
+    """审计日志计数汇总：每个 (时间粒度, 时间桶, 维度, 维度取值) 一行计数。"""
+
+    __tablename__ = "audit_log_rollups"
+
+    granularity = Column(String(8), nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    dimension = Column(String(32), nullable=False)
+    # 维度取值为空（例如没有 actor）时存空字符串，避免主键列出现 NULL。
+    value = Column(String(100), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("granularity", "dimension", "bucket_start", "value"),
+    )
+
+
+class AuditLogSketch(Base):
+    """近似统计 sketch：每个 (时间粒度, 类型, 维度, 分组 key, 时间桶) 一个压缩后的二进制块。"""
+
+    __tablename__ = "audit_log_sketches"
+
+    granularity = Column(String(8), nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    # hll / topk / cms，格式见 sketches.py。
+    kind = Column(String(8), nullable=False)
+    dimension = Column(String(32), nullable=False)
+    # 分组 key：hll 为 action 取值，"*" 表示不分组。
+    key = Column(String(100), nullable=False)
+    data = Column(LargeBinary, nullable=False)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("granularity", "kind", "dimension", "key", "bucket_start"),
+    )
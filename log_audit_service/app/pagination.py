@@ -0,0 +1,32 @@
+"""
+审计日志游标（keyset）分页工具。
+
+游标对调用方是不透明字符串，内部编码的是上一页最后一条日志的 (created_at, id)。
+下一页查询时用行值比较 (created_at, id) < (游标时间, 游标 ID) 直接从索引定位，
+不再像 offset 那样先扫描再丢弃前面的 N 行，因此翻得再深耗时也基本不变。
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+
+class InvalidCursorError(ValueError):
+    """表示游标字符串无法解析（被篡改或来自不兼容的版本）。"""
+
+
+def encode_cursor(created_at: datetime, log_id: int) -> str:
+    """把 (created_at, id) 编码成 URL 安全的游标字符串。"""
+    raw = json.dumps([created_at.isoformat(), log_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """解析游标字符串，返回 (created_at, id)。"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at_str, log_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(created_at_str), int(log_id)
+    except (ValueError, TypeError, UnicodeError) as exc:
+        raise InvalidCursorError("无效的分页游标") from exc
@@ -0,0 +1,190 @@
+"""
+审计日志按时间分区存储。
+
+开启方式：配置 LOG_AUDIT_PARTITION_GRANULARITY=day 或 month。
+
+分区规则：
+- 分区表与 audit_logs 同结构，按 created_at 命名，例如 audit_logs_p20240101（按天）、
+  audit_logs_p202401（按月），首次写入该时间段时自动建表；
+- 各分区 ID 由 audit_log_id_seq 统一分配，保证跨分区全局唯一、随时间递增；
+- 开启分区前已写入 audit_logs 的历史数据原地保留，查询时作为“最老的分区”兜底扫描。
+
+查询时按 since / until 只挑出时间段有交集的分区（分区裁剪）；
+保留策略按整段分区 DROP TABLE，代替对大表做海量 DELETE。
+"""
+
+import re
+from datetime import datetime, timedelta
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import MetaData, Table, func, inspect, insert, select, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .fulltext import create_fulltext_index, drop_fulltext_index
+from .models import AuditLog, AuditLogIdSequence
+from .query_cache import query_cache
+
+
+PARTITION_PREFIX = "audit_logs_p"
+_PARTITION_NAME_RE = re.compile(rf"^{PARTITION_PREFIX}(\d{{8}}|\d{{6}})$")
+_GRANULARITY_FORMATS = {"day": "%Y%m%d", "month": "%Y%m"}
+
+# 分区表只用于 Core 读写，单独放在一份 MetaData 中，避免 create_all() 误建。
+_partition_metadata = MetaData()
+# 本进程已确认存在的分区，避免每次写入都去查一遍表结构。
+_known_partitions: Set[str] = set()
+
+
+def partitioning_enabled() -> bool:
+    """当前是否开启了按时间分区。"""
+    return bool(settings.partition_granularity)
+
+
+def partition_name(ts: datetime, granularity: Optional[str] = None) -> str:
+    """根据日志时间计算所属分区表名。"""
+    granularity = granularity or settings.partition_granularity
+    if granularity not in _GRANULARITY_FORMATS:
+        raise ValueError(f"不支持的分区粒度：{granularity}")
+    return PARTITION_PREFIX + ts.strftime(_GRANULARITY_FORMATS[granularity])
+
+
+def partition_range(name: str) -> Tuple[datetime, datetime]:
+    """返回分区覆盖的时间范围 [start, end)。"""
+    suffix = name[len(PARTITION_PREFIX):]
+    if len(suffix) == 8:
+        start = datetime.strptime(suffix, "%Y%m%d")
+        return start, start + timedelta(days=1)
+    start = datetime.strptime(suffix, "%Y%m")
+    if start.month == 12:
+        return start, start.replace(year=start.year + 1, month=1)
+    return start, start.replace(month=start.month + 1)
+
+
+def get_partition_table(name: str) -> Table:
+    """获取（必要时构造）分区表的 Table 对象，结构与索引复制自 audit_logs。"""
+    if name in _partition_metadata.tables:
+        return _partition_metadata.tables[name]
+    table = AuditLog.__table__.to_metadata(_partition_metadata, name=name)
+    # 显式命名的组合索引会原样复制，SQLite 中索引名全库唯一，这里按分区改名。
+    for index in table.indexes:
+        if index.name and index.name.startswith("idx_audit_logs_"):
+            index.name = index.name.replace("idx_audit_logs_", f"idx_{name}_", 1)
+    return table
+
+
+def list_partitions(db: Session) -> List[str]:
+    """列出库中已有的分区表名，按时间从新到旧排序。"""
+    names = [
+        name
+        for name in inspect(db.connection()).get_table_names()
+        if _PARTITION_NAME_RE.match(name)
+    ]
+    return sorted(names, key=lambda name: partition_range(name)[0], reverse=True)
+
+
+def ensure_partition(db: Session, ts: datetime) -> Table:
+    """确保 ts 所属分区存在；新建分区时顺带执行一次保留策略。"""
+    name = partition_name(ts)
+    table = get_partition_table(name)
+    if name not in _known_partitions:
+        table.create(bind=db.connection(), checkfirst=True)
+        create_fulltext_index(db.connection(), name)
+        _known_partitions.add(name)
+        if settings.retention_days:
+            drop_expired_partitions(db, settings.retention_days, now=ts, commit=False)
+    return table
+
+
+def _seed_id_sequence(db: Session, last_id: int) -> None:
+    """插入序列行；已被并发写入方抢先插入时什么也不做。"""
+    seq_table = AuditLogIdSequence.__table__
+    values = {"id": 1, "last_id": last_id}
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        db.execute(sqlite.insert(seq_table).values(**values).on_conflict_do_nothing())
+    elif dialect == "postgresql":
+        db.execute(postgresql.insert(seq_table).values(**values).on_conflict_do_nothing())
+    elif dialect == "mysql":
+        db.execute(mysql.insert(seq_table).values(**values).prefix_with("IGNORE"))
+    else:
+        try:
+            with db.begin_nested():
+                db.execute(insert(seq_table).values(**values))
+        except IntegrityError:
+            pass
+
+
+def allocate_ids(db: Session, count: int) -> int:
+    """从全局序列中预留 count 个连续 ID，返回第一个。"""
+    seq_table = AuditLogIdSequence.__table__
+    exists = db.execute(select(seq_table.c.id).where(seq_table.c.id == 1)).first()
+    if exists is None:
+        # 首次开启分区：从历史单表的最大 ID 之后接着分配。
+        # 多个写入方可能同时走到这里，插入必须幂等，否则后到的一方会因主键冲突失败。
+        legacy_max = db.execute(select(func.coalesce(func.max(AuditLog.id), 0))).scalar_one()
+        _seed_id_sequence(db, legacy_max)
+    last_id = db.execute(
+        update(seq_table)
+        .where(seq_table.c.id == 1)
+        .values(last_id=seq_table.c.last_id + count)
+        .returning(seq_table.c.last_id)
+    ).scalar_one()
+    return last_id - count + 1
+
+
+def tables_for_range(
+    db: Session, since: Optional[datetime] = None, until: Optional[datetime] = None
+) -> List[Table]:
+    """
+    返回需要查询的表，按时间从新到旧排序。
+
+    未开启分区时只有 audit_logs；开启后只保留与 [since, until] 有交集的分区，
+    最后附上 audit_logs（开启分区前的历史数据）。
+    """
+    if not partitioning_enabled():
+        return [AuditLog.__table__]
+
+    tables = []
+    for name in list_partitions(db):
+        start, end = partition_range(name)
+        if since is not None and end <= since:
+            continue
+        if until is not None and start > until:
+            continue
+        tables.append(get_partition_table(name))
+    tables.append(AuditLog.__table__)
+    return tables
+
+
+def drop_partition(db: Session, name: str) -> None:
+    """删除一个分区表及其全文索引（不提交事务）。"""
+    drop_fulltext_index(db.connection(), name)
+    get_partition_table(name).drop(bind=db.connection(), checkfirst=True)
+    _partition_metadata.remove(_partition_metadata.tables[name])
+    _known_partitions.discard(name)
+
+
+def drop_expired_partitions(
+    db: Session,
+    retention_days: int,
+    *,
+    now: Optional[datetime] = None,
+    commit: bool = True,
+) -> List[str]:
+    """删除整段早于保留期的分区，返回被删除的分区表名。"""
+    cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+    dropped = []
+    for name in list_partitions(db):
+        _, end = partition_range(name)
+        if end > cutoff:
+            continue
+        drop_partition(db, name)
+        dropped.append(name)
+    if commit:
+        db.commit()
+        if dropped:
+            query_cache.invalidate()
+    return dropped
@@ -0,0 +1,118 @@
+"""
+GET /logs 与 /logs/ui 的查询结果缓存。
+
+背景：admin.html 与 /logs/ui 会反复发起同一个“最近 50 条、无过滤”的查询，
+每次都要查库、再经过 Pydantic / HTML 渲染，而两次刷新之间往往根本没有新日志。
+
+做法：
+- 以规范化后的过滤条件为 key，缓存“已经渲染好的结果”（JSON 响应体 / HTML 表格片段）；
+- 维护一个单调递增的写版本号，日志写入提交后调用 invalidate() 加一并清空缓存；
+- 读取方在查库前先记下版本号，写回缓存时带上它：查询期间若有写入提交，
+  这份结果的版本号已经过期，get() 不会再返回它；
+- 容量固定，按 LRU 淘汰。
+
+局限：缓存与版本号都在进程内，多 worker 部署时其他进程的写入不会让本进程失效，
+此时应关闭缓存（LOG_AUDIT_QUERY_CACHE_MAX_ENTRIES=0）。
+"""
+
+import threading
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from .config import settings
+
+
+def _normalize(value: Any) -> Any:
+    """把过滤参数规范成稳定的可哈希值：空串视同未传，多余空白不影响命中。"""
+    if isinstance(value, str):
+        return " ".join(value.split()) or None
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, tuple):
+        return tuple(_normalize(item) for item in value)
+    return value
+
+
+def make_cache_key(kind: str, **filters: Any) -> Tuple[Hashable, ...]:
+    """按接口类型与过滤条件生成缓存 key，参数顺序不影响结果。"""
+    return (kind, *sorted((name, _normalize(value)) for name, value in filters.items()))
+
+
+class QueryCache:
+    """带写版本号的 LRU 结果缓存，线程安全。"""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[int, Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+        self.saved_ms: Counter = Counter()
+
+    @property
+    def version(self) -> int:
+        """当前写版本号；查库前记下，写回缓存时传给 put()。"""
+        return self._version
+
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[Any]:
+        """命中且版本未过期时返回缓存值，否则返回 None。"""
+        kind = key[0]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != self._version:
+                self.misses[kind] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits[kind] += 1
+            self.saved_ms[kind] += entry[2]
+            return entry[1]
+
+    def put(self, key: Tuple[Hashable, ...], version: int, value: Any, cost_ms: float) -> None:
+        """
+        写回一份结果。
+
+        version 为查库前记下的版本号；cost_ms 为这次查库加渲染的耗时，
+        之后每次命中都计入 saved_ms，用来观察缓存省下了多少时间。
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[key] = (version, value, cost_ms)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        """日志写入提交后调用：版本号加一，已有结果全部作废。"""
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中率与节省的查库 / 渲染时间，供 /logs/metrics 展示。"""
+        with self._lock:
+            kinds = sorted(set(self.hits) | set(self.misses))
+            by_kind = {}
+            for kind in kinds:
+                total = self.hits[kind] + self.misses[kind]
+                by_kind[kind] = {
+                    "hits": self.hits[kind],
+                    "misses": self.misses[kind],
+                    "hit_ratio": round(self.hits[kind] / total, 4) if total else 0.0,
+                    "saved_ms": round(self.saved_ms[kind], 2),
+                }
+            return {
+                "enabled": self.max_entries > 0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "version": self._version,
+                "by_kind": by_kind,
+            }
+
+
+query_cache = QueryCache(settings.query_cache_max_entries)
+# 模块级单例：路由层读写，repository 在写入提交后调用 invalidate()。
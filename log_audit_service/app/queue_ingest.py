@@ -0,0 +1,361 @@
+"""
+从消息队列消费审计日志（可选的写入方式）。
+
+调用关系：
+生产方（rbac_auth_service、网关等）-> 队列（RabbitMQ / 内存实现）
+    -> AuditLogQueueConsumer 后台线程按批拉取
+    -> bulk_create_audit_logs() 一批一个事务
+    -> 提交成功后 ack；提交失败 nack 并放回队列，稍后重试
+
+队列客户端沿用 rabbitmq-demo 中 BaseQueueClient 的形状（send_message / get_messages / get_stats），
+另外补充 ack / nack：拉取时不自动确认，消息只有在对应日志提交之后才会从队列删除。
+因此生产方的突发流量先堆在队列里，服务重启时未确认的消息会被重新投递，不会丢失。
+
+消息格式：body 为 AuditLogCreate 的 JSON 字符串；消息信封中的 timestamp（UTC，ISO8601）
+作为日志的 created_at，保证排队等待的时间不会改变日志的时间顺序。
+
+投递语义是“至少一次”：提交成功后、ack 之前进程崩溃，这批消息会被重新投递并重复写入。
+"""
+
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import SessionLocal
+from .repositories.audit_log_repository import bulk_create_audit_logs
+from .schemas import AuditLogCreate
+
+
+logger = logging.getLogger(__name__)
+
+
+class BaseQueueClient(ABC):
+    """队列客户端基类（在 rabbitmq-demo 的基础上增加了 ack / nack）。"""
+
+    @abstractmethod
+    def send_message(self, queue: str, body: str) -> dict:
+        """发送消息"""
+
+    @abstractmethod
+    def get_messages(self, queue: str, limit: int = 10) -> List[dict]:
+        """获取消息（不自动确认），每条消息带 delivery_tag，处理完后需 ack 或 nack。"""
+
+    @abstractmethod
+    def ack(self, queue: str, delivery_tags: List[int]) -> None:
+        """确认消息已处理，从队列中删除。"""
+
+    @abstractmethod
+    def nack(self, queue: str, delivery_tags: List[int], requeue: bool = True) -> None:
+        """处理失败：requeue=True 时放回队列等待重新投递，否则直接丢弃。"""
+
+    @abstractmethod
+    def get_stats(self, queue: str) -> dict:
+        """获取队列统计"""
+
+    def close(self) -> None:
+        """释放连接；默认无需处理。"""
+
+
+class InMemoryQueueClient(BaseQueueClient):
+    """内存队列客户端：供本地开发与测试使用，语义与 RabbitMQ 的手动确认模式一致。"""
+
+    def __init__(self) -> None:
+        self._queues: Dict[str, Deque[dict]] = {}
+        self._unacked: Dict[str, Dict[int, dict]] = {}
+        self._next_tag = 1
+        self._lock = threading.Lock()
+
+    def send_message(self, queue: str, body: str) -> dict:
+        message_data = {"body": body, "timestamp": datetime.utcnow().isoformat()}
+        with self._lock:
+            self._queues.setdefault(queue, deque()).append(message_data)
+        return message_data
+
+    def get_messages(self, queue: str, limit: int = 10) -> List[dict]:
+        messages = []
+        with self._lock:
+            pending = self._queues.setdefault(queue, deque())
+            unacked = self._unacked.setdefault(queue, {})
+            for _ in range(min(limit, len(pending))):
+                message = pending.popleft()
+                unacked[self._next_tag] = message
+                messages.append({**message, "delivery_tag": self._next_tag})
+                self._next_tag += 1
+        return messages
+
+    def ack(self, queue: str, delivery_tags: List[int]) -> None:
+        with self._lock:
+            unacked = self._unacked.setdefault(queue, {})
+            for tag in delivery_tags:
+                unacked.pop(tag, None)
+
+    def nack(self, queue: str, delivery_tags: List[int], requeue: bool = True) -> None:
+        with self._lock:
+            unacked = self._unacked.setdefault(queue, {})
+            messages = [unacked.pop(tag) for tag in delivery_tags if tag in unacked]
+            if requeue:
+                # 放回队首，保持原有顺序。
+                self._queues.setdefault(queue, deque()).extendleft(reversed(messages))
+
+    def recover(self, queue: str) -> None:
+        """模拟消费者重启：所有未确认的消息重新回到队列。"""
+        with self._lock:
+            unacked = self._unacked.setdefault(queue, {})
+            tags = sorted(unacked)
+        self.nack(queue, tags, requeue=True)
+
+    def get_stats(self, queue: str) -> dict:
+        with self._lock:
+            return {
+                "message_count": len(self._queues.get(queue, ())),
+                "unacked_count": len(self._unacked.get(queue, {})),
+                "consumer_count": 0,
+            }
+
+
+class RabbitMQQueueClient(BaseQueueClient):
+    """
+    RabbitMQ 客户端（需要安装 pika）。
+
+    BlockingConnection 不是线程安全的：一个实例只应在一个线程（即消费线程）中使用。
+    连接断开时 RabbitMQ 会把未确认的消息重新投递给其他消费者或重启后的本服务。
+    """
+
+    def __init__(self, url: str) -> None:
+        import pika
+
+        self._pika = pika
+        self._connection = pika.BlockingConnection(pika.URLParameters(url))
+        self._channel = self._connection.channel()
+        self._declared: set = set()
+
+    def _declare(self, queue: str) -> None:
+        if queue not in self._declared:
+            self._channel.queue_declare(queue=queue, durable=True)
+            self._declared.add(queue)
+
+    def send_message(self, queue: str, body: str) -> dict:
+        self._declare(queue)
+        message_data = {"body": body, "timestamp": datetime.utcnow().isoformat()}
+        self._channel.basic_publish(
+            exchange="",
+            routing_key=queue,
+            body=json.dumps(message_data),
+            properties=self._pika.BasicProperties(delivery_mode=2),
+        )
+        return message_data
+
+    def get_messages(self, queue: str, limit: int = 10) -> List[dict]:
+        self._declare(queue)
+        messages = []
+        for _ in range(limit):
+            method, _properties, body = self._channel.basic_get(queue=queue, auto_ack=False)
+            if method is None:
+                break
+            try:
+                message = json.loads(body.decode("utf-8"))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                message = {"body": body.decode("utf-8", errors="replace"), "timestamp": ""}
+            messages.append({**message, "delivery_tag": method.delivery_tag})
+        return messages
+
+    def ack(self, queue: str, delivery_tags: List[int]) -> None:
+        for tag in delivery_tags:
+            self._channel.basic_ack(delivery_tag=tag)
+
+    def nack(self, queue: str, delivery_tags: List[int], requeue: bool = True) -> None:
+        for tag in delivery_tags:
+            self._channel.basic_nack(delivery_tag=tag, requeue=requeue)
+
+    def get_stats(self, queue: str) -> dict:
+        result = self._channel.queue_declare(queue=queue, passive=True)
+        return {
+            "message_count": result.method.message_count,
+            "consumer_count": result.method.consumer_count,
+        }
+
+    def close(self) -> None:
+        if self._connection.is_open:
+            self._connection.close()
+
+
+def _parse_message(message: dict) -> Tuple[AuditLogCreate, datetime]:
+    """把一条消息解析为 (日志入参, created_at)，格式不合法时抛出 ValueError。"""
+    try:
+        log_in = AuditLogCreate(**json.loads(message["body"]))
+    except (KeyError, TypeError, json.JSONDecodeError, ValidationError) as exc:
+        raise ValueError(f"无法解析的审计日志消息：{exc}") from exc
+    try:
+        created_at = datetime.fromisoformat(message.get("timestamp") or "")
+    except ValueError:
+        created_at = datetime.utcnow()
+    return log_in, created_at
+
+
+class AuditLogQueueConsumer:
+    """后台线程：按批从队列拉取审计日志，批量写库，提交成功后再确认消息。"""
+
+    def __init__(
+        self,
+        client_factory: Callable[[], BaseQueueClient],
+        session_factory: Callable[[], Session],
+        *,
+        queue: str,
+        batch_size: int,
+        poll_interval_ms: int,
+    ) -> None:
+        self._client_factory = client_factory
+        self._client: Optional[BaseQueueClient] = None
+        self._session_factory = session_factory
+        self.queue = queue
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval_ms / 1000
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.consumed_total = 0
+        self.rejected_total = 0
+        self.failed_batches_total = 0
+        self.last_batch_size = 0
+        self.last_batch_latency_ms = 0.0
+
+    @property
+    def client(self) -> BaseQueueClient:
+        # 延迟到消费线程中创建：RabbitMQ 连接只能在创建它的线程里使用。
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+
+    def start(self) -> None:
+        """启动后台消费线程（重复调用无副作用）。"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="audit-log-queue-consumer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """停止消费：当前批处理完后退出；尚未确认的消息留在队列中，下次启动重新投递。"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                # 消费线程仍在使用连接，由它退出循环时自行关闭。
+                return
+            self._thread = None
+        self._close_client()
+
+    def _close_client(self) -> None:
+        """尽力关闭当前连接并丢弃，下次访问 client 时重新创建。"""
+        client, self._client = self._client, None
+        if client is None:
+            return
+        try:
+            client.close()
+        except Exception:  # noqa: BLE001 - 连接可能已经断开，关闭失败不影响重连
+            logger.warning("关闭队列连接失败", exc_info=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                handled = self.poll_once()
+            except Exception:  # noqa: BLE001 - 连接抖动等异常不能让消费线程退出
+                logger.exception("拉取审计日志消息失败，稍后重连重试")
+                # 出错的连接可能已不可用，丢弃后下一轮重新创建。
+                self._close_client()
+                handled = 0
+            if handled == 0:
+                self._stop.wait(self.poll_interval)
+        self._close_client()
+
+    def poll_once(self) -> int:
+        """拉取并处理一批消息，返回本批消息条数（含被拒绝的）。"""
+        messages = self.client.get_messages(self.queue, self.batch_size)
+        if not messages:
+            return 0
+
+        items: List[AuditLogCreate] = []
+        created_at: List[datetime] = []
+        tags: List[int] = []
+        rejected: List[int] = []
+        for message in messages:
+            try:
+                log_in, ts = _parse_message(message)
+            except ValueError:
+                logger.warning("丢弃格式不合法的审计日志消息：%r", message.get("body"))
+                rejected.append(message["delivery_tag"])
+                continue
+            items.append(log_in)
+            created_at.append(ts)
+            tags.append(message["delivery_tag"])
+
+        if rejected:
+            # 格式错误的消息重试也不会成功，直接丢弃（配置了死信队列时会进入死信队列）。
+            self.client.nack(self.queue, rejected, requeue=False)
+            self.rejected_total += len(rejected)
+
+        if items:
+            started = time.perf_counter()
+            db = self._session_factory()
+            try:
+                bulk_create_audit_logs(db, items, created_at=created_at)
+            except Exception:  # noqa: BLE001 - 提交失败时把整批放回队列
+                logger.exception("审计日志批量写入失败，%d 条消息放回队列", len(items))
+                db.rollback()
+                self.client.nack(self.queue, tags, requeue=True)
+                self.failed_batches_total += 1
+                return 0
+            finally:
+                db.close()
+            # 只有提交成功后才确认，确认前崩溃的消息会被重新投递。
+            self.client.ack(self.queue, tags)
+            self.consumed_total += len(items)
+            self.last_batch_size = len(items)
+            self.last_batch_latency_ms = (time.perf_counter() - started) * 1000
+        return len(messages)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回消费计数，供 /logs/metrics 展示。"""
+        return {
+            "enabled": settings.queue_ingest_enabled,
+            "backend": settings.queue_backend,
+            "queue": self.queue,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "consumed_total": self.consumed_total,
+            "rejected_total": self.rejected_total,
+            "failed_batches_total": self.failed_batches_total,
+            "last_batch_size": self.last_batch_size,
+            "last_batch_latency_ms": round(self.last_batch_latency_ms, 2),
+        }
+
+
+# 内存实现全局共享一份，便于同进程内的生产方与消费方直接联调。
+_memory_client = InMemoryQueueClient()
+
+
+def get_queue_client() -> BaseQueueClient:
+    """根据配置返回对应的队列客户端"""
+    if settings.queue_backend == "rabbitmq":
+        return RabbitMQQueueClient(settings.queue_url)
+    return _memory_client
+
+
+audit_log_queue_consumer = AuditLogQueueConsumer(
+    get_queue_client,
+    SessionLocal,
+    queue=settings.queue_name,
+    batch_size=settings.queue_batch_size,
+    poll_interval_ms=settings.queue_poll_interval_ms,
+)
+# 模块级单例：由 main.py 的 lifespan 在 queue_ingest_enabled 时启动 / 停止。
@@ -0,0 +1,60 @@
+"""
+审计日志数据访问层（async 版本）。
+
+调用关系：
+routers/audit_logs_async.py -> 本模块 -> audit_log_repository.py
+
+LOG_AUDIT_DB_MODE=async 时使用。每个函数通过 AsyncSession.run_sync() 调用同步版本：
+SQL 拼装、分区路由、全文检索、计数汇总等逻辑只维护一份，
+而数据库 IO 走 aiosqlite，在事件循环里等待，不再占用 Starlette 线程池的线程。
+"""
+
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import AuditLog
+from ..schemas import AuditLogCreate
+from . import audit_log_repository
+
+
+async def create_audit_log(db: AsyncSession, log_in: AuditLogCreate) -> AuditLog:
+    """创建一条审计日志记录。"""
+    return await db.run_sync(audit_log_repository.create_audit_log, log_in)
+
+
+async def bulk_create_audit_logs(
+    db: AsyncSession, logs_in: Sequence[AuditLogCreate]
+) -> List[int]:
+    """批量写入审计日志，返回按入参顺序排列的 ID 列表。"""
+    return await db.run_sync(audit_log_repository.bulk_create_audit_logs, logs_in)
+
+
+async def query_audit_logs(
+    db: AsyncSession,
+    *,
+    actor: Optional[str] = None,
+    action: Optional[str] = None,
+    source_service: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    q: Optional[str] = None,
+    limit: int = 50,
+    offset: int = 0,
+    after: Optional[Tuple[datetime, int]] = None,
+) -> List[Any]:
+    """按条件查询审计日志列表，参数与返回值同 audit_log_repository.query_audit_logs()。"""
+    rows = await db.run_sync(
+        audit_log_repository.query_audit_logs,
+        actor=actor,
+        action=action,
+        source_service=source_service,
+        since=since,
+        until=until,
+        q=q,
+        limit=limit,
+        offset=offset,
+        after=after,
+    )
+    return list(rows)
@@ -5,33 +5,167 @@
 routers/audit_logs.py -> repository -> models/database
 
 这里不处理 HTTP 参数，也不负责 HTML 展示，只关心“怎么写库 / 怎么查库”。
+开启按时间分区后，写入路由到对应分区表、查询只扫描命中的分区，细节见 partitions.py。
+配置归档目录后，查询在热库之后继续穿透到冷数据段文件，细节见 archive.py。
 """
 
 from datetime import datetime
-from typing import Iterable, Optional
+from itertools import groupby, islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
+from sqlalchemy import Select, Table, insert, select, tuple_
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
 
+from ..archive import archive_may_contain, scan_archive
+from ..config import settings
+from ..fulltext import fulltext_condition
+from ..live_tail import live_tail_hub
 from ..models import AuditLog
+from ..partitions import (
+    allocate_ids,
+    ensure_partition,
+    partition_name,
+    partitioning_enabled,
+    tables_for_range,
+)
+from ..query_cache import query_cache
+from ..rollups import apply_rollups
 from ..schemas import AuditLogCreate
+from ..sketches import apply_sketches
 
 
 def create_audit_log(db: Session, log_in: AuditLogCreate) -> AuditLog:
     """创建一条审计日志记录。"""
-    log = AuditLog(
-        actor=log_in.actor,
-        action=log_in.action,
-        resource=log_in.resource,
-        source_service=log_in.source_service,
-        ip=log_in.ip,
-        detail=log_in.detail,
-    )
+    row = _to_row(log_in, datetime.utcnow())
+    if partitioning_enabled():
+        # 分区模式下不走 ORM 持久化，返回的 AuditLog 仅作为字段载体供路由层序列化。
+        (row["id"],) = _insert_partitioned(db, [row])
+        _after_insert(db, [row])
+        db.commit()
+        _after_commit([row])
+        return AuditLog(**row)
+
+    log = AuditLog(**row)
     db.add(log)
+    _after_insert(db, [row])
     db.commit()
     db.refresh(log)
+    row["id"] = log.id
+    _after_commit([row])
     return log
 
 
+def _to_row(log_in: AuditLogCreate, created_at: datetime) -> Dict[str, Any]:
+    """把入参模型转换成 Core insert 可直接使用的参数字典。"""
+    return {
+        "created_at": created_at,
+        "actor": log_in.actor,
+        "action": log_in.action,
+        "resource": log_in.resource,
+        "source_service": log_in.source_service,
+        "ip": log_in.ip,
+        "detail": log_in.detail,
+    }
+
+
+def bulk_create_audit_logs(
+    db: Session,
+    logs_in: Sequence[AuditLogCreate],
+    *,
+    created_at: Optional[Sequence[datetime]] = None,
+) -> List[int]:
+    """
+    批量写入审计日志，返回按入参顺序排列的 ID 列表。
+
+    与 create_audit_log() 不同，这里不构造 ORM 对象，而是用一条 Core insert
+    搭配参数列表（executemany 风格）写入，整批只占用一个事务、一次提交。
+
+    created_at 可逐条指定日志时间（例如缓冲写入时记录的入队时间），
+    不传则整批共用当前时间，保证批内顺序与 ID 顺序一致。
+    """
+    if not logs_in:
+        return []
+
+    if created_at is None:
+        created_at = [datetime.utcnow()] * len(logs_in)
+    rows = [_to_row(log_in, ts) for log_in, ts in zip(logs_in, created_at)]
+
+    if partitioning_enabled():
+        ids = _insert_partitioned(db, rows)
+    else:
+        stmt = insert(AuditLog.__table__).returning(
+            AuditLog.__table__.c.id, sort_by_parameter_order=True
+        )
+        ids = list(db.execute(stmt, rows).scalars())
+        for row, log_id in zip(rows, ids):
+            row["id"] = log_id
+    _after_insert(db, rows)
+    db.commit()
+    _after_commit(rows)
+    return ids
+
+
+def _after_insert(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """写入后、提交前的附加维护：与日志本身在同一事务中提交，保证一致。"""
+    if settings.rollups_enabled:
+        apply_rollups(db, rows)
+    if settings.sketches_enabled:
+        apply_sketches(db, rows)
+
+
+def _after_commit(rows: List[Dict[str, Any]]) -> None:
+    """提交之后的通知：新日志已对其他会话可见，作废查询结果缓存并推送给实时订阅者。"""
+    query_cache.invalidate()
+    live_tail_hub.publish(rows)
+
+
+def _insert_partitioned(db: Session, rows: List[Dict[str, Any]]) -> List[int]:
+    """分区模式写入：先统一分配 ID，再按所属分区分组，每个分区一条 executemany insert。"""
+    first_id = allocate_ids(db, len(rows))
+    for offset, row in enumerate(rows):
+        row["id"] = first_id + offset
+
+    for _, group in groupby(rows, key=lambda row: partition_name(row["created_at"])):
+        group_rows = list(group)
+        table = ensure_partition(db, group_rows[0]["created_at"])
+        db.execute(insert(table), group_rows)
+    return [row["id"] for row in rows]
+
+
+def _filtered_select(
+    db: Session,
+    table: Table,
+    *,
+    actor: Optional[str],
+    action: Optional[str],
+    source_service: Optional[str],
+    since: Optional[datetime],
+    until: Optional[datetime],
+    q: Optional[str],
+    after: Optional[Tuple[datetime, int]] = None,
+) -> Select:
+    """在单张日志表上拼出过滤条件，按 (created_at, id) 倒序排列。"""
+    stmt = select(table)
+    if actor:
+        stmt = stmt.where(table.c.actor == actor)
+    if action:
+        stmt = stmt.where(table.c.action == action)
+    if source_service:
+        stmt = stmt.where(table.c.source_service == source_service)
+    if since:
+        stmt = stmt.where(table.c.created_at >= since)
+    if until:
+        stmt = stmt.where(table.c.created_at <= until)
+    if q:
+        stmt = stmt.where(fulltext_condition(db.get_bind(), table, q))
+    if after is not None:
+        # 行值比较：SQLite 的二级索引隐含 rowid(id)，
+        # 因此 created_at / (actor, created_at) 等索引可以直接用来定位游标位置。
+        stmt = stmt.where(tuple_(table.c.created_at, table.c.id) < tuple_(*after))
+    return stmt.order_by(table.c.created_at.desc(), table.c.id.desc())
+
+
 def query_audit_logs(
     db: Session,
     *,
@@ -40,27 +174,105 @@ def query_audit_logs(
     source_service: Optional[str] = None,
     since: Optional[datetime] = None,
     until: Optional[datetime] = None,
+    q: Optional[str] = None,
     limit: int = 50,
     offset: int = 0,
-) -> Iterable[AuditLog]:
+    after: Optional[Tuple[datetime, int]] = None,
+) -> Iterable[Row]:
     """
     按条件查询审计日志列表。
 
     当前 admin.html 主要走的是无过滤查询，
     /logs/ui 则会把 actor / action / source_service 作为筛选条件传进来。
+    q 为 detail / action / resource 的全文检索词，与其他条件是 AND 关系。
+
+    排序固定为 (created_at, id) 倒序，分页有两种方式：
+    - offset：兼容旧调用方，页数越深越慢；
+    - after：游标分页，只返回排在 (created_at, id) 之后的日志，此时忽略 offset。
+
+    返回的是与 AuditLog 同字段的 Core Row（归档中的日志为同字段的 ArchivedAuditLog），
+    路由层可直接按属性读取或交给 AuditLogRead 序列化。
     """
-    query = db.query(AuditLog)
+    upper = until
+    if after is not None:
+        offset = 0
+        # 游标本身也是时间上界，可以进一步裁掉更新的分区。
+        upper = after[0] if upper is None else min(upper, after[0])
+    tables = tables_for_range(db, since, upper)
+    # 已归档的日志都比热库中的老，热库查完仍不够一页时才需要读段文件。
+    use_archive = archive_may_contain(since, upper)
 
-    if actor:
-        query = query.filter(AuditLog.actor == actor)
-    if action:
-        query = query.filter(AuditLog.action == action)
-    if source_service:
-        query = query.filter(AuditLog.source_service == source_service)
-    if since:
-        query = query.filter(AuditLog.created_at >= since)
-    if until:
-        query = query.filter(AuditLog.created_at <= until)
+    def build(table: Table) -> Select:
+        return _filtered_select(
+            db,
+            table,
+            actor=actor,
+            action=action,
+            source_service=source_service,
+            since=since,
+            until=until,
+            q=q,
+            after=after,
+        )
+
+    if len(tables) == 1 and not use_archive:
+        return db.execute(build(tables[0]).offset(offset).limit(limit)).all()
 
-    query = query.order_by(AuditLog.created_at.desc())
-    return query.offset(offset).limit(limit).all()
+    # 多个分区按时间从新到旧依次查询，凑够 offset + limit 条即停止，不再碰更老的分区。
+    needed = offset + limit
+    rows: List[Any] = []
+    for table in tables:
+        rows.extend(db.execute(build(table).limit(needed - len(rows))).all())
+        if len(rows) >= needed:
+            break
+    if use_archive and len(rows) < needed:
+        archived = scan_archive(
+            actor=actor,
+            action=action,
+            source_service=source_service,
+            since=since,
+            until=until,
+            q=q,
+            after=after,
+        )
+        rows.extend(islice(archived, needed - len(rows)))
+    return rows[offset:needed]
+
+
+def stream_audit_logs(
+    db: Session,
+    *,
+    actor: Optional[str] = None,
+    action: Optional[str] = None,
+    source_service: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    q: Optional[str] = None,
+    chunk_size: int = 1000,
+) -> Iterator[Row]:
+    """
+    流式遍历所有符合条件的日志（不限条数），供导出使用。
+
+    通过 yield_per 走服务端游标，每次只从驱动取 chunk_size 行，
+    不构造 ORM 对象，内存占用与总行数无关；热库之后接着逐块读取归档段文件。
+    """
+    for table in tables_for_range(db, since, until):
+        stmt = _filtered_select(
+            db,
+            table,
+            actor=actor,
+            action=action,
+            source_service=source_service,
+            since=since,
+            until=until,
+            q=q,
+        ).execution_options(yield_per=chunk_size)
+        yield from db.execute(stmt)
+    yield from scan_archive(
+        actor=actor,
+        action=action,
+        source_service=source_service,
+        since=since,
+        until=until,
+        q=q,
+    )
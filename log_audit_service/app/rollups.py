@@ -0,0 +1,166 @@
+"""
+审计日志计数汇总（rollup）。
+
+维护方式：
+- 写入路径（create_audit_log / bulk_create_audit_logs）在同一事务中调用 apply_rollups()，
+  先在内存里把一批日志按 (粒度, 时间桶, 维度, 取值) 聚合，再用一条 executemany 的
+  INSERT ... ON CONFLICT DO UPDATE（MySQL 为 ON DUPLICATE KEY UPDATE）把计数累加到 audit_log_rollups；
+  其他数据库逐行 UPDATE，没有命中再 INSERT；
+- GET /logs/stats 只读汇总表，按时间桶分组的统计不再需要全表扫描 audit_logs；
+- 汇总表与原始数据不一致时（例如中途才开启 rollups），用 rebuild_rollups() 按 ID 分块重建：
+    python -m log_audit_service.manage backfill-rollups
+"""
+
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+from sqlalchemy import and_, delete, func, insert, select, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from .models import AuditLogRollup
+from .partitions import tables_for_range
+
+
+GRANULARITIES = ("hour", "day")
+DIMENSIONS = ("action", "source_service", "actor")
+
+
+def bucket_start(ts: datetime, granularity: str) -> datetime:
+    """把时间截断到所属时间桶的起点。"""
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"不支持的统计粒度：{granularity}")
+
+
+def _upsert_statement(db: Session):
+    """按数据库方言构造“冲突则累加计数”的 insert 语句；不支持 upsert 的方言返回 None。"""
+    table = AuditLogRollup.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql.insert(table)
+        return stmt.on_duplicate_key_update(count=table.c.count + stmt.inserted.count)
+    if dialect == "sqlite":
+        stmt = sqlite.insert(table)
+    elif dialect == "postgresql":
+        stmt = postgresql.insert(table)
+    else:
+        return None
+
+    return stmt.on_conflict_do_update(
+        index_elements=list(table.primary_key.columns),
+        set_={"count": table.c.count + stmt.excluded.count},
+    )
+
+
+def _upsert_generic(db: Session, params: List[Dict[str, Any]]) -> None:
+    """通用实现：逐行累加计数，没有命中的行再插入。"""
+    table = AuditLogRollup.__table__
+    for row in params:
+        matches = and_(*(column == row[column.name] for column in table.primary_key.columns))
+        increment = update(table).where(matches).values(count=table.c.count + row["count"])
+        if db.execute(increment).rowcount:
+            continue
+        try:
+            # 并发事务可能抢先插入同一行：在保存点里插入，冲突时改为累加。
+            with db.begin_nested():
+                db.execute(insert(table).values(**row))
+        except IntegrityError:
+            db.execute(increment)
+
+
+def apply_rollups(db: Session, rows: Iterable[Mapping[str, Any]]) -> None:
+    """
+    把一批日志计入汇总表（不提交事务，由调用方与日志写入一起提交）。
+
+    rows 中每个元素至少包含 created_at 以及各维度字段。
+    """
+    counter: Counter = Counter()
+    for row in rows:
+        for granularity in GRANULARITIES:
+            bucket = bucket_start(row["created_at"], granularity)
+            for dimension in DIMENSIONS:
+                counter[(granularity, bucket, dimension, row[dimension] or "")] += 1
+    if not counter:
+        return
+
+    params = [
+        {
+            "granularity": granularity,
+            "bucket_start": bucket,
+            "dimension": dimension,
+            "value": value,
+            "count": count,
+        }
+        for (granularity, bucket, dimension, value), count in counter.items()
+    ]
+    stmt = _upsert_statement(db)
+    if stmt is None:
+        _upsert_generic(db, params)
+    else:
+        db.execute(stmt, params)
+
+
+def query_rollups(
+    db: Session,
+    *,
+    dimension: str,
+    granularity: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    value: Optional[str] = None,
+) -> List[Row]:
+    """按时间桶读取某个维度的计数，返回 (bucket_start, value, count) 行，按时间升序。"""
+    table = AuditLogRollup.__table__
+    stmt = select(table.c.bucket_start, table.c.value, table.c.count).where(
+        table.c.granularity == granularity,
+        table.c.dimension == dimension,
+    )
+    if since:
+        stmt = stmt.where(table.c.bucket_start >= bucket_start(since, granularity))
+    if until:
+        stmt = stmt.where(table.c.bucket_start <= until)
+    if value is not None:
+        stmt = stmt.where(table.c.value == value)
+    stmt = stmt.order_by(table.c.bucket_start, table.c.count.desc())
+    return db.execute(stmt).all()
+
+
+def rebuild_rollups(db: Session, *, chunk_size: int = 5000) -> int:
+    """
+    从原始日志全量重建汇总表，返回处理的日志条数。
+
+    先在一个事务里清空汇总表并记下当时的最大 ID：之后新写入的日志 ID 更大，
+    由写入路径自己累加；重建只处理不超过该 ID 的历史日志，按 ID 分块、每块提交一次。
+    """
+    tables = tables_for_range(db)
+    db.execute(delete(AuditLogRollup.__table__))
+    max_ids: Dict[str, int] = {
+        table.name: db.execute(select(func.coalesce(func.max(table.c.id), 0))).scalar_one()
+        for table in tables
+    }
+    db.commit()
+
+    processed = 0
+    for table in tables:
+        columns = [table.c.id, table.c.created_at, *[table.c[dim] for dim in DIMENSIONS]]
+        last_id = 0
+        while True:
+            chunk = db.execute(
+                select(*columns)
+                .where(table.c.id > last_id, table.c.id <= max_ids[table.name])
+                .order_by(table.c.id)
+                .limit(chunk_size)
+            ).mappings().all()
+            if not chunk:
+                break
+            apply_rollups(db, chunk)
+            db.commit()
+            processed += len(chunk)
+            last_id = chunk[-1]["id"]
+    return processed
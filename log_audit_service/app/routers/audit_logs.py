@@ -6,16 +6,46 @@
 - /ui：给本地开发时直接在浏览器中快速查看
 """
 
+import math
+import time
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
-from fastapi import APIRouter, Depends, Query, Request
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
-from ..database import get_db
-from ..repositories.audit_log_repository import create_audit_log, query_audit_logs
-from ..schemas import AuditLogCreate, AuditLogRead
+from ..config import settings
+from ..database import SessionLocal, engine, get_db
+from ..export import EXPORT_FORMATS, export_audit_logs
+from ..fulltext import fulltext_status
+from ..ingest_buffer import audit_log_buffer
+from ..live_tail import SubscriberLimitError, event_stream, live_tail_hub
+from ..pagination import InvalidCursorError, decode_cursor, encode_cursor
+from ..query_cache import make_cache_key, query_cache
+from ..queue_ingest import audit_log_queue_consumer
+from ..repositories.audit_log_repository import (
+    bulk_create_audit_logs,
+    create_audit_log,
+    query_audit_logs,
+)
+from ..rollups import query_rollups
+from ..schemas import (
+    AuditLogAccepted,
+    AuditLogBatchCreate,
+    AuditLogBatchResult,
+    AuditLogCreate,
+    AuditLogDistinctBucket,
+    AuditLogDistinctResult,
+    AuditLogFrequencyResult,
+    AuditLogRead,
+    AuditLogStatsItem,
+    AuditLogTopItem,
+    AuditLogTopResult,
+)
+from ..sketches import ALL_KEY, merge_all, merged_sketches
+from ..ui import PAGE_TAIL, UI_CACHE_MAX_ROWS, render_head, stream_rows
 
 
 router = APIRouter(prefix="/logs", tags=["audit_logs"])
@@ -23,18 +53,274 @@ router = APIRouter(prefix="/logs", tags=["audit_logs"])
 
 
 # 其他服务写审计日志时的统一入口。
-@router.post("", response_model=AuditLogRead, status_code=201)
-def create_log(log_in: AuditLogCreate, db: Session = Depends(get_db)) -> AuditLogRead:
+@router.post(
+    "",
+    response_model=AuditLogRead,
+    status_code=201,
+    responses={202: {"model": AuditLogAccepted}, 503: {"description": "写入队列已满"}},
+)
+def create_log(
+    log_in: AuditLogCreate, db: Session = Depends(get_db)
+) -> Union[AuditLogRead, JSONResponse]:
     """
     创建一条审计日志。
 
     通常由其他服务在关键操作（如登录、下单、权限变更等）完成后调用。
+    ingest_mode=buffered 时只入队并返回 202，由后台线程批量落库。
     """
+    if settings.ingest_mode == "buffered":
+        if not audit_log_buffer.submit(log_in):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="审计日志写入队列已满，请稍后重试",
+            )
+        accepted = AuditLogAccepted(accepted=True, queue_depth=audit_log_buffer.queue_depth)
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=accepted.dict())
+
     # 写库动作下沉到 repository，路由层只负责接请求和返回响应。
     log = create_audit_log(db, log_in)
     return log
 
 
+# 高频上报方（网关、批量导入脚本）用的批量写入入口：一批日志只提交一次事务。
+@router.post("/batch", response_model=AuditLogBatchResult, status_code=201)
+def create_logs_batch(
+    batch_in: AuditLogBatchCreate, db: Session = Depends(get_db)
+) -> AuditLogBatchResult:
+    """
+    批量创建审计日志。
+
+    单次最多 batch_max_items 条，超出时返回 413，由调用方自行拆批。
+    """
+    if len(batch_in.items) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"单次最多写入 {settings.batch_max_items} 条日志",
+        )
+    ids = bulk_create_audit_logs(db, batch_in.items)
+    return AuditLogBatchResult(count=len(ids), ids=ids)
+
+
+# 运行指标：排查写入积压、丢弃等问题时先看这里。
+@router.get("/metrics")
+def get_metrics() -> Dict[str, Any]:
+    """返回服务运行指标（写入模式、缓冲队列深度、提交延迟、丢弃计数等）。"""
+    return {
+        "ingest_mode": settings.ingest_mode,
+        "ingest_buffer": audit_log_buffer.stats(),
+        "fulltext": fulltext_status(engine),
+        "query_cache": query_cache.stats(),
+        "live_tail": live_tail_hub.stats(),
+        "queue_consumer": audit_log_queue_consumer.stats(),
+    }
+
+
+# 管理后台看板用的统计接口：只读汇总表，不扫描原始日志。
+@router.get("/stats", response_model=List[AuditLogStatsItem])
+def get_stats(
+    dimension: str = Query(
+        "action", pattern="^(action|source_service|actor)$", description="统计维度"
+    ),
+    granularity: str = Query("hour", pattern="^(hour|day)$", description="时间粒度"),
+    since: Optional[datetime] = Query(None, description="起始时间（含），ISO8601 格式"),
+    until: Optional[datetime] = Query(None, description="结束时间（含），ISO8601 格式"),
+    value: Optional[str] = Query(None, description="只看某个维度取值，例如 action=login"),
+    db: Session = Depends(get_db),
+) -> List[AuditLogStatsItem]:
+    """
+    按时间桶统计日志条数，数据来自写入时增量维护的 audit_log_rollups。
+
+    返回按时间升序排列；同一时间桶内按条数倒序。
+    """
+    rows = query_rollups(
+        db,
+        dimension=dimension,
+        granularity=granularity,
+        since=since,
+        until=until,
+        value=value,
+    )
+    return [
+        AuditLogStatsItem(bucket_start=row.bucket_start, value=row.value or None, count=row.count)
+        for row in rows
+    ]
+
+
+# 近似统计接口：读取写入时维护的 sketch，需开启 LOG_AUDIT_SKETCHES_ENABLED。
+@router.get("/analytics/distinct", response_model=AuditLogDistinctResult)
+def get_distinct(
+    field: str = Query("ip", pattern="^(ip|actor)$", description="统计不同值个数的字段"),
+    action: Optional[str] = Query(None, description="只统计某个 action，例如 login_failed"),
+    granularity: str = Query("hour", pattern="^(hour|day)$", description="时间粒度"),
+    since: Optional[datetime] = Query(None, description="起始时间（含），ISO8601 格式"),
+    until: Optional[datetime] = Query(None, description="结束时间（含），ISO8601 格式"),
+    db: Session = Depends(get_db),
+) -> AuditLogDistinctResult:
+    """
+    估计时间范围内某字段的不同值个数（HyperLogLog）。
+
+    整体估计由各时间桶的 sketch 合并后计算，不是各桶估计之和（同一个 IP 不会重复计数）。
+    """
+    buckets = merged_sketches(
+        db,
+        kind="hll",
+        dimension=field,
+        granularity=granularity,
+        key=action if action is not None else ALL_KEY,
+        since=since,
+        until=until,
+    )
+    merged = merge_all((sketch for _, sketch in buckets), "hll")
+    return AuditLogDistinctResult(
+        field=field,
+        action=action,
+        estimate=merged.estimate() if buckets else 0,
+        relative_standard_error=round(merged.relative_error, 4),
+        buckets=[
+            AuditLogDistinctBucket(bucket_start=start, estimate=sketch.estimate())
+            for start, sketch in buckets
+        ],
+    )
+
+
+@router.get("/analytics/top", response_model=AuditLogTopResult)
+def get_top(
+    dimension: str = Query("actor", pattern="^(actor|ip|action)$", description="统计维度"),
+    k: int = Query(10, ge=1, le=100, description="返回前 k 项"),
+    granularity: str = Query("hour", pattern="^(hour|day)$", description="时间粒度"),
+    since: Optional[datetime] = Query(None, description="起始时间（含），ISO8601 格式"),
+    until: Optional[datetime] = Query(None, description="结束时间（含），ISO8601 格式"),
+    db: Session = Depends(get_db),
+) -> AuditLogTopResult:
+    """估计时间范围内出现次数最多的取值（Space-Saving），每项附带误差范围。"""
+    buckets = [
+        sketch
+        for _, sketch in merged_sketches(
+            db,
+            kind="topk",
+            dimension=dimension,
+            granularity=granularity,
+            since=since,
+            until=until,
+        )
+    ]
+    merged = merge_all(buckets, "topk")
+    return AuditLogTopResult(
+        dimension=dimension,
+        total=merged.total,
+        capacity=merged.capacity,
+        max_error=sum(sketch.total // sketch.capacity for sketch in buckets),
+        items=[
+            AuditLogTopItem(value=value, count=count, error=error)
+            for value, count, error in merged.top(k)
+        ],
+    )
+
+
+@router.get("/analytics/frequency", response_model=AuditLogFrequencyResult)
+def get_frequency(
+    value: str = Query(..., description="要估计频次的取值，例如某个 IP"),
+    dimension: str = Query("ip", pattern="^(actor|ip)$", description="统计维度"),
+    granularity: str = Query("hour", pattern="^(hour|day)$", description="时间粒度"),
+    since: Optional[datetime] = Query(None, description="起始时间（含），ISO8601 格式"),
+    until: Optional[datetime] = Query(None, description="结束时间（含），ISO8601 格式"),
+    db: Session = Depends(get_db),
+) -> AuditLogFrequencyResult:
+    """估计某个取值在时间范围内出现的次数（Count-Min），只会高估、不会低估。"""
+    buckets = merged_sketches(
+        db,
+        kind="cms",
+        dimension=dimension,
+        granularity=granularity,
+        since=since,
+        until=until,
+    )
+    merged = merge_all((sketch for _, sketch in buckets), "cms")
+    return AuditLogFrequencyResult(
+        dimension=dimension,
+        value=value,
+        estimate=merged.estimate(value),
+        total=merged.total,
+        max_overestimate=math.ceil(merged.epsilon * merged.total),
+        confidence=round(merged.confidence, 4),
+    )
+
+
+# 合规导出入口：不受 limit 上限约束，边查边写响应。
+@router.get("/export")
+def export_logs(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$", description="导出格式"),
+    compress: bool = Query(False, alias="gzip", description="是否 gzip 压缩"),
+    actor: Optional[str] = Query(None, description="按 actor 精确过滤"),
+    action: Optional[str] = Query(None, description="按 action 精确过滤"),
+    source_service: Optional[str] = Query(None, description="按来源服务名称精确过滤"),
+    since: Optional[datetime] = Query(None, description="起始时间（含），ISO8601 格式"),
+    until: Optional[datetime] = Query(None, description="结束时间（含），ISO8601 格式"),
+    q: Optional[str] = Query(None, description="全文检索 detail/action/resource"),
+) -> StreamingResponse:
+    """
+    流式导出符合条件的全部审计日志，按时间倒序。
+
+    NDJSON 每行一个 JSON 对象；CSV 首行为表头。gzip=true 时返回 .gz 文件。
+    """
+    body = export_audit_logs(
+        SessionLocal,
+        fmt=fmt,
+        compress=compress,
+        actor=actor,
+        action=action,
+        source_service=source_service,
+        since=since,
+        until=until,
+        q=q,
+    )
+    filename = f"audit_logs_{datetime.utcnow():%Y%m%d%H%M%S}.{fmt}"
+    media_type = EXPORT_FORMATS[fmt]
+    if compress:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+# 排查故障时盯新日志用：代替反复刷新 /logs/ui，不轮询数据库。
+@router.get("/stream", responses={503: {"description": "实时订阅数已达上限"}})
+async def stream_logs(
+    request: Request,
+    actor: Optional[str] = Query(None, description="按 actor 精确过滤"),
+    action: Optional[str] = Query(None, description="按 action 精确过滤"),
+    source_service: Optional[str] = Query(None, description="按来源服务名称精确过滤"),
+    q: Optional[str] = Query(None, description="detail/action/resource 子串匹配，多个词为 AND"),
+) -> StreamingResponse:
+    """
+    以 Server-Sent Events 实时推送此后新写入的审计日志。
+
+    每条日志为一个 audit_log 事件，data 为与列表接口相同结构的 JSON；
+    客户端消费过慢时会收到 overflow 事件并被断开，需要重新连接。
+    """
+    try:
+        subscription = live_tail_hub.subscribe(
+            actor=actor, action=action, source_service=source_service, q=q
+        )
+    except SubscriberLimitError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc)
+        ) from exc
+    return StreamingResponse(
+        event_stream(
+            subscription,
+            request.is_disconnected,
+            heartbeat_seconds=settings.live_tail_heartbeat_seconds,
+        ),
+        media_type="text/event-stream",
+        # 禁止代理缓冲，保证事件即时送达。
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # admin.html 查询日志列表的主要 JSON 接口。
 @router.get("", response_model=List[AuditLogRead])
 def list_logs(
@@ -49,27 +335,104 @@ def list_logs(
     until: Optional[datetime] = Query(
         None, description="结束时间（含），ISO8601 格式"
     ),
+    q: Optional[str] = Query(
+        None, description="全文检索 detail/action/resource，空格分隔的多个词为 AND 关系"
+    ),
     limit: int = Query(50, ge=1, le=200, description="返回记录数量上限"),
-    offset: int = Query(0, ge=0, description="偏移量，用于分页"),
+    offset: int = Query(0, ge=0, description="偏移量，用于分页（深翻页建议改用 cursor）"),
+    cursor: Optional[str] = Query(
+        None, description="游标分页：传入上一页响应头 X-Next-Cursor 的值"
+    ),
     db: Session = Depends(get_db),
-) -> List[AuditLogRead]:
+) -> Response:
     """
     按条件查询审计日志列表。
 
     支持按 actor/action/source_service 以及时间范围过滤，默认按时间倒序返回。
+    若后面还有数据，响应头 X-Next-Cursor 会给出下一页游标。
+    相同条件的结果会缓存已序列化的响应体，直到下一次写入提交（响应头 X-Cache 标明是否命中）。
     """
-    # 这是 admin.html 查看审计日志时最常走到的入口。
-    logs = query_audit_logs(
-        db,
+    after = parse_cursor(cursor, offset)
+    key = make_cache_key(
+        "list",
         actor=actor,
         action=action,
         source_service=source_service,
         since=since,
         until=until,
+        q=q,
         limit=limit,
         offset=offset,
+        after=after,
+    )
+    cached = query_cache.get(key)
+    if cached is not None:
+        body, next_cursor = cached
+        return list_response(body, next_cursor, cache_status="HIT")
+
+    # 这是 admin.html 查看审计日志时最常走到的入口。
+    # 先记下写版本号再查库：查询期间若有新日志提交，这份结果不会被当作最新结果缓存。
+    version = query_cache.version
+    started = time.perf_counter()
+    # 多取一条用于判断是否还有下一页，避免返回一个指向空页的游标。
+    logs = list(
+        query_audit_logs(
+            db,
+            actor=actor,
+            action=action,
+            source_service=source_service,
+            since=since,
+            until=until,
+            q=q,
+            limit=limit + 1,
+            offset=offset,
+            after=after,
+        )
     )
-    return list(logs)
+    body, next_cursor = render_list_page(logs, limit)
+    query_cache.put(key, version, (body, next_cursor), (time.perf_counter() - started) * 1000)
+    return list_response(body, next_cursor, cache_status="MISS")
+
+
+# 以下三个函数由同步 / async 两套列表接口共用。
+def parse_cursor(cursor: Optional[str], offset: int) -> Optional[Tuple[datetime, int]]:
+    """校验并解码 cursor 参数，非法时返回 400。"""
+    if not cursor:
+        return None
+    if offset:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="cursor 与 offset 不能同时使用",
+        )
+    try:
+        return decode_cursor(cursor)
+    except InvalidCursorError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)
+        ) from exc
+
+
+def render_list_page(logs: List[Any], limit: int) -> Tuple[bytes, Optional[str]]:
+    """
+    把多取了一条的查询结果序列化为响应体，返回 (响应体, 下一页游标)。
+
+    多出的那一条只用来判断是否还有下一页，不会出现在响应里。
+    """
+    next_cursor = None
+    if len(logs) > limit:
+        logs = logs[:limit]
+        last = logs[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    items = [AuditLogRead.model_validate(log, from_attributes=True) for log in logs]
+    return JSONResponse(content=jsonable_encoder(items)).body, next_cursor
+
+
+def list_response(body: bytes, next_cursor: Optional[str], *, cache_status: str) -> Response:
+    """用已序列化的响应体构造列表接口的响应。"""
+    headers = {"X-Cache": cache_status}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 # 本地快速排查入口：不走前端 admin 页面，也能直接在浏览器里看最近日志。
@@ -81,102 +444,52 @@ def logs_ui(
     source_service: Optional[str] = Query(
         None, description="按来源服务名称精确过滤"
     ),
-    limit: int = Query(50, ge=1, le=200, description="返回记录数量上限"),
-    db: Session = Depends(get_db),
-) -> HTMLResponse:
+    q: Optional[str] = Query(None, description="全文检索 detail/action/resource"),
+    limit: int = Query(50, ge=1, le=settings.ui_max_limit, description="返回记录数量上限"),
+) -> Response:
     """
     简单的 HTML 审计日志查看界面。
 
     仅用于本地开发与学习，便于在浏览器中快速查看最近的审计日志。
+    页头先输出，表格行边查边流式输出；不超过 UI_CACHE_MAX_ROWS 行的页面
+    按筛选条件缓存渲染好的表格片段，直到下一次写入提交。
     """
-    # 本地调试页走这条链：/logs/ui -> query_audit_logs() -> 拼成一页简单 HTML。
-    logs = query_audit_logs(
-        db,
+    head = render_head(
+        request.url.path,
         actor=actor,
         action=action,
         source_service=source_service,
-        since=None,
-        until=None,
+        q=q,
         limit=limit,
-        offset=0,
     )
+    key = make_cache_key(
+        "ui", actor=actor, action=action, source_service=source_service, q=q, limit=limit
+    )
+    rows_html = query_cache.get(key)
+    if rows_html is not None:
+        return HTMLResponse(content=head + rows_html + PAGE_TAIL, headers={"X-Cache": "HIT"})
 
-    # 最小 HTML 转义，避免把日志内容直接插入页面时破坏 DOM。
-    def esc(value: Optional[str]) -> str:
-        if value is None:
-            return ""
-        return (
-            str(value)
-            .replace("&", "&amp;")
-            .replace("<", "&lt;")
-            .replace(">", "&gt;")
-        )
+    on_complete = None
+    if limit <= UI_CACHE_MAX_ROWS:
+        version = query_cache.version
+        started = time.perf_counter()
+
+        def on_complete(fragment: str) -> None:
+            query_cache.put(key, version, fragment, (time.perf_counter() - started) * 1000)
 
-    rows = []
-    for log in logs:
-        rows.append(
-            f"<tr>"
-            f"<td>{log.id}</td>"
-            f"<td>{esc(log.actor)}</td>"
-            f"<td>{esc(log.action)}</td>"
-            f"<td>{esc(log.resource)}</td>"
-            f"<td>{esc(log.source_service)}</td>"
-            f"<td>{log.created_at}</td>"
-            f"<td>{esc(log.ip)}</td>"
-            f"<td>{esc(log.detail)}</td>"
-            f"</tr>"
+    def body() -> Iterator[str]:
+        yield head
+        yield from stream_rows(
+            SessionLocal,
+            actor=actor,
+            action=action,
+            source_service=source_service,
+            q=q,
+            limit=limit,
+            on_complete=on_complete,
         )
-    rows_html = "\n".join(rows)
-
-    html = f"""
-<!DOCTYPE html>
-<html lang="zh-CN">
-<head>
-  <meta charset="UTF-8" />
-  <title>审计日志查看</title>
-  <style>
-    body {{ font-family: sans-serif; padding: 16px; }}
-    table {{ border-collapse: collapse; width: 100%; margin-top: 12px; }}
-    th, td {{ border: 1px solid #ddd; padding: 4px 8px; font-size: 13px; }}
-    th {{ background: #f5f5f5; }}
-    form > * {{ margin-right: 8px; }}
-  </style>
-  </head>
-  <body>
-    <h1>审计日志查看</h1>
-    <form method="get" action="{request.url.path}">
-      <label>Actor:
-        <input type="text" name="actor" value="{esc(actor) if actor else ''}" />
-      </label>
-      <label>Action:
-        <input type="text" name="action" value="{esc(action) if action else ''}" />
-      </label>
-      <label>Source Service:
-        <input type="text" name="source_service" value="{esc(source_service) if source_service else ''}" />
-      </label>
-      <label>Limit:
-        <input type="number" name="limit" min="1" max="200" value="{limit}" />
-      </label>
-      <button type="submit">筛选</button>
-    </form>
-    <table>
-      <thead>
-        <tr>
-          <th>ID</th>
-          <th>Actor</th>
-          <th>Action</th>
-          <th>Resource</th>
-          <th>Source</th>
-          <th>Created At</th>
-          <th>IP</th>
-          <th>Detail</th>
-        </tr>
-      </thead>
-      <tbody>
-        {rows_html}
-      </tbody>
-    </table>
-  </body>
-</html>
-    """
-    return HTMLResponse(content=html)
+        yield PAGE_TAIL
+
+    return StreamingResponse(
+        body(), media_type="text/html; charset=utf-8", headers={"X-Cache": "MISS"}
+    )
@@ -0,0 +1,127 @@
+"""
+审计日志高频接口的 async 实现（LOG_AUDIT_DB_MODE=async 时挂载）。
+
+覆盖写入（POST /logs、POST /logs/batch）和列表查询（GET /logs）这三个高并发入口，
+行为、参数与 audit_logs.py 中的同步版本完全一致。
+main.py 会把本路由挂在同步路由之前，同路径的请求优先匹配这里；
+/ui、/export、/stats、/metrics 等低频接口仍由同步路由处理。
+
+同步版本的 def 处理函数运行在 Starlette 线程池里（默认 40 个线程），
+并发请求一多就要排队等线程；async 版本在事件循环里等待 aiosqlite，不占用线程。
+"""
+
+import time
+from datetime import datetime
+from typing import List, Optional, Union
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..database import get_async_db
+from ..ingest_buffer import audit_log_buffer
+from ..query_cache import make_cache_key, query_cache
+from ..repositories import async_audit_log_repository as repository
+from ..schemas import (
+    AuditLogAccepted,
+    AuditLogBatchCreate,
+    AuditLogBatchResult,
+    AuditLogCreate,
+    AuditLogRead,
+)
+from .audit_logs import list_response, parse_cursor, render_list_page
+
+
+router = APIRouter(prefix="/logs", tags=["audit_logs"])
+
+
+@router.post(
+    "",
+    response_model=AuditLogRead,
+    status_code=201,
+    responses={202: {"model": AuditLogAccepted}, 503: {"description": "写入队列已满"}},
+)
+async def create_log(
+    log_in: AuditLogCreate, db: AsyncSession = Depends(get_async_db)
+) -> Union[AuditLogRead, JSONResponse]:
+    """创建一条审计日志（async 版本）。"""
+    if settings.ingest_mode == "buffered":
+        if not audit_log_buffer.submit(log_in):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="审计日志写入队列已满，请稍后重试",
+            )
+        accepted = AuditLogAccepted(accepted=True, queue_depth=audit_log_buffer.queue_depth)
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=accepted.dict())
+
+    return await repository.create_audit_log(db, log_in)
+
+
+@router.post("/batch", response_model=AuditLogBatchResult, status_code=201)
+async def create_logs_batch(
+    batch_in: AuditLogBatchCreate, db: AsyncSession = Depends(get_async_db)
+) -> AuditLogBatchResult:
+    """批量创建审计日志（async 版本）。"""
+    if len(batch_in.items) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"单次最多写入 {settings.batch_max_items} 条日志",
+        )
+    ids = await repository.bulk_create_audit_logs(db, batch_in.items)
+    return AuditLogBatchResult(count=len(ids), ids=ids)
+
+
+@router.get("", response_model=List[AuditLogRead])
+async def list_logs(
+    actor: Optional[str] = Query(None, description="按 actor 精确过滤"),
+    action: Optional[str] = Query(None, description="按 action 精确过滤"),
+    source_service: Optional[str] = Query(None, description="按来源服务名称精确过滤"),
+    since: Optional[datetime] = Query(None, description="起始时间（含），ISO8601 格式"),
+    until: Optional[datetime] = Query(None, description="结束时间（含），ISO8601 格式"),
+    q: Optional[str] = Query(
+        None, description="全文检索 detail/action/resource，空格分隔的多个词为 AND 关系"
+    ),
+    limit: int = Query(50, ge=1, le=200, description="返回记录数量上限"),
+    offset: int = Query(0, ge=0, description="偏移量，用于分页（深翻页建议改用 cursor）"),
+    cursor: Optional[str] = Query(
+        None, description="游标分页：传入上一页响应头 X-Next-Cursor 的值"
+    ),
+    db: AsyncSession = Depends(get_async_db),
+) -> Response:
+    """按条件查询审计日志列表（async 版本），与同步版本共用结果缓存。"""
+    after = parse_cursor(cursor, offset)
+    key = make_cache_key(
+        "list",
+        actor=actor,
+        action=action,
+        source_service=source_service,
+        since=since,
+        until=until,
+        q=q,
+        limit=limit,
+        offset=offset,
+        after=after,
+    )
+    cached = query_cache.get(key)
+    if cached is not None:
+        body, next_cursor = cached
+        return list_response(body, next_cursor, cache_status="HIT")
+
+    version = query_cache.version
+    started = time.perf_counter()
+    logs = await repository.query_audit_logs(
+        db,
+        actor=actor,
+        action=action,
+        source_service=source_service,
+        since=since,
+        until=until,
+        q=q,
+        limit=limit + 1,
+        offset=offset,
+        after=after,
+    )
+    body, next_cursor = render_list_page(logs, limit)
+    query_cache.put(key, version, (body, next_cursor), (time.perf_counter() - started) * 1000)
+    return list_response(body, next_cursor, cache_status="MISS")
@@ -4,12 +4,17 @@
 用途：
 - AuditLogCreate：其他服务写日志时的入参格式
 - AuditLogRead：前端查询日志时的返回结构
+- AuditLogBatchCreate / AuditLogBatchResult：批量写入接口的入参与返回
+- AuditLogAccepted：缓冲写入模式下 POST /logs 的 202 返回结构
+- AuditLogStatsItem：GET /logs/stats 按时间桶统计的单行结果
 """
 
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+
+from .compression import detail_text
 
 
 class AuditLogCreate(BaseModel):
@@ -39,3 +44,86 @@ class AuditLogRead(BaseModel):
 
     class Config:
         orm_mode = True
+
+    # 开启 detail 压缩时查询结果是压缩句柄，在这里（即序列化时）才解压。
+    _decompress_detail = field_validator("detail", mode="before")(detail_text)
+
+
+class AuditLogBatchCreate(BaseModel):
+    """批量创建审计日志请求体。"""
+
+    items: List[AuditLogCreate] = Field(
+        ..., min_length=1, description="待写入的审计日志列表，条数上限见 batch_max_items"
+    )
+
+
+class AuditLogBatchResult(BaseModel):
+    """批量创建审计日志的返回结构。"""
+
+    count: int = Field(..., description="本次写入的日志条数")
+    ids: List[int] = Field(..., description="按请求顺序返回的日志 ID 列表")
+
+
+class AuditLogAccepted(BaseModel):
+    """缓冲写入模式下，日志已入队但尚未落库时的返回结构。"""
+
+    accepted: bool = Field(..., description="日志是否已进入写入队列")
+    queue_depth: int = Field(..., description="入队后的队列深度")
+
+
+class AuditLogStatsItem(BaseModel):
+    """按时间桶统计的一行结果。"""
+
+    bucket_start: datetime = Field(..., description="时间桶起点（UTC）")
+    value: Optional[str] = Field(None, description="维度取值，例如具体的 action 名称")
+    count: int = Field(..., description="该时间桶内的日志条数")
+
+
+class AuditLogDistinctBucket(BaseModel):
+    """单个时间桶的不同值个数估计。"""
+
+    bucket_start: datetime = Field(..., description="时间桶起点（UTC）")
+    estimate: int = Field(..., description="该时间桶内不同值个数的估计")
+
+
+class AuditLogDistinctResult(BaseModel):
+    """不同值个数估计（HyperLogLog）。"""
+
+    field: str = Field(..., description="被计数的字段，例如 ip")
+    action: Optional[str] = Field(None, description="只统计该 action 的日志；为空表示全部")
+    estimate: int = Field(..., description="整个时间范围内不同值个数的估计（各桶合并后计算）")
+    relative_standard_error: float = Field(
+        ..., description="相对标准误差：约 68% 的情况下误差不超过 estimate 的该比例，95% 不超过两倍"
+    )
+    buckets: List[AuditLogDistinctBucket] = Field(..., description="各时间桶的估计，按时间升序")
+
+
+class AuditLogTopItem(BaseModel):
+    """高频值中的一项。"""
+
+    value: str = Field(..., description="维度取值")
+    count: int = Field(..., description="计数上界：真实计数不超过该值")
+    error: int = Field(..., description="最大高估量：真实计数不低于 count - error")
+
+
+class AuditLogTopResult(BaseModel):
+    """高频值估计（Space-Saving）。"""
+
+    dimension: str = Field(..., description="统计维度")
+    total: int = Field(..., description="时间范围内该维度非空的日志总数 N")
+    capacity: int = Field(..., description="每个时间桶跟踪的候选值个数 m")
+    max_error: int = Field(..., description="任一项 error 的上界（单桶为 N / m，多桶合并后累加）")
+    items: List[AuditLogTopItem] = Field(..., description="按 count 倒序的前 k 项")
+
+
+class AuditLogFrequencyResult(BaseModel):
+    """单个取值的频次估计（Count-Min）。"""
+
+    dimension: str = Field(..., description="统计维度")
+    value: str = Field(..., description="被查询的取值")
+    estimate: int = Field(..., description="频次估计：不低于真实频次")
+    total: int = Field(..., description="时间范围内该维度非空的日志总数 N")
+    max_overestimate: int = Field(
+        ..., description="以 confidence 的概率，estimate 不超过 真实频次 + max_overestimate"
+    )
+    confidence: float = Field(..., description="上述误差界成立的概率")
@@ -0,0 +1,392 @@
+"""
+审计日志近似统计（概率数据结构）。
+
+安全团队常问的两类问题，精确计算都要扫全表：
+- “每个 action 每天有多少个不同 IP / 不同 actor” -> COUNT(DISTINCT)
+- “这一小时最活跃的 actor / IP 是谁” -> GROUP BY ... ORDER BY count DESC
+
+这里按时间桶（小时 / 天）在写入时维护三种 sketch，以压缩后的二进制存入 audit_log_sketches：
+- HyperLogLog（kind=hll）：不同值个数，按 action 分组（key 为 action，"*" 表示全部 action）；
+  精度 p=12，4096 个寄存器，相对标准误差约 1.04 / sqrt(4096) ≈ 1.6%；
+- Space-Saving（kind=topk）：高频值及其计数上界，每个维度只保留 capacity 个候选；
+  对每个返回项，真实计数落在 [count - error, count] 之间，error 不超过 N / capacity；
+- Count-Min（kind=cms）：任意值的频次估计，width=512、depth=4：
+  估计值不低于真实值，且以 1 - e^-4 ≈ 98% 的概率不超过真实值 + e / 512 * N（约 0.53% * N）。
+
+三种 sketch 都可以合并：查询跨多个时间桶时，先把各桶的 sketch 合并再估计，
+误差界与单个 sketch 相同（Space-Saving 合并后的 error 为各桶 error 之和）。
+
+维护方式与 rollups.py 一致：写入路径在同一事务中调用 apply_sketches()，
+先把一批日志在内存中按 (粒度, 时间桶, 类型, 维度, key) 聚合，再一次读出、合并、写回。
+"""
+
+import hashlib
+import json
+import math
+import struct
+import zlib
+from array import array
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, insert, select, tuple_, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models import AuditLogSketch
+from .partitions import tables_for_range
+from .rollups import GRANULARITIES, bucket_start
+
+
+# 不同值计数：(被计数字段, 分组字段)。
+DISTINCT_FIELDS = ("ip", "actor")
+DISTINCT_GROUP_BY = "action"
+# 高频值 / 频次估计的维度。
+TOPK_DIMENSIONS = ("actor", "ip", "action")
+CMS_DIMENSIONS = ("actor", "ip")
+# 分组 key 为 "*" 时表示不区分 action 的全局 sketch。
+ALL_KEY = "*"
+
+HLL_PRECISION = 12
+CMS_WIDTH = 512
+CMS_DEPTH = 4
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    """HyperLogLog 基数估计。"""
+
+    def __init__(self, precision: int = HLL_PRECISION, registers: Optional[bytearray] = None):
+        self.precision = precision
+        self.num_registers = 1 << precision
+        self.registers = registers if registers is not None else bytearray(self.num_registers)
+
+    @property
+    def relative_error(self) -> float:
+        """相对标准误差。"""
+        return 1.04 / math.sqrt(self.num_registers)
+
+    def add(self, value: str) -> None:
+        h = _hash64(value)
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        # 剩余位中第一个 1 出现的位置（从 1 开始计）。
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> None:
+        if other.precision != self.precision:
+            raise ValueError("HyperLogLog 精度不同，无法合并")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def estimate(self) -> int:
+        m = self.num_registers
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        # 小基数时改用线性计数，偏差更小。
+        if raw <= 2.5 * m and zeros:
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+    def to_bytes(self) -> bytes:
+        return bytes([self.precision]) + zlib.compress(bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        return cls(data[0], bytearray(zlib.decompress(data[1:])))
+
+
+class SpaceSaving:
+    """Space-Saving 高频值统计：最多跟踪 capacity 个值，每个值记录 [计数上界, 最大高估量]。"""
+
+    def __init__(self, capacity: int, total: int = 0, items: Optional[Dict[str, List[int]]] = None):
+        self.capacity = capacity
+        self.total = total
+        self.items: Dict[str, List[int]] = items if items is not None else {}
+
+    def add(self, value: str, count: int = 1) -> None:
+        self.total += count
+        entry = self.items.get(value)
+        if entry is not None:
+            entry[0] += count
+        elif len(self.items) < self.capacity:
+            self.items[value] = [count, 0]
+        else:
+            # 替换计数最小的候选：新值继承其计数作为高估量。
+            victim = min(self.items, key=lambda key: self.items[key][0])
+            floor = self.items.pop(victim)[0]
+            self.items[value] = [floor + count, floor]
+
+    def _floor(self) -> int:
+        """未被跟踪的值的计数上界：满员时为最小计数，否则为 0。"""
+        if len(self.items) < self.capacity:
+            return 0
+        return min(entry[0] for entry in self.items.values())
+
+    def merge(self, other: "SpaceSaving") -> None:
+        floor_self, floor_other = self._floor(), other._floor()
+        merged: Dict[str, List[int]] = {}
+        for value in set(self.items) | set(other.items):
+            count_a, err_a = self.items.get(value, (floor_self, floor_self))
+            count_b, err_b = other.items.get(value, (floor_other, floor_other))
+            merged[value] = [count_a + count_b, err_a + err_b]
+        top = sorted(merged.items(), key=lambda item: item[1][0], reverse=True)[: self.capacity]
+        self.items = dict(top)
+        self.total += other.total
+
+    def top(self, k: int) -> List[Tuple[str, int, int]]:
+        """返回计数最高的 k 个值：(值, 计数上界, 最大高估量)。"""
+        ranked = sorted(self.items.items(), key=lambda item: item[1][0], reverse=True)
+        return [(value, count, error) for value, (count, error) in ranked[:k]]
+
+    def to_bytes(self) -> bytes:
+        payload = {"c": self.capacity, "n": self.total, "i": self.items}
+        return zlib.compress(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "SpaceSaving":
+        payload = json.loads(zlib.decompress(data))
+        return cls(payload["c"], payload["n"], payload["i"])
+
+
+class CountMinSketch:
+    """Count-Min 频次估计。"""
+
+    _HEADER = struct.Struct("<HHQ")
+
+    def __init__(
+        self,
+        width: int = CMS_WIDTH,
+        depth: int = CMS_DEPTH,
+        total: int = 0,
+        counters: Optional[array] = None,
+    ):
+        self.width = width
+        self.depth = depth
+        self.total = total
+        self.counters = counters if counters is not None else array("I", bytes(4 * width * depth))
+
+    @property
+    def epsilon(self) -> float:
+        """单次估计的最大高估比例（相对总数 N）。"""
+        return math.e / self.width
+
+    @property
+    def confidence(self) -> float:
+        """估计值不超过 真实值 + epsilon * N 的概率。"""
+        return 1 - math.exp(-self.depth)
+
+    def _cells(self, value: str) -> Iterable[int]:
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for row in range(self.depth):
+            yield row * self.width + (h1 + row * h2) % self.width
+
+    def add(self, value: str, count: int = 1) -> None:
+        self.total += count
+        for cell in self._cells(value):
+            self.counters[cell] += count
+
+    def merge(self, other: "CountMinSketch") -> None:
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Count-Min 尺寸不同，无法合并")
+        self.counters = array("I", map(sum, zip(self.counters, other.counters)))
+        self.total += other.total
+
+    def estimate(self, value: str) -> int:
+        return min(self.counters[cell] for cell in self._cells(value))
+
+    def to_bytes(self) -> bytes:
+        header = self._HEADER.pack(self.width, self.depth, self.total)
+        return header + zlib.compress(self.counters.tobytes())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CountMinSketch":
+        width, depth, total = cls._HEADER.unpack_from(data)
+        counters = array("I")
+        counters.frombytes(zlib.decompress(data[cls._HEADER.size :]))
+        return cls(width, depth, total, counters)
+
+
+_SKETCH_TYPES = {"hll": HyperLogLog, "topk": SpaceSaving, "cms": CountMinSketch}
+SketchKey = Tuple[str, datetime, str, str, str]
+
+
+def _new_sketch(kind: str) -> Any:
+    if kind == "topk":
+        return SpaceSaving(settings.sketch_topk_capacity)
+    return _SKETCH_TYPES[kind]()
+
+
+def _upsert_statement(db: Session):
+    """按数据库方言构造“冲突则覆盖”的 insert 语句（合并已在内存中完成）；不支持的方言返回 None。"""
+    table = AuditLogSketch.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql.insert(table)
+        return stmt.on_duplicate_key_update(data=stmt.inserted.data)
+    if dialect == "sqlite":
+        stmt = sqlite.insert(table)
+    elif dialect == "postgresql":
+        stmt = postgresql.insert(table)
+    else:
+        return None
+    return stmt.on_conflict_do_update(
+        index_elements=list(table.primary_key.columns), set_={"data": stmt.excluded.data}
+    )
+
+
+def _upsert_generic(db: Session, params: List[Dict[str, Any]]) -> None:
+    """通用实现：逐行覆盖已有 sketch，没有命中的行再插入。"""
+    table = AuditLogSketch.__table__
+    for row in params:
+        matches = and_(*(column == row[column.name] for column in table.primary_key.columns))
+        overwrite = update(table).where(matches).values(data=row["data"])
+        if db.execute(overwrite).rowcount:
+            continue
+        try:
+            with db.begin_nested():
+                db.execute(insert(table).values(**row))
+        except IntegrityError:
+            db.execute(overwrite)
+
+
+def _load(db: Session, keys: List[SketchKey]) -> Dict[SketchKey, Any]:
+    """一次读出多个已有 sketch（行锁防止并发写入互相覆盖；SQLite 写事务本身已串行）。"""
+    table = AuditLogSketch.__table__
+    columns = (
+        table.c.granularity,
+        table.c.bucket_start,
+        table.c.kind,
+        table.c.dimension,
+        table.c.key,
+    )
+    loaded: Dict[SketchKey, Any] = {}
+    for start in range(0, len(keys), 200):
+        stmt = (
+            select(*columns, table.c.data)
+            .where(tuple_(*columns).in_(keys[start : start + 200]))
+            .with_for_update()
+        )
+        for *key, data in db.execute(stmt):
+            loaded[tuple(key)] = _SKETCH_TYPES[key[2]].from_bytes(data)
+    return loaded
+
+
+def apply_sketches(db: Session, rows: Iterable[Mapping[str, Any]]) -> None:
+    """把一批日志计入各时间桶的 sketch（不提交事务，由调用方与日志写入一起提交）。"""
+    # 先在内存里按 sketch 归集要加入的值，同一个 sketch 只读写一次。
+    pending: Dict[SketchKey, List[Tuple[str, Any]]] = defaultdict(list)
+    for row in rows:
+        for granularity in GRANULARITIES:
+            bucket = bucket_start(row["created_at"], granularity)
+            for field in DISTINCT_FIELDS:
+                if row[field]:
+                    for key in (row[DISTINCT_GROUP_BY] or "", ALL_KEY):
+                        pending[(granularity, bucket, "hll", field, key)].append(row[field])
+            for kind, dimensions in (("topk", TOPK_DIMENSIONS), ("cms", CMS_DIMENSIONS)):
+                for dimension in dimensions:
+                    if row[dimension]:
+                        pending[(granularity, bucket, kind, dimension, ALL_KEY)].append(
+                            row[dimension]
+                        )
+    if not pending:
+        return
+
+    sketches = _load(db, list(pending))
+    params = []
+    for key, values in pending.items():
+        sketch = sketches.get(key) or _new_sketch(key[2])
+        for value in values:
+            sketch.add(value)
+        granularity, bucket, kind, dimension, group_key = key
+        params.append(
+            {
+                "granularity": granularity,
+                "bucket_start": bucket,
+                "kind": kind,
+                "dimension": dimension,
+                "key": group_key,
+                "data": sketch.to_bytes(),
+            }
+        )
+    stmt = _upsert_statement(db)
+    if stmt is None:
+        _upsert_generic(db, params)
+    else:
+        db.execute(stmt, params)
+
+
+def merged_sketches(
+    db: Session,
+    *,
+    kind: str,
+    dimension: str,
+    granularity: str,
+    key: str = ALL_KEY,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> List[Tuple[datetime, Any]]:
+    """读取时间范围内各桶的 sketch，返回 [(bucket_start, sketch)]，按时间升序。"""
+    table = AuditLogSketch.__table__
+    stmt = select(table.c.bucket_start, table.c.data).where(
+        table.c.granularity == granularity,
+        table.c.kind == kind,
+        table.c.dimension == dimension,
+        table.c.key == key,
+    )
+    if since:
+        stmt = stmt.where(table.c.bucket_start >= bucket_start(since, granularity))
+    if until:
+        stmt = stmt.where(table.c.bucket_start <= until)
+    stmt = stmt.order_by(table.c.bucket_start)
+    sketch_type = _SKETCH_TYPES[kind]
+    return [(row.bucket_start, sketch_type.from_bytes(row.data)) for row in db.execute(stmt)]
+
+
+def merge_all(sketches: Iterable[Any], kind: str) -> Any:
+    """把多个同类 sketch 合并成一个（没有数据时返回空 sketch）。"""
+    merged = _new_sketch(kind)
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged
+
+
+def rebuild_sketches(db: Session, *, chunk_size: int = 5000) -> int:
+    """从原始日志全量重建 sketch 表，返回处理的日志条数（做法同 rebuild_rollups）。"""
+    tables = tables_for_range(db)
+    db.execute(delete(AuditLogSketch.__table__))
+    max_ids: Dict[str, int] = {
+        table.name: db.execute(select(func.coalesce(func.max(table.c.id), 0))).scalar_one()
+        for table in tables
+    }
+    db.commit()
+
+    fields = sorted({*DISTINCT_FIELDS, DISTINCT_GROUP_BY, *TOPK_DIMENSIONS, *CMS_DIMENSIONS})
+    processed = 0
+    for table in tables:
+        columns = [table.c.id, table.c.created_at, *[table.c[field] for field in fields]]
+        last_id = 0
+        while True:
+            chunk = db.execute(
+                select(*columns)
+                .where(table.c.id > last_id, table.c.id <= max_ids[table.name])
+                .order_by(table.c.id)
+                .limit(chunk_size)
+            ).mappings().all()
+            if not chunk:
+                break
+            apply_sketches(db, chunk)
+            db.commit()
+            processed += len(chunk)
+            last_id = chunk[-1]["id"]
+    return processed
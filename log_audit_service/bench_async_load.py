@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+审计日志服务压测：sync 与 async 两种数据库模式的吞吐与尾延迟对比。
+
+做法：对每种模式分别用 uvicorn 在子进程里启动服务（独立的临时 SQLite 库），
+再用 httpx.AsyncClient 开 --concurrency 个并发客户端持续发请求 --duration 秒，
+其中 --write-ratio 比例为 POST /logs，其余为 GET /logs?limit=50。
+输出每种模式的 requests/sec、p50 / p99 延迟、失败数与超时数。
+超时（默认 30 秒，--timeout）的请求不计入延迟分位数，超时数较多时 p99 会偏乐观，需结合超时数看。
+
+默认关闭查询结果缓存（LOG_AUDIT_QUERY_CACHE_MAX_ENTRIES=0），让每次读请求都真正查库。
+
+运行示例（在仓库根目录）：
+    python -m log_audit_service.bench_async_load --concurrency 500 --duration 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+
+import httpx
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(mode: str, db_path: str, port: int, with_cache: bool) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        LOG_AUDIT_DB_MODE=mode,
+        LOG_AUDIT_DATABASE_URL=f"sqlite:///{db_path}",
+        LOG_AUDIT_QUERY_CACHE_MAX_ENTRIES="256" if with_cache else "0",
+    )
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "log_audit_service.app.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+        # 压测结束时被中断的排队请求会打印大量异常，这里不输出服务端日志。
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def _wait_ready(server: subprocess.Popen, base_url: str, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError(
+                    f"服务进程已退出（exit code {server.returncode}），可手动运行 uvicorn 查看启动错误"
+                )
+            try:
+                if (await client.get("/logs/metrics")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"服务未在 {timeout} 秒内启动：{base_url}")
+
+
+async def _worker(
+    client: httpx.AsyncClient,
+    deadline: float,
+    write_ratio: float,
+    latencies: List[float],
+    errors: List[int],
+    timeouts: List[int],
+) -> None:
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            if random.random() < write_ratio:
+                resp = await client.post(
+                    "/logs", json={"actor": "bench", "action": "load", "detail": "压测"}
+                )
+            else:
+                resp = await client.get("/logs", params={"limit": 50})
+            if resp.status_code >= 400:
+                errors[0] += 1
+                continue
+        except httpx.TimeoutException:
+            timeouts[0] += 1
+            continue
+        except httpx.HTTPError:
+            errors[0] += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+async def run_load(
+    base_url: str, concurrency: int, duration: float, write_ratio: float, timeout: float
+) -> Tuple[List[float], int, int]:
+    latencies: List[float] = []
+    errors = [0]
+    timeouts = [0]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        deadline = time.monotonic() + duration
+        await asyncio.gather(
+            *[
+                _worker(client, deadline, write_ratio, latencies, errors, timeouts)
+                for _ in range(concurrency)
+            ]
+        )
+    return latencies, errors[0], timeouts[0]
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[index]
+
+
+def measure(mode: str, args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        port = _free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        server = _start_server(mode, os.path.join(tmp_dir, "load.db"), port, args.with_cache)
+        try:
+            asyncio.run(_wait_ready(server, base_url))
+            latencies, errors, timeouts = asyncio.run(
+                run_load(
+                    base_url, args.concurrency, args.duration, args.write_ratio, args.timeout
+                )
+            )
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                # 压测结束时可能仍有请求在排队，优雅退出超时就直接结束进程。
+                server.kill()
+                server.wait()
+
+    latencies.sort()
+    print(
+        f"{mode:>6}  {len(latencies) / args.duration:10.1f} req/s  "
+        f"p50 {_percentile(latencies, 50) * 1000:8.1f} ms  "
+        f"p99 {_percentile(latencies, 99) * 1000:8.1f} ms  errors {errors}  timeouts {timeouts}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="sync / async 数据库模式的并发压测对比")
+    parser.add_argument("--modes", nargs="+", choices=["sync", "async"], default=["sync", "async"])
+    parser.add_argument("--concurrency", type=int, default=500, help="并发客户端数")
+    parser.add_argument("--duration", type=float, default=20.0, help="每种模式压测秒数")
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="写请求占比")
+    parser.add_argument("--timeout", type=float, default=30.0, help="单个请求的超时秒数")
+    parser.add_argument("--with-cache", action="store_true", help="保留查询结果缓存")
+    args = parser.parse_args()
+
+    for mode in args.modes:
+        measure(mode, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+审计日志写入吞吐基准：逐条写入 vs 批量写入。
+
+对比对象：
+- 单条路径：create_audit_log()，每条日志一次 add + commit + refresh；
+- 批量路径：bulk_create_audit_logs()，每批一条 Core insert、一次 commit。
+
+运行示例（在仓库根目录）：
+    python -m log_audit_service.bench_batch_insert --events 5000 --batch-size 500
+
+说明：
+- 每种路径使用一个独立的临时 SQLite 文件，避免互相影响；
+- 结果只用于同机对比，绝对数值受磁盘 fsync 速度影响很大。
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from typing import Callable, List
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from log_audit_service.app.database import Base
+from log_audit_service.app.repositories.audit_log_repository import (
+    bulk_create_audit_logs,
+    create_audit_log,
+)
+from log_audit_service.app.schemas import AuditLogCreate
+
+
+def make_events(count: int) -> List[AuditLogCreate]:
+    """构造一批内容相近的测试日志。"""
+    return [
+        AuditLogCreate(
+            actor=f"user{i % 50}",
+            action="create_order" if i % 3 else "login",
+            resource="order",
+            source_service="bench",
+            ip="127.0.0.1",
+            detail=f"bench event {i}",
+        )
+        for i in range(count)
+    ]
+
+
+def run_single(db: Session, events: List[AuditLogCreate], batch_size: int) -> None:
+    """逐条写入。"""
+    for event in events:
+        create_audit_log(db, event)
+
+
+def run_batch(db: Session, events: List[AuditLogCreate], batch_size: int) -> None:
+    """按 batch_size 分批写入。"""
+    for start in range(0, len(events), batch_size):
+        bulk_create_audit_logs(db, events[start : start + batch_size])
+
+
+def measure(
+    name: str,
+    runner: Callable[[Session, List[AuditLogCreate], int], None],
+    events: List[AuditLogCreate],
+    batch_size: int,
+) -> float:
+    """在独立的临时数据库上执行一次写入，返回 events/sec。"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, f"{name}.db")
+        engine = create_engine(f"sqlite:///{db_path}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine, autoflush=False)()
+        try:
+            started = time.perf_counter()
+            runner(db, events, batch_size)
+            elapsed = time.perf_counter() - started
+        finally:
+            db.close()
+            engine.dispose()
+    rate = len(events) / elapsed if elapsed > 0 else float("inf")
+    print(f"{name:<8} {len(events):>8} events  {elapsed:8.3f}s  {rate:12.1f} events/sec")
+    return rate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="审计日志单条 / 批量写入吞吐对比")
+    parser.add_argument("--events", type=int, default=2000, help="写入的日志总条数")
+    parser.add_argument("--batch-size", type=int, default=500, help="批量路径每批条数")
+    args = parser.parse_args()
+
+    events = make_events(args.events)
+    single_rate = measure("single", run_single, events, args.batch_size)
+    batch_rate = measure("batch", run_batch, events, args.batch_size)
+    print(f"speedup  {batch_rate / single_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
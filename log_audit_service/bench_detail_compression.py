@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+detail 压缩基准：库文件大小与读取延迟对比。
+
+对每种存储方式分别建一个临时 SQLite 库（带全文索引），写入 --rows 条模拟日志
+（--detail-parts 控制每条 detail 由几段模板文本拼成，默认 1 段约 140 字节）：
+- plain：不压缩（默认行为）；
+- zlib：LOG_AUDIT_DETAIL_COMPRESSION_ENABLED=true；
+- zlib+dict：再加上用前 2000 条 detail 训练的共享字典。
+
+输出库文件大小（VACUUM 之后）、detail 平均存储字节数，以及三种读取的 p50 / p99 延迟：
+- list：GET /logs 的查询 + 序列化（limit=50）；
+- list-no-detail：只查询不序列化（压缩句柄不解压），对照惰性解压省下的开销；
+- search：带 q 的全文检索 + 序列化。
+
+运行示例（在仓库根目录）：
+    python -m log_audit_service.bench_detail_compression --rows 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Callable, List
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from log_audit_service.app.compression import train_dictionary
+from log_audit_service.app.config import settings
+from log_audit_service.app.database import Base
+from log_audit_service.app.fulltext import init_fulltext
+from log_audit_service.app.repositories.audit_log_repository import (
+    bulk_create_audit_logs,
+    query_audit_logs,
+)
+from log_audit_service.app.routers.audit_logs import render_list_page
+from log_audit_service.app.schemas import AuditLogCreate
+
+
+_TEMPLATES = [
+    "用户 {user} 从 {ip} 登录成功，客户端 {ua}，会话 {token}，MFA 已校验",
+    "订单 ORD-{num:08d} 创建成功：user_id={user} amount={amount} currency=CNY "
+    "channel={channel} items=[{{sku: SKU-{sku}, qty: {qty}}}] trace_id={token}",
+    "权限变更：管理员 {user} 将角色 role-{sku} 授予 user-{num}，原因：工单 TICKET-{num}",
+    "网关转发 POST /api/v1/orders 到 backend，status=502 latency_ms={amount} "
+    "upstream=http://backend:8000 retry=2 error=connection reset by peer trace_id={token}",
+]
+_CHANNELS = ["wechat", "alipay", "card", "balance"]
+_AGENTS = ["Mozilla/5.0 (Macintosh)", "Mozilla/5.0 (Windows NT 10.0)", "okhttp/4.12.0"]
+
+
+def _make_detail(rng: random.Random, parts: int) -> str:
+    return "；".join(_make_part(rng) for _ in range(parts))
+
+
+def _make_part(rng: random.Random) -> str:
+    return rng.choice(_TEMPLATES).format(
+        user=f"user-{rng.randint(1, 5000)}",
+        ip=f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+        ua=rng.choice(_AGENTS),
+        token=f"{rng.getrandbits(64):016x}",
+        num=rng.randint(1, 10_000_000),
+        amount=rng.randint(1, 100_000),
+        channel=rng.choice(_CHANNELS),
+        sku=rng.randint(100, 999),
+        qty=rng.randint(1, 9),
+    )
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[index]
+
+
+def _timed(fn: Callable[[], object], repeat: int) -> str:
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return (
+        f"p50 {_percentile(latencies, 50) * 1000:6.2f} ms  "
+        f"p99 {_percentile(latencies, 99) * 1000:6.2f} ms"
+    )
+
+
+def measure(mode: str, details: List[str], tmp_dir: str, args: argparse.Namespace) -> None:
+    settings.detail_compression_enabled = mode != "plain"
+    settings.detail_compression_dict_path = None
+    if mode == "zlib+dict":
+        dict_path = os.path.join(tmp_dir, "detail.dict")
+        with open(dict_path, "wb") as fh:
+            fh.write(train_dictionary(details[:2000]))
+        settings.detail_compression_dict_path = dict_path
+
+    db_path = os.path.join(tmp_dir, f"{mode.replace('+', '_')}.db")
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    init_fulltext(engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+
+    with session_factory() as db:
+        started = time.perf_counter()
+        for start in range(0, len(details), 1000):
+            bulk_create_audit_logs(
+                db,
+                [
+                    AuditLogCreate(actor="bench", action="bench", detail=detail)
+                    for detail in details[start : start + 1000]
+                ],
+            )
+        write_seconds = time.perf_counter() - started
+        avg_bytes = db.execute(
+            text("SELECT AVG(LENGTH(CAST(detail AS BLOB))) FROM audit_logs")
+        ).scalar_one()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM"))
+
+    rng = random.Random(1)
+    with session_factory() as db:
+        list_stats = _timed(
+            lambda: render_list_page(query_audit_logs(db, limit=51), 50), args.repeat
+        )
+        raw_stats = _timed(lambda: query_audit_logs(db, limit=51), args.repeat)
+        search_stats = _timed(
+            lambda: render_list_page(
+                query_audit_logs(db, q=f"user-{rng.randint(1, 5000)}", limit=51), 50
+            ),
+            args.repeat,
+        )
+    engine.dispose()
+
+    print(
+        f"{mode:>9}  db {os.path.getsize(db_path) / 1024 / 1024:7.2f} MiB  "
+        f"detail {avg_bytes:6.1f} B/row  write {len(details) / write_seconds:8.0f} rows/s"
+    )
+    print(f"{'':>9}  list           {list_stats}")
+    print(f"{'':>9}  list-no-detail {raw_stats}")
+    print(f"{'':>9}  search         {search_stats}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="detail 压缩的空间与读取延迟对比")
+    parser.add_argument("--rows", type=int, default=50_000, help="写入的日志条数")
+    parser.add_argument("--repeat", type=int, default=200, help="每种读取重复次数")
+    parser.add_argument(
+        "--detail-parts", type=int, default=1, help="每条 detail 由几段模板文本拼成（控制长度）"
+    )
+    parser.add_argument(
+        "--modes", nargs="+", choices=["plain", "zlib", "zlib+dict"],
+        default=["plain", "zlib", "zlib+dict"],
+    )
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    details = [_make_detail(rng, args.detail_parts) for _ in range(args.rows)]
+    # 不维护 sketch，只测量日志表本身。
+    settings.sketches_enabled = False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode in args.modes:
+            measure(mode, details, tmp_dir, args)
+
+
+if __name__ == "__main__":
+    main()
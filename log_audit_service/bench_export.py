@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+审计日志导出内存基准：验证导出时的峰值内存不随总行数增长。
+
+做法：向临时 SQLite 分别写入不同数量的日志，完整消费一次 export_audit_logs()，
+用 tracemalloc 记录 Python 层的峰值内存。流式导出时各规模的峰值应基本一致。
+
+运行示例（在仓库根目录）：
+    python -m log_audit_service.bench_export --rows 10000 100000 --format csv --gzip
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from log_audit_service.app.database import Base
+from log_audit_service.app.export import export_audit_logs
+from log_audit_service.app.repositories.audit_log_repository import bulk_create_audit_logs
+from log_audit_service.bench_batch_insert import make_events
+
+
+def measure(rows: int, fmt: str, compress: bool) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'export.db')}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine, autoflush=False)
+        with session_factory() as db:
+            for start in range(0, rows, 5000):
+                bulk_create_audit_logs(db, make_events(min(5000, rows - start)))
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        total_bytes = 0
+        for chunk in export_audit_logs(session_factory, fmt=fmt, compress=compress):
+            total_bytes += len(chunk)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        engine.dispose()
+
+    print(
+        f"{rows:>10} rows  {total_bytes / 1024 / 1024:8.2f} MB out  "
+        f"{elapsed:7.2f}s  peak {peak / 1024 / 1024:6.2f} MB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="审计日志流式导出的峰值内存对比")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--format", dest="fmt", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--gzip", action="store_true", help="是否 gzip 压缩")
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        measure(rows, args.fmt, args.gzip)
+
+
+if __name__ == "__main__":
+    main()
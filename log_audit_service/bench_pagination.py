@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+审计日志分页耗时对比：offset 分页 vs 游标（keyset）分页。
+
+做法：先向临时 SQLite 写入 --rows 条日志，再分别测量“翻到第 N 页”时单页查询的耗时。
+offset 分页需要先扫过前面 N * limit 行，耗时随页数线性增长；
+游标分页直接用 (created_at, id) 从索引定位，耗时基本不随页数变化。
+
+运行示例（在仓库根目录）：
+    python -m log_audit_service.bench_pagination --rows 200000 --limit 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from log_audit_service.app.database import Base
+from log_audit_service.app.repositories.audit_log_repository import (
+    bulk_create_audit_logs,
+    query_audit_logs,
+)
+from log_audit_service.bench_batch_insert import make_events
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="offset 分页与游标分页的深翻页耗时对比")
+    parser.add_argument("--rows", type=int, default=100_000, help="预先写入的日志条数")
+    parser.add_argument("--limit", type=int, default=50, help="每页条数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'pagination.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine, autoflush=False)()
+        events = make_events(args.rows)
+        for start in range(0, len(events), 5000):
+            bulk_create_audit_logs(db, events[start : start + 5000])
+
+        # 先用游标把所有页走一遍，记录每页起点，后面两种方式翻到同一页做对比。
+        cursors = [None]
+        while True:
+            page = list(query_audit_logs(db, limit=args.limit, after=cursors[-1]))
+            if len(page) < args.limit:
+                break
+            cursors.append((page[-1].created_at, page[-1].id))
+
+        total_pages = len(cursors)
+        print(f"{'page':>8} {'offset ms':>12} {'cursor ms':>12}")
+        for page_no in (1, total_pages // 10, total_pages // 2, total_pages - 1):
+            page_no = max(page_no, 1)
+            started = time.perf_counter()
+            query_audit_logs(db, limit=args.limit, offset=(page_no - 1) * args.limit)
+            offset_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            query_audit_logs(db, limit=args.limit, after=cursors[page_no - 1])
+            cursor_ms = (time.perf_counter() - started) * 1000
+            print(f"{page_no:>8} {offset_ms:>12.2f} {cursor_ms:>12.2f}")
+
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
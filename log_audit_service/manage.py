@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志 / 审计服务运维命令。
+
+运行示例（在仓库根目录）：
+    python -m log_audit_service.manage drop-partitions --retention-days 90
+
+子命令：
+- drop-partitions：按保留天数整段删除过期分区（需开启 LOG_AUDIT_PARTITION_GRANULARITY）。
+- backfill-rollups：从原始日志分块重建 audit_log_rollups 计数汇总表。
+- backfill-sketches：从原始日志分块重建 audit_log_sketches 近似统计。
+- train-detail-dict：从最近的 detail 样本训练共享压缩字典。
+- compress-details：按当前压缩配置分块重写已有日志的 detail（--decompress 还原为文本）。
+- archive：把早于 N 天的日志搬进 LOG_AUDIT_ARCHIVE_DIR 下的压缩段文件并从库中删除。
+
+排查建议：
+- 命令连的是哪个库，取决于当前环境的 LOG_AUDIT_DATABASE_URL，执行前先确认。
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from sqlalchemy import select, text
+
+from log_audit_service.app.archive import archive_old_logs
+from log_audit_service.app.compression import detail_text, migrate_details, train_dictionary
+from log_audit_service.app.config import settings
+from log_audit_service.app.database import Base, SessionLocal, engine
+from log_audit_service.app.fulltext import init_fulltext
+from log_audit_service.app.partitions import drop_expired_partitions, tables_for_range
+from log_audit_service.app.rollups import rebuild_rollups
+from log_audit_service.app.sketches import rebuild_sketches
+
+
+def cmd_drop_partitions(args: argparse.Namespace) -> None:
+    """删除过期分区。"""
+    retention_days = args.retention_days or settings.retention_days
+    if not retention_days:
+        raise SystemExit("未指定保留天数：请传入 --retention-days 或配置 LOG_AUDIT_RETENTION_DAYS")
+    with SessionLocal() as db:
+        dropped = drop_expired_partitions(db, retention_days)
+    if dropped:
+        print("已删除分区：" + ", ".join(dropped))
+    else:
+        print("没有需要删除的分区")
+
+
+def cmd_backfill_rollups(args: argparse.Namespace) -> None:
+    """重建计数汇总表。"""
+    with SessionLocal() as db:
+        processed = rebuild_rollups(db, chunk_size=args.chunk_size)
+    print(f"已重建汇总，处理日志 {processed} 条")
+
+
+def cmd_backfill_sketches(args: argparse.Namespace) -> None:
+    """重建近似统计 sketch。"""
+    with SessionLocal() as db:
+        processed = rebuild_sketches(db, chunk_size=args.chunk_size)
+    print(f"已重建 sketch，处理日志 {processed} 条")
+
+
+def cmd_train_detail_dict(args: argparse.Namespace) -> None:
+    """训练 detail 压缩字典。"""
+    samples = []
+    with SessionLocal() as db:
+        # tables_for_range 按时间倒序返回，优先取最近的日志作为样本。
+        for table in tables_for_range(db):
+            remaining = args.samples - len(samples)
+            if remaining <= 0:
+                break
+            rows = db.execute(
+                select(table.c.detail)
+                .where(table.c.detail.is_not(None))
+                .order_by(table.c.id.desc())
+                .limit(remaining)
+            ).scalars()
+            samples.extend(detail_text(value) for value in rows)
+    if not samples:
+        raise SystemExit("库中没有 detail 样本，无法训练字典")
+    zdict = train_dictionary(samples, size=args.dict_size)
+    with open(args.output, "wb") as fh:
+        fh.write(zdict)
+    print(f"已用 {len(samples)} 条样本训练字典（{len(zdict)} 字节）：{args.output}")
+    print(f"启用方式：LOG_AUDIT_DETAIL_COMPRESSION_DICT_PATH={args.output}")
+
+
+def cmd_compress_details(args: argparse.Namespace) -> None:
+    """按当前压缩配置迁移已有 detail。"""
+    # 先按当前配置同步全文索引触发器，迁移中的 UPDATE 才会索引解压后的文本。
+    init_fulltext(engine)
+    with SessionLocal() as db:
+        try:
+            scanned, rewritten = migrate_details(
+                db, chunk_size=args.chunk_size, decompress=args.decompress
+            )
+        except ValueError as exc:
+            raise SystemExit(str(exc))
+    print(f"已扫描日志 {scanned} 条，重写 {rewritten} 条")
+    if args.vacuum and engine.dialect.name == "sqlite":
+        # SQLite 删除 / 缩小的数据只进空闲页列表，VACUUM 之后库文件才会变小。
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM"))
+        print("已执行 VACUUM")
+
+
+def cmd_archive(args: argparse.Namespace) -> None:
+    """归档冷数据。"""
+    older_than_days = args.older_than_days or settings.archive_after_days
+    if not older_than_days:
+        raise SystemExit("未指定归档天数：请传入 --older-than-days 或配置 LOG_AUDIT_ARCHIVE_AFTER_DAYS")
+    archive_dir = args.archive_dir or settings.archive_dir
+    if not archive_dir:
+        raise SystemExit("未指定归档目录：请传入 --archive-dir 或配置 LOG_AUDIT_ARCHIVE_DIR")
+    with SessionLocal() as db:
+        archived = archive_old_logs(
+            db,
+            older_than_days=older_than_days,
+            archive_dir=archive_dir,
+            segment_rows=args.segment_rows,
+        )
+    print(f"已归档日志 {archived} 条到 {archive_dir}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="日志 / 审计服务运维命令")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    drop_parser = subparsers.add_parser("drop-partitions", help="按保留天数删除过期分区")
+    drop_parser.add_argument("--retention-days", type=int, default=None, help="保留天数")
+    drop_parser.set_defaults(func=cmd_drop_partitions)
+
+    rollup_parser = subparsers.add_parser("backfill-rollups", help="从原始日志重建计数汇总表")
+    rollup_parser.add_argument("--chunk-size", type=int, default=5000, help="每块处理的日志条数")
+    rollup_parser.set_defaults(func=cmd_backfill_rollups)
+
+    sketch_parser = subparsers.add_parser("backfill-sketches", help="从原始日志重建近似统计 sketch")
+    sketch_parser.add_argument("--chunk-size", type=int, default=5000, help="每块处理的日志条数")
+    sketch_parser.set_defaults(func=cmd_backfill_sketches)
+
+    dict_parser = subparsers.add_parser("train-detail-dict", help="训练 detail 共享压缩字典")
+    dict_parser.add_argument("--output", required=True, help="字典输出路径")
+    dict_parser.add_argument("--samples", type=int, default=5000, help="样本条数")
+    dict_parser.add_argument("--dict-size", type=int, default=16 * 1024, help="字典最大字节数")
+    dict_parser.set_defaults(func=cmd_train_detail_dict)
+
+    compress_parser = subparsers.add_parser("compress-details", help="按当前配置重写已有 detail")
+    compress_parser.add_argument("--chunk-size", type=int, default=1000, help="每块处理的日志条数")
+    compress_parser.add_argument("--decompress", action="store_true", help="还原为未压缩的文本")
+    compress_parser.add_argument("--vacuum", action="store_true", help="完成后执行 VACUUM 回收空间")
+    compress_parser.set_defaults(func=cmd_compress_details)
+
+    archive_parser = subparsers.add_parser("archive", help="把早于 N 天的日志归档到段文件")
+    archive_parser.add_argument("--older-than-days", type=int, default=None, help="归档天数")
+    archive_parser.add_argument("--archive-dir", default=None, help="归档目录")
+    archive_parser.add_argument(
+        "--segment-rows", type=int, default=100_000, help="每个段文件的最大行数"
+    )
+    archive_parser.set_defaults(func=cmd_archive)
+
+    return parser
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    # 与服务启动时一致，先确保基础表存在。
+    Base.metadata.create_all(bind=engine)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ log_audit_service 简单测试。
 通过 FastAPI TestClient 验证审计日志创建与查询接口的基本行为。
 """
 
+import uuid
 from datetime import datetime, timedelta
 
 from fastapi.testclient import TestClient
@@ -48,3 +49,865 @@ def test_list_logs_with_time_range() -> None:
     resp = client.get("/logs", params={"since": since, "until": until, "limit": 5})
     assert resp.status_code == 200
 
+
+
+def test_create_logs_batch_returns_ids_in_order() -> None:
+    """批量写入后按请求顺序返回 ID，并能通过查询接口查到。"""
+    items = [
+        {"actor": "batch-user", "action": "login", "detail": f"批量日志 {i}"}
+        for i in range(3)
+    ]
+    resp = client.post("/logs/batch", json={"items": items})
+    assert resp.status_code == 201
+    data = resp.json()
+    assert data["count"] == 3
+    assert data["ids"] == sorted(data["ids"])
+
+    resp_list = client.get("/logs", params={"actor": "batch-user", "limit": 200})
+    returned_ids = {log["id"] for log in resp_list.json()}
+    assert set(data["ids"]) <= returned_ids
+
+
+def test_create_logs_batch_rejects_empty_and_oversized() -> None:
+    """空批次返回 422，超过上限返回 413。"""
+    from log_audit_service.app.config import settings
+
+    assert client.post("/logs/batch", json={"items": []}).status_code == 422
+
+    items = [{"action": "login"}] * (settings.batch_max_items + 1)
+    assert client.post("/logs/batch", json={"items": items}).status_code == 413
+
+
+def _make_buffer_session_factory():
+    """为缓冲写入测试准备独立的内存数据库，避免影响共享的测试库。"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    from log_audit_service.app.database import Base
+
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine, autoflush=False)
+
+
+def test_audit_log_buffer_flushes_by_size_and_drains_on_stop() -> None:
+    """攒够一批即提交；stop() 时把剩余日志全部写完。"""
+    import time
+
+    from log_audit_service.app.ingest_buffer import AuditLogBuffer
+    from log_audit_service.app.models import AuditLog
+    from log_audit_service.app.schemas import AuditLogCreate
+
+    session_factory = _make_buffer_session_factory()
+    buffer = AuditLogBuffer(
+        session_factory, max_size=100, flush_interval_ms=60_000, flush_batch_size=3
+    )
+    buffer.start()
+    for i in range(4):
+        assert buffer.submit(AuditLogCreate(action="login", detail=f"buffered {i}"))
+
+    # 前 3 条达到批量阈值会被立即提交，不必等待 60 秒的提交间隔。
+    deadline = time.monotonic() + 5
+    while buffer.flushed_total < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert buffer.flushed_total == 3
+    assert buffer.queue_depth == 1
+
+    buffer.stop()
+    with session_factory() as db:
+        assert db.query(AuditLog).count() == 4
+    stats = buffer.stats()
+    assert stats["flushed_total"] == 4
+    assert stats["queue_depth"] == 0
+    assert stats["running"] is False
+
+
+def test_audit_log_buffer_counts_dropped_when_full() -> None:
+    """队列满时不阻塞，直接丢弃并计数。"""
+    from log_audit_service.app.ingest_buffer import AuditLogBuffer
+    from log_audit_service.app.schemas import AuditLogCreate
+
+    buffer = AuditLogBuffer(
+        _make_buffer_session_factory(),
+        max_size=2,
+        flush_interval_ms=1000,
+        flush_batch_size=10,
+    )
+    results = [buffer.submit(AuditLogCreate(action="login")) for _ in range(3)]
+    assert results == [True, True, False]
+    assert buffer.stats()["dropped_total"] == 1
+    buffer.stop()
+    assert buffer.stats()["flushed_total"] == 2
+
+
+def test_create_log_buffered_mode_returns_202(monkeypatch) -> None:
+    """buffered 模式下 POST /logs 返回 202，日志由后台线程落库。"""
+    from log_audit_service.app.config import settings
+    from log_audit_service.app.ingest_buffer import audit_log_buffer
+
+    monkeypatch.setattr(settings, "ingest_mode", "buffered")
+    resp = client.post("/logs", json={"actor": "buffered-user", "action": "login"})
+    assert resp.status_code == 202
+    assert resp.json()["accepted"] is True
+
+    metrics = client.get("/logs/metrics").json()
+    assert metrics["ingest_mode"] == "buffered"
+    assert metrics["ingest_buffer"]["enqueued_total"] >= 1
+
+    audit_log_buffer.stop()
+    logs = client.get("/logs", params={"actor": "buffered-user"}).json()
+    assert len(logs) >= 1
+
+
+def test_list_logs_cursor_pagination_walks_all_pages() -> None:
+    """游标分页逐页向后翻，结果不重复、不遗漏，且与 offset 分页顺序一致。"""
+    items = [{"actor": "cursor-user", "action": "login", "detail": f"c{i}"} for i in range(5)]
+    created_ids = client.post("/logs/batch", json={"items": items}).json()["ids"]
+
+    seen = []
+    params = {"actor": "cursor-user", "limit": 2}
+    while True:
+        resp = client.get("/logs", params=params)
+        assert resp.status_code == 200
+        seen.extend(log["id"] for log in resp.json())
+        next_cursor = resp.headers.get("X-Next-Cursor")
+        if not next_cursor:
+            break
+        params = {"actor": "cursor-user", "limit": 2, "cursor": next_cursor}
+
+    assert len(seen) == len(set(seen))
+    assert set(created_ids) <= set(seen)
+
+    offset_ids = [
+        log["id"]
+        for log in client.get("/logs", params={"actor": "cursor-user", "limit": 200}).json()
+    ]
+    assert seen == offset_ids
+
+
+def test_list_logs_rejects_invalid_cursor() -> None:
+    """游标被篡改或与 offset 同时使用时返回 400。"""
+    assert client.get("/logs", params={"cursor": "not-a-cursor"}).status_code == 400
+
+    from log_audit_service.app.pagination import encode_cursor
+
+    cursor = encode_cursor(datetime.utcnow(), 1)
+    assert client.get("/logs", params={"cursor": cursor, "offset": 5}).status_code == 400
+
+
+def test_id_sequence_seed_is_idempotent() -> None:
+    """并发首次写入时序列行可能已被别的写入方插入：再次插入不报错，也不覆盖已分配的进度。"""
+    from log_audit_service.app import partitions
+
+    session_factory = _make_buffer_session_factory()
+    with session_factory() as db:
+        # 模拟另一个写入方在本方检查之后、插入之前抢先建好序列行并分配了 ID。
+        assert partitions.allocate_ids(db, 5) == 1
+        partitions._seed_id_sequence(db, 0)
+        assert partitions.allocate_ids(db, 2) == 6
+
+
+def test_partitioned_storage_routes_prunes_and_drops(monkeypatch) -> None:
+    """分区模式：按天写入不同分区、查询按时间裁剪、保留策略整段删除分区。"""
+    from log_audit_service.app import partitions
+    from log_audit_service.app.config import settings
+    from log_audit_service.app.repositories.audit_log_repository import (
+        bulk_create_audit_logs,
+        query_audit_logs,
+    )
+    from log_audit_service.app.schemas import AuditLogCreate
+
+    monkeypatch.setattr(settings, "partition_granularity", "day")
+    monkeypatch.setattr(settings, "retention_days", None)
+    monkeypatch.setattr(partitions, "_known_partitions", set())
+
+    session_factory = _make_buffer_session_factory()
+    days = [datetime(2024, 1, 1, 12), datetime(2024, 1, 2, 12), datetime(2024, 1, 3, 12)]
+    with session_factory() as db:
+        ids = bulk_create_audit_logs(
+            db,
+            [AuditLogCreate(action="login", detail=f"day {i}") for i in range(3)],
+            created_at=days,
+        )
+        assert ids == sorted(ids) and len(set(ids)) == 3
+        assert partitions.list_partitions(db) == [
+            "audit_logs_p20240103",
+            "audit_logs_p20240102",
+            "audit_logs_p20240101",
+        ]
+
+        # since 只覆盖最后一天：只需要扫描一个分区（外加开启分区前的历史单表）。
+        pruned = partitions.tables_for_range(db, since=datetime(2024, 1, 3))
+        assert [t.name for t in pruned] == ["audit_logs_p20240103", "audit_logs"]
+
+        logs = list(query_audit_logs(db, limit=10))
+        assert [log.id for log in logs] == list(reversed(ids))
+        assert [log.id for log in query_audit_logs(db, limit=1, offset=1)] == [ids[1]]
+
+        dropped = partitions.drop_expired_partitions(
+            db, retention_days=1, now=datetime(2024, 1, 3, 12)
+        )
+        assert dropped == ["audit_logs_p20240101"]
+        assert [log.id for log in query_audit_logs(db, limit=10)] == [ids[2], ids[1]]
+
+
+def test_list_logs_fulltext_search_combines_with_filters() -> None:
+    """q 参数全文检索 detail，并与 actor 等过滤条件组合。"""
+    # 库文件跨测试运行保留，订单号与 actor 带上本次运行的随机后缀，只命中本次写入的日志。
+    run = uuid.uuid4().hex[:8]
+    order, alice, bob = f"ORD-{run}", f"fts-alice-{run}", f"fts-bob-{run}"
+    items = [
+        {"actor": alice, "action": "create_order", "detail": f"创建订单 {order} 成功"},
+        {"actor": bob, "action": "create_order", "detail": f"创建订单 {order} 失败"},
+        {"actor": alice, "action": "login", "detail": f"用户 {alice} 登录成功"},
+    ]
+    ids = client.post("/logs/batch", json={"items": items}).json()["ids"]
+
+    resp = client.get("/logs", params={"q": order})
+    assert resp.status_code == 200
+    assert [log["id"] for log in resp.json()] == [ids[1], ids[0]]
+
+    resp = client.get("/logs", params={"q": order, "actor": alice})
+    assert [log["id"] for log in resp.json()] == [ids[0]]
+
+    # 多个词为 AND 关系；短于 3 个字符的词退化为 LIKE 也能命中。
+    resp = client.get("/logs", params={"q": f"{run} 失败"})
+    assert [log["id"] for log in resp.json()] == [ids[1]]
+    resp = client.get("/logs", params={"q": run[-2:], "actor": bob})
+    assert [log["id"] for log in resp.json()] == [ids[1]]
+
+    # FTS 语法字符按字面量处理，不会导致 500。
+    assert client.get("/logs", params={"q": 'ORD" OR *'}).status_code == 200
+
+    html = client.get("/logs/ui", params={"q": order, "actor": bob}).text
+    assert f"{order} 失败" in html
+    assert f"{order} 成功" not in html
+
+
+def test_fulltext_falls_back_to_like_without_index() -> None:
+    """没有 FTS 索引的表上，q 退化为 LIKE，结果一致。"""
+    from log_audit_service.app.repositories.audit_log_repository import (
+        bulk_create_audit_logs,
+        query_audit_logs,
+    )
+    from log_audit_service.app.schemas import AuditLogCreate
+
+    session_factory = _make_buffer_session_factory()
+    with session_factory() as db:
+        bulk_create_audit_logs(
+            db,
+            [
+                AuditLogCreate(action="login", detail="订单 ORD-1 已支付"),
+                AuditLogCreate(action="login", detail="无关日志 100%"),
+            ],
+        )
+        assert [log.detail for log in query_audit_logs(db, q="ORD-1")] == ["订单 ORD-1 已支付"]
+        assert [log.detail for log in query_audit_logs(db, q="100%")] == ["无关日志 100%"]
+
+
+def test_stats_served_from_rollups_and_backfill_matches() -> None:
+    """写入时增量维护汇总表；/logs/stats 读汇总；重建结果与增量结果一致。"""
+    from log_audit_service.app.repositories.audit_log_repository import bulk_create_audit_logs
+    from log_audit_service.app.rollups import query_rollups, rebuild_rollups
+    from log_audit_service.app.schemas import AuditLogCreate
+
+    resp = client.post(
+        "/logs/batch",
+        json={"items": [{"actor": "stats-user", "action": "stats_action"}] * 3},
+    )
+    assert resp.status_code == 201
+    resp = client.get(
+        "/logs/stats",
+        params={"dimension": "action", "granularity": "day", "value": "stats_action"},
+    )
+    assert resp.status_code == 200
+    assert sum(item["count"] for item in resp.json()) >= 3
+    assert client.get("/logs/stats", params={"dimension": "ip"}).status_code == 422
+
+    session_factory = _make_buffer_session_factory()
+    with session_factory() as db:
+        bulk_create_audit_logs(
+            db,
+            [
+                AuditLogCreate(actor="a", action="login", source_service="rbac"),
+                AuditLogCreate(actor="b", action="login"),
+                AuditLogCreate(actor="a", action="logout", source_service="rbac"),
+            ],
+            created_at=[
+                datetime(2024, 1, 1, 9, 5),
+                datetime(2024, 1, 1, 9, 30),
+                datetime(2024, 1, 1, 10),
+            ],
+        )
+        incremental = query_rollups(db, dimension="action", granularity="hour")
+        assert [(r.bucket_start.hour, r.value, r.count) for r in incremental] == [
+            (9, "login", 2),
+            (10, "logout", 1),
+        ]
+        assert rebuild_rollups(db, chunk_size=2) == 3
+        rebuilt = query_rollups(db, dimension="action", granularity="hour")
+        assert [tuple(r) for r in rebuilt] == [tuple(r) for r in incremental]
+        by_actor = query_rollups(db, dimension="actor", granularity="day")
+        assert {(r.value, r.count) for r in by_actor} == {("a", 2), ("b", 1)}
+
+
+def test_rollups_generic_upsert_for_other_dialects(monkeypatch) -> None:
+    """没有 upsert 语法的方言退化为逐行 UPDATE / INSERT，计数照样累加。"""
+    from log_audit_service.app import rollups
+    from log_audit_service.app.repositories.audit_log_repository import bulk_create_audit_logs
+    from log_audit_service.app.schemas import AuditLogCreate
+
+    monkeypatch.setattr(rollups, "_upsert_statement", lambda db: None)
+    session_factory = _make_buffer_session_factory()
+    with session_factory() as db:
+        for _ in range(2):
+            bulk_create_audit_logs(
+                db,
+                [AuditLogCreate(action="login"), AuditLogCreate(action="logout")],
+                created_at=[datetime(2024, 1, 1, 9)] * 2,
+            )
+        result = rollups.query_rollups(db, dimension="action", granularity="hour")
+        assert {(r.value, r.count) for r in result} == {("login", 2), ("logout", 2)}
+
+
+def test_sketches_estimate_distinct_top_and_frequency(monkeypatch) -> None:
+    """写入时维护 sketch；跨桶合并后的估计落在文档给出的误差范围内；重建结果一致。"""
+    from log_audit_service.app.config import settings
+    from log_audit_service.app.repositories.audit_log_repository import bulk_create_audit_logs
+    from log_audit_service.app.schemas import AuditLogCreate
+    from log_audit_service.app.sketches import (
+        HyperLogLog,
+        merge_all,
+        merged_sketches,
+        rebuild_sketches,
+    )
+
+    monkeypatch.setattr(settings, "sketches_enabled", True)
+    # 两个小时桶共 3000 个不同 IP，其中 1000 个两个桶都出现；actor 为长尾分布。
+    items, created_at = [], []
+    for hour, ips in ((9, range(0, 2000)), (10, range(1000, 3000))):
+        for i in ips:
+            actor = "hot" if i % 4 == 0 else ("warm" if i % 10 == 1 else f"user-{i}")
+            ip = f"10.0.{i // 256}.{i % 256}"
+            items.append(AuditLogCreate(actor=actor, action="login", ip=ip))
+            created_at.append(datetime(2024, 1, 1, hour, i % 60))
+
+    session_factory = _make_buffer_session_factory()
+    with session_factory() as db:
+        for start in range(0, len(items), 500):
+            bulk_create_audit_logs(
+                db, items[start : start + 500], created_at=created_at[start : start + 500]
+            )
+        hll = merged_sketches(db, kind="hll", dimension="ip", granularity="hour", key="login")
+        assert len(hll) == 2
+        merged = merge_all((sketch for _, sketch in hll), "hll")
+        # 3000 个不同值，按三倍标准误差检查。
+        assert abs(merged.estimate() - 3000) <= 3 * merged.relative_error * 3000
+        assert HyperLogLog.from_bytes(merged.to_bytes()).registers == merged.registers
+
+        top = merge_all(
+            (s for _, s in merged_sketches(db, kind="topk", dimension="actor", granularity="day")),
+            "topk",
+        )
+        assert top.total == 4000
+        (hot, count, error), (warm, *_rest) = top.top(2)
+        assert (hot, warm) == ("hot", "warm")
+        assert count - error <= 1000 <= count
+
+        cms = merge_all(
+            (s for _, s in merged_sketches(db, kind="cms", dimension="ip", granularity="hour")),
+            "cms",
+        )
+        # 10.0.4.0 即 i=1024，两个桶各出现一次。
+        assert 2 <= cms.estimate("10.0.4.0") <= 2 + cms.epsilon * cms.total
+
+        before = {
+            (kind, dim): [s.to_bytes() for _, s in merged_sketches(
+                db, kind=kind, dimension=dim, granularity="day"
+            )]
+            for kind, dim in (("topk", "ip"), ("cms", "actor"))
+        }
+        assert rebuild_sketches(db, chunk_size=700) == 4000
+        for (kind, dim), blobs in before.items():
+            after = merged_sketches(db, kind=kind, dimension=dim, granularity="day")
+            assert [s.to_bytes() for _, s in after] == blobs
+
+    resp = client.post(
+        "/logs/batch",
+        json={"items": [{"actor": "sketch-user", "action": "sketch_action", "ip": "10.9.9.9"}] * 3},
+    )
+    assert resp.status_code == 201
+    distinct = client.get(
+        "/logs/analytics/distinct", params={"field": "ip", "action": "sketch_action"}
+    ).json()
+    assert distinct["estimate"] == 1 and distinct["relative_standard_error"] > 0
+    top = client.get("/logs/analytics/top", params={"dimension": "actor", "k": 5}).json()
+    assert "sketch-user" in {item["value"] for item in top["items"]}
+    freq = client.get(
+        "/logs/analytics/frequency", params={"dimension": "ip", "value": "10.9.9.9"}
+    ).json()
+    assert freq["estimate"] >= 3 and 0 < freq["confidence"] < 1
+    assert client.get("/logs/analytics/top", params={"dimension": "detail"}).status_code == 422
+
+
+def test_sketches_generic_upsert_for_other_dialects(monkeypatch) -> None:
+    """没有 upsert 语法的方言退化为逐行 UPDATE / INSERT，sketch 照样合并。"""
+    from log_audit_service.app import sketches
+    from log_audit_service.app.config import settings
+    from log_audit_service.app.repositories.audit_log_repository import bulk_create_audit_logs
+    from log_audit_service.app.schemas import AuditLogCreate
+
+    monkeypatch.setattr(settings, "sketches_enabled", True)
+    monkeypatch.setattr(sketches, "_upsert_statement", lambda db: None)
+    session_factory = _make_buffer_session_factory()
+    with session_factory() as db:
+        for ip in ("10.0.0.1", "10.0.0.2"):
+            bulk_create_audit_logs(
+                db,
+                [AuditLogCreate(actor="a", action="login", ip=ip)],
+                created_at=[datetime(2024, 1, 1, 9)],
+            )
+        hll = sketches.merged_sketches(
+            db, kind="hll", dimension="ip", granularity="hour", key="login"
+        )
+        assert len(hll) == 1 and hll[0][1].estimate() == 2
+
+
+def test_detail_compression_migrates_and_keeps_search_working(monkeypatch, tmp_path) -> None:
+    """存量数据迁移为压缩存储后，全文检索 / LIKE / 序列化结果不变；换字典、还原也可以。"""
+    from sqlalchemy import text
+
+    from log_audit_service.app.compression import (
+        CompressedDetail,
+        migrate_details,
+        train_dictionary,
+    )
+    from log_audit_service.app.config import settings
+    from log_audit_service.app.fulltext import create_fulltext_index, drop_fulltext_index
+    from log_audit_service.app.repositories.audit_log_repository import (
+        bulk_create_audit_logs,
+        query_audit_logs,
+    )
+    from log_audit_service.app.schemas import AuditLogCreate, AuditLogRead
+
+    details = [
+        f"用户 user-{i} 在订单服务创建订单 ORD-{i:05d}，金额 {i * 7} 元，"
+        f"支付渠道 wechat，收货地址 上海市浦东新区，状态 待支付，来源 gateway"
+        for i in range(50)
+    ]
+    session_factory = _make_buffer_session_factory()
+    with session_factory() as db:
+        with db.get_bind().begin() as conn:
+            assert create_fulltext_index(conn, "audit_logs")
+        bulk_create_audit_logs(db, [AuditLogCreate(action="order", detail=d) for d in details])
+
+        def storage() -> set:
+            return set(db.execute(text("SELECT DISTINCT typeof(detail) FROM audit_logs")).scalars())
+
+        def search(q: str) -> list:
+            logs = query_audit_logs(db, q=q, limit=100)
+            return [AuditLogRead.model_validate(log, from_attributes=True).detail for log in logs]
+
+        assert storage() == {"text"}
+        # 开启压缩：按新配置重建全文索引后再迁移存量数据。
+        monkeypatch.setattr(settings, "detail_compression_enabled", True)
+        with db.get_bind().begin() as conn:
+            drop_fulltext_index(conn, "audit_logs")
+            assert create_fulltext_index(conn, "audit_logs")
+        assert migrate_details(db, chunk_size=20) == (50, 50)
+        assert storage() == {"blob"}
+        assert migrate_details(db, chunk_size=20) == (50, 0)
+
+        fetched = query_audit_logs(db, limit=5)
+        assert all(isinstance(log.detail, CompressedDetail) for log in fetched)
+        assert all(log.detail._text is None for log in fetched)
+        assert search("ORD-00007") == [details[7]]
+        # 两个字符的检索词走 LIKE 退化路径，需要先解压再匹配。
+        assert len(search("wechat 7")) == len([d for d in details if "7" in d])
+
+        bulk_create_audit_logs(db, [AuditLogCreate(action="order", detail=details[0] + " 补录备注")])
+        assert search("补录备注") == [details[0] + " 补录备注"]
+        plain_size = db.execute(text("SELECT SUM(LENGTH(CAST(detail AS BLOB))) FROM audit_logs"))
+
+        dict_path = tmp_path / "detail.dict"
+        dict_path.write_bytes(train_dictionary(details))
+        monkeypatch.setattr(settings, "detail_compression_dict_path", str(dict_path))
+        assert migrate_details(db, chunk_size=20) == (51, 51)
+        dict_size = db.execute(text("SELECT SUM(LENGTH(detail)) FROM audit_logs"))
+        assert dict_size.scalar_one() < plain_size.scalar_one()
+        assert search("ORD-00042") == [details[42]]
+
+        assert migrate_details(db, chunk_size=20, decompress=True) == (51, 51)
+        assert storage() == {"text"}
+        assert search("ORD-00042") == [details[42]]
+
+
+def test_export_logs_streams_ndjson_csv_and_gzip() -> None:
+    """导出接口支持 NDJSON / CSV / gzip，并复用列表接口的过滤条件。"""
+    import csv
+    import gzip
+    import io
+    import json
+
+    actor = f"export-user-{uuid.uuid4().hex[:8]}"
+    items = [{"actor": actor, "action": "export", "detail": f"导出 {i}"} for i in range(3)]
+    ids = client.post("/logs/batch", json={"items": items}).json()["ids"]
+
+    resp = client.get("/logs/export", params={"actor": actor})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in resp.text.splitlines()]
+    assert [r["id"] for r in records] == list(reversed(ids))
+    assert records[0]["detail"] == "导出 2"
+
+    resp = client.get("/logs/export", params={"actor": actor, "format": "csv"})
+    rows = list(csv.reader(io.StringIO(resp.text)))
+    assert rows[0][:2] == ["id", "created_at"]
+    assert len(rows) == 4
+
+    resp = client.get("/logs/export", params={"actor": actor, "gzip": "true"})
+    assert resp.headers["content-type"] == "application/gzip"
+    assert ".ndjson.gz" in resp.headers["content-disposition"]
+    lines = gzip.decompress(resp.content).decode("utf-8").splitlines()
+    assert len(lines) == 3
+
+
+def test_archive_moves_old_logs_to_segments_and_queries_through(monkeypatch, tmp_path) -> None:
+    """冷数据归档：旧日志搬进段文件并从热库删除，查询按时间顺序穿透到归档。"""
+    from sqlalchemy import func, select
+
+    from log_audit_service.app import archive
+    from log_audit_service.app.config import settings
+    from log_audit_service.app.models import AuditLog
+    from log_audit_service.app.repositories.audit_log_repository import (
+        bulk_create_audit_logs,
+        query_audit_logs,
+        stream_audit_logs,
+    )
+    from log_audit_service.app.schemas import AuditLogCreate
+
+    monkeypatch.setattr(settings, "archive_dir", str(tmp_path))
+    session_factory = _make_buffer_session_factory()
+    start = datetime(2024, 1, 1)
+    created_at = [start + timedelta(days=i) for i in range(6)]
+    with session_factory() as db:
+        ids = bulk_create_audit_logs(
+            db,
+            [
+                AuditLogCreate(actor=f"user-{i % 2}", action="login", detail=f"订单 {i}")
+                for i in range(6)
+            ],
+            created_at=created_at,
+        )
+        archived = archive.archive_old_logs(
+            db, older_than_days=2, block_rows=2, now=datetime(2024, 1, 7)
+        )
+        assert archived == 4
+        assert db.execute(select(func.count()).select_from(AuditLog)).scalar_one() == 2
+        segments = archive.get_catalog().segments()
+        assert len(segments) == 1 and len(segments[0].blocks) == 2
+
+        assert [log.id for log in query_audit_logs(db, limit=10)] == list(reversed(ids))
+        assert [log.id for log in query_audit_logs(db, limit=2, offset=3)] == [ids[2], ids[1]]
+        cursor = (created_at[3], ids[3])
+        assert [log.id for log in query_audit_logs(db, limit=10, after=cursor)] == [
+            ids[2],
+            ids[1],
+            ids[0],
+        ]
+        assert [log.id for log in query_audit_logs(db, actor="user-1")] == [ids[5], ids[3], ids[1]]
+        assert [log.id for log in query_audit_logs(db, q="订单 2")] == [ids[2]]
+        # since 晚于所有归档日志时不读段文件。
+        assert not archive.archive_may_contain(created_at[4], None)
+        assert len(list(stream_audit_logs(db))) == 6
+
+        # 布隆过滤器：不存在的 actor 直接跳过所有块。
+        assert all(
+            not block.actor_bloom.might_contain("nobody") for block in segments[0].blocks
+        )
+
+
+def test_archive_recovery_drops_unfinished_segments(monkeypatch, tmp_path) -> None:
+    """带 .pending 标记的段不参与查询；崩溃恢复时热库行未删除的段被丢弃并重新归档。"""
+    import os
+
+    from sqlalchemy import func, select
+
+    from log_audit_service.app import archive
+    from log_audit_service.app.config import settings
+    from log_audit_service.app.models import AuditLog
+    from log_audit_service.app.repositories.audit_log_repository import (
+        bulk_create_audit_logs,
+        query_audit_logs,
+        stream_audit_logs,
+    )
+    from log_audit_service.app.schemas import AuditLogCreate
+
+    monkeypatch.setattr(settings, "archive_dir", str(tmp_path))
+    session_factory = _make_buffer_session_factory()
+    created_at = [datetime(2024, 1, 1) + timedelta(days=i) for i in range(4)]
+    with session_factory() as db:
+        ids = bulk_create_audit_logs(
+            db,
+            [AuditLogCreate(action="login", detail=f"订单 {i}") for i in range(4)],
+            created_at=created_at,
+        )
+
+        # 模拟在删除热库行之前崩溃：段与索引已发布，标记还在。
+        def crash(*args, **kwargs):
+            raise RuntimeError("crash")
+
+        monkeypatch.setattr(archive, "_delete_archived", crash)
+        try:
+            archive.archive_old_logs(db, older_than_days=1, now=datetime(2024, 1, 4))
+        except RuntimeError:
+            db.rollback()
+        names = sorted(os.listdir(tmp_path))
+        assert [name.rsplit(".", 1)[-1] for name in names] == ["json", "pending", "seg"]
+        # 带标记的段不参与查询：热库行还在，不会重复返回。
+        assert archive.get_catalog().segments() == []
+        assert [log.id for log in query_audit_logs(db, limit=10)] == list(reversed(ids))
+        assert [log.id for log in stream_audit_logs(db)] == list(reversed(ids))
+        monkeypatch.undo()
+        monkeypatch.setattr(settings, "archive_dir", str(tmp_path))
+
+        assert archive.archive_old_logs(db, older_than_days=1, now=datetime(2024, 1, 4)) == 2
+        assert not any(name.endswith(archive.PENDING_SUFFIX) for name in os.listdir(tmp_path))
+        assert db.execute(select(func.count()).select_from(AuditLog)).scalar_one() == 2
+        # 没有重复：热库 2 条 + 归档 2 条。
+        assert [log.id for log in query_audit_logs(db, limit=10)] == list(reversed(ids))
+
+
+def test_list_and_ui_served_from_cache_until_next_write() -> None:
+    """相同条件的列表 / UI 查询命中缓存；任何写入提交后缓存失效，能看到新日志。"""
+    params = {"actor": "cache-user", "limit": 5}
+    client.post("/logs", json={"actor": "cache-user", "action": "first"})
+
+    first = client.get("/logs", params=params)
+    second = client.get("/logs", params={**params, "actor": " cache-user "})
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.json() == first.json()
+
+    client.get("/logs/ui", params=params)
+    client.get("/logs/ui", params=params)
+
+    client.post("/logs", json={"actor": "cache-user", "action": "second"})
+    third = client.get("/logs", params=params)
+    assert third.headers["X-Cache"] == "MISS"
+    assert third.json()[0]["action"] == "second"
+    assert "second" in client.get("/logs/ui", params=params).text
+
+    stats = client.get("/logs/metrics").json()["query_cache"]
+    assert stats["by_kind"]["list"]["hits"] >= 1
+    assert stats["by_kind"]["ui"]["hits"] >= 1
+    assert stats["by_kind"]["ui"]["saved_ms"] >= 0
+
+
+def test_ui_streams_rows_escapes_and_allows_large_limits() -> None:
+    """/logs/ui 流式输出完整页面；内容与表单回填都转义；大 limit 不写缓存。"""
+    from log_audit_service.app.ui import esc
+
+    assert esc('<a href="x">\'&') == "&lt;a href=&quot;x&quot;&gt;&#x27;&amp;"
+    assert esc(None) == ""
+
+    actor = f"ui-streamer-{uuid.uuid4().hex[:8]}"
+    items = [{"actor": actor, "action": "view", "detail": f"<b>row {i}</b>"} for i in range(250)]
+    assert client.post("/logs/batch", json={"items": items}).status_code == 201
+
+    params = {"actor": actor, "limit": 300}
+    resp = client.get("/logs/ui", params=params)
+    assert resp.status_code == 200
+    assert resp.headers["X-Cache"] == "MISS"
+    assert resp.text.rstrip().endswith("</html>")
+    assert resp.text.count("<tr><td>") == 250
+    assert "&lt;b&gt;row 249&lt;/b&gt;" in resp.text and "<b>" not in resp.text
+    # 超过 UI_CACHE_MAX_ROWS 的页面不缓存。
+    assert client.get("/logs/ui", params=params).headers["X-Cache"] == "MISS"
+
+    small = {"actor": actor, "limit": 3, "q": '"><script>'}
+    client.get("/logs/ui", params={**small, "q": None})
+    cached = client.get("/logs/ui", params={**small, "q": None})
+    assert cached.headers["X-Cache"] == "HIT" and cached.text.count("<tr><td>") == 3
+    html = client.get("/logs/ui", params=small).text
+    assert 'value="&quot;&gt;&lt;script&gt;"' in html
+
+
+def test_async_db_mode_serves_write_and_list(monkeypatch) -> None:
+    """async 模式：写入与列表查询走 aiosqlite 异步实现，结果与同步模式一致。"""
+    from log_audit_service.app.config import settings
+    from log_audit_service.app.main import create_app
+
+    monkeypatch.setattr(settings, "db_mode", "async")
+    async_app = create_app()
+
+    with TestClient(async_app) as async_client:
+        created = async_client.post("/logs", json={"actor": "async-user", "action": "login"})
+        assert created.status_code == 201
+        ids = async_client.post(
+            "/logs/batch", json={"items": [{"actor": "async-user", "action": "logout"}]}
+        ).json()["ids"]
+
+        resp = async_client.get("/logs", params={"actor": "async-user", "limit": 1})
+        assert resp.status_code == 200
+        assert [log["id"] for log in resp.json()] == ids
+        page2 = async_client.get(
+            "/logs",
+            params={"actor": "async-user", "limit": 1, "cursor": resp.headers["X-Next-Cursor"]},
+        ).json()
+        assert [log["id"] for log in page2] == [created.json()["id"]]
+
+    # 同一个库，同步接口也能查到 async 模式写入的日志。
+    assert len(client.get("/logs", params={"actor": "async-user"}).json()) >= 2
+
+
+def test_live_tail_pushes_committed_logs_and_drops_slow_consumers() -> None:
+    """实时推送：提交后的日志按过滤条件推给订阅者；队列写满的订阅者收到 overflow 后断开。"""
+    import asyncio
+    import json
+
+    from log_audit_service.app.live_tail import LiveTailHub, event_stream, live_tail_hub
+
+    async def never_disconnected() -> bool:
+        return False
+
+    async def scenario() -> None:
+        subscription = live_tail_hub.subscribe(actor="tail-user")
+        stream = event_stream(subscription, never_disconnected, heartbeat_seconds=5)
+        assert (await stream.__anext__()).startswith("retry:")
+
+        # 写入在线程池中完成，推送经 call_soon_threadsafe 回到事件循环。
+        items = [{"actor": "other", "action": "x"}, {"actor": "tail-user", "action": "login"}]
+        await asyncio.to_thread(client.post, "/logs/batch", json={"items": items})
+        message = await asyncio.wait_for(stream.__anext__(), 5)
+        assert message.startswith("id: ")
+        data = json.loads(message.split("data: ", 1)[1])
+        assert (data["actor"], data["action"]) == ("tail-user", "login")
+        await stream.aclose()
+        assert live_tail_hub.stats()["subscribers"] == 0
+
+        hub = LiveTailHub(buffer_size=2, max_subscribers=1)
+        slow = hub.subscribe()
+        rows = [
+            {"id": i, "created_at": datetime(2024, 1, 1), "action": "burst"} for i in range(3)
+        ]
+        await asyncio.to_thread(hub.publish, rows)
+        await asyncio.sleep(0.05)
+        slow_stream = event_stream(slow, never_disconnected, heartbeat_seconds=5)
+        messages = [message async for message in slow_stream]
+        assert messages[-1].startswith("event: overflow")
+        assert hub.stats()["slow_disconnects_total"] == 1
+        assert hub.stats()["subscribers"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_queue_consumer_acks_after_commit_and_requeues_on_failure() -> None:
+    """队列消费：整批写库后才确认；写库失败时放回队列，格式错误的消息直接丢弃。"""
+    import json
+
+    from sqlalchemy import create_engine, func, select
+    from sqlalchemy.orm import sessionmaker
+
+    from log_audit_service.app.models import AuditLog
+    from log_audit_service.app.queue_ingest import AuditLogQueueConsumer, InMemoryQueueClient
+
+    queue_client = InMemoryQueueClient()
+    for i in range(3):
+        queue_client.send_message("audit", json.dumps({"actor": "mq", "action": f"event-{i}"}))
+    queue_client.send_message("audit", "not json")
+
+    healthy_factory = _make_buffer_session_factory()
+    # 未建表的空库：写入必然失败，用来模拟数据库故障。
+    broken_factory = sessionmaker(bind=create_engine("sqlite://"))
+
+    consumer = AuditLogQueueConsumer(
+        lambda: queue_client, broken_factory, queue="audit", batch_size=10, poll_interval_ms=10
+    )
+    assert consumer.poll_once() == 0
+    # 写库失败：3 条合法消息放回队列，非法消息被丢弃。
+    assert queue_client.get_stats("audit") == {
+        "message_count": 3,
+        "unacked_count": 0,
+        "consumer_count": 0,
+    }
+    assert consumer.stats()["rejected_total"] == 1
+    assert consumer.stats()["failed_batches_total"] == 1
+
+    consumer._session_factory = healthy_factory
+    assert consumer.poll_once() == 3
+    assert queue_client.get_stats("audit")["message_count"] == 0
+    assert queue_client.get_stats("audit")["unacked_count"] == 0
+    with healthy_factory() as db:
+        actions = db.execute(select(AuditLog.action).order_by(AuditLog.id)).scalars().all()
+        assert actions == ["event-0", "event-1", "event-2"]
+        assert db.execute(select(func.count()).select_from(AuditLog)).scalar_one() == 3
+
+    # 拉取后未确认即“重启”：消息重新回到队列。
+    queue_client.send_message("audit", json.dumps({"action": "late"}))
+    queue_client.get_messages("audit", 10)
+    queue_client.recover("audit")
+    assert queue_client.get_stats("audit")["message_count"] == 1
+
+
+def test_queue_consumer_reconnects_after_client_error() -> None:
+    """队列连接出错时关闭并丢弃客户端，下一轮重新创建后继续消费；stop() 关闭连接。"""
+    import json
+    import time
+
+    from sqlalchemy import func, select
+
+    from log_audit_service.app.models import AuditLog
+    from log_audit_service.app.queue_ingest import AuditLogQueueConsumer, InMemoryQueueClient
+
+    queue_client = InMemoryQueueClient()
+    queue_client.send_message("audit", json.dumps({"actor": "mq", "action": "after-reconnect"}))
+
+    class _FlakyClient(InMemoryQueueClient):
+        """第一个连接拉取时断开，之后的连接委托给共享的内存队列。"""
+
+        def __init__(self, broken: bool) -> None:
+            super().__init__()
+            self.broken = broken
+            self.closed = False
+
+        def get_messages(self, queue, limit=10):
+            if self.broken:
+                raise ConnectionError("connection reset")
+            return queue_client.get_messages(queue, limit)
+
+        def ack(self, queue, delivery_tags):
+            queue_client.ack(queue, delivery_tags)
+
+        def close(self) -> None:
+            self.closed = True
+
+    created = []
+
+    def factory():
+        created.append(_FlakyClient(broken=not created))
+        return created[-1]
+
+    session_factory = _make_buffer_session_factory()
+    consumer = AuditLogQueueConsumer(
+        factory, session_factory, queue="audit", batch_size=10, poll_interval_ms=5
+    )
+    consumer.start()
+    try:
+        deadline = time.monotonic() + 5
+        while consumer.stats()["consumed_total"] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        consumer.stop()
+
+    assert consumer.stats()["consumed_total"] == 1
+    assert len(created) == 2
+    assert all(client.closed for client in created)
+    assert consumer._client is None
+    with session_factory() as db:
+        assert db.execute(select(func.count()).select_from(AuditLog)).scalar_one() == 1